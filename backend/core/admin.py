@@ -0,0 +1,101 @@
+"""
+Admin building blocks for tables too large for the stock changelist.
+
+The default related-field filters load every row of the related table
+into the sidebar, and the paginator runs COUNT(*) over the whole table on
+every page load. AutocompleteFilter picks the related object through the
+admin's autocomplete endpoint instead, and EstimatedCountPaginator reads
+the row count of unfiltered lists from the planner's statistics.
+"""
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a foreign key through an autocomplete search box; the related
+    model's admin needs search_fields. Use as list_filter = [('user', AutocompleteFilter)].
+    """
+    template = 'admin/autocomplete_filter.html'
+    media = ''
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.lookup_val = self.used_parameters.get(self.lookup_kwarg)
+        self.admin_site = model_admin.admin_site
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # The widget navigates to the list without this filter plus the
+        # picked value, so it is rendered once the changelist is known
+        related = self.field.remote_field.model
+        select = forms.ModelChoiceField(
+            queryset=related._default_manager.all(),
+            widget=AutocompleteSelect(self.field, self.admin_site, attrs={
+                'data-url': changelist.get_query_string(remove=[self.lookup_kwarg]),
+                'onchange': (
+                    "window.location.href = this.dataset.url"
+                    " + (this.value ? '&' + this.name + '=' + encodeURIComponent(this.value) : '')"
+                ),
+            }),
+            required=False,
+        )
+        value = self.lookup_val[-1] if self.lookup_val else None
+        self.widget = select.widget.render(self.lookup_kwarg, value)
+        # The scripts are included once, with the first filter of the list
+        if not getattr(changelist, 'has_autocomplete_media', False):
+            changelist.has_autocomplete_media = True
+            self.media = select.widget.media
+
+        yield {
+            'selected': value is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+
+def estimated_row_count(model, using='default'):
+    """The planner's estimate of a table's row count, or None where the database keeps none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables that were never analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for tables with millions of rows: an unfiltered list takes
+    its count from estimated_row_count() instead of a COUNT(*) that reads
+    the whole table. Filtered lists, and tables small enough for an exact
+    count to be cheap, are counted exactly.
+    """
+    # Below this many rows COUNT(*) is cheap and exact page numbers are nicer
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
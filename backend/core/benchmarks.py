@@ -0,0 +1,12 @@
+"""
+Helpers shared by the benchmark management commands, which write to the
+database they run against.
+"""
+
+
+def is_test_database(connection):
+    """Whether `connection` is a throwaway test database, as set up by the test runner"""
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return True
+    name = str(connection.settings_dict['NAME'])
+    return name.startswith('test_') or name == connection.settings_dict.get('TEST', {}).get('NAME')
@@ -0,0 +1,62 @@
+"""
+Cheap ETag validators for read endpoints.
+
+Validators are derived from max(updated_at) and the row count of the
+querysets behind a response, one aggregate query each, so a matching
+If-None-Match can be answered with 304 Not Modified before anything is
+serialized.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """Build a strong ETag from the given parts"""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return f'"{digest.hexdigest()}"'
+
+
+def queryset_fingerprint(queryset, field='updated_at'):
+    """Latest modification time and row count of a queryset, in one query"""
+    result = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+    last_modified = result['last_modified']
+    return f"{last_modified.isoformat() if last_modified else ''}:{result['count']}"
+
+
+def queryset_etag(*querysets):
+    return make_etag(*(queryset_fingerprint(queryset) for queryset in querysets))
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+class ConditionalListMixin:
+    """
+    Answer list requests with 304 Not Modified when the client's ETag still
+    matches the fingerprint of get_etag_querysets()
+    """
+
+    def get_etag_querysets(self):
+        return [self.filter_queryset(self.get_queryset())]
+
+    def list(self, request, *args, **kwargs):
+        etag = queryset_etag(*self.get_etag_querysets())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
@@ -8,8 +8,10 @@
 # For the full list of settings and their values, see
 # https://docs.djangoproject.com/en/5.2/ref/settings/
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 import pymysql
 
@@ -61,7 +63,7 @@ ROOT_URLCONF = 'core.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'core' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -124,12 +126,69 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.CustomUser'
 
-# Authentication
+# Authentication - EmailOrUsernameModelBackend extends ModelBackend and
+# covers its lookups, so a failed login is only looked up and hashed once
 AUTHENTICATION_BACKENDS = [
     'users.auth.EmailOrUsernameModelBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Password hashing - PASSWORD_HASHER picks the algorithm of new hashes
+# (pbkdf2, scrypt, or argon2 with the argon2-cffi package). The others still
+# verify existing hashes, and a hash made with another algorithm or cost is
+# upgraded on the user's next successful login.
+# `manage.py benchmark_password_hashers` measures logins per core.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+}
+# argon2-cffi is optional (see requirements.txt); without it an argon2
+# hasher would fail on the first login instead of at startup
+if find_spec('argon2') is not None:
+    PASSWORD_HASHER_PROFILES['argon2'] = 'users.hashers.Argon2PasswordHasher'
+elif PASSWORD_HASHER == 'argon2':
+    raise ImproperlyConfigured('PASSWORD_HASHER=argon2 needs the argon2-cffi package.')
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_PROFILES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# 0 keeps Django's default for that cost
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', 0))
+SCRYPT_WORK_FACTOR = int(os.getenv('SCRYPT_WORK_FACTOR', 0))
+SCRYPT_BLOCK_SIZE = int(os.getenv('SCRYPT_BLOCK_SIZE', 0))
+SCRYPT_PARALLELISM = int(os.getenv('SCRYPT_PARALLELISM', 0))
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 0))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 0))
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 0))
+
+# Cache - local memory per process by default; point REDIS_URL at a Redis
+# server (requires the redis package) to share it between workers
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached dashboard payload may be served before it is rebuilt.
+# Invalidation only reaches every worker through a shared cache, so 0 (not
+# cached) unless REDIS_URL is set.
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300 if os.getenv('REDIS_URL') else 0))
+
+# Authenticated tokens are remembered for TOKEN_CACHE_TTL seconds in the
+# default cache. Only with TOKEN_CACHE_SHARED (the default when the cache is
+# Redis): a per-process cache would let workers keep accepting a token or
+# user state that another worker revoked.
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 30))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', str(bool(os.getenv('REDIS_URL')))).lower() == 'true'
+
 # CORS - Enhanced configuration for production
 CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL_ORIGINS', 'False').lower() == 'true'
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if not CORS_ALLOW_ALL_ORIGINS else []
@@ -151,7 +210,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
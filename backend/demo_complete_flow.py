@@ -162,20 +162,23 @@ def demo_complete_flow():
     if response.status_code == 200:
         print("✅ Team data retrieved successfully!")
         team_data = response.json()
+        pending = requests.get(
+            f'{BASE_URL}/api/users/organization/team/', params={'status': 'pending'}, headers=headers
+        ).json()
         
         print(f"   🏢 Organization: {team_data.get('organization', {}).get('name')}")
-        print(f"   📊 Active Members: {len(team_data.get('active_members', []))}")
-        print(f"   ⏳ Pending Invitations: {len(team_data.get('pending_invitations', []))}")
+        print(f"   📊 Active Members: {len(team_data.get('results', []))}")
+        print(f"   ⏳ Pending Invitations: {len(pending.get('results', []))}")
         print()
         
         print("📋 TEAM ROSTER:")
         print("   Active Members:")
-        for member in team_data.get('active_members', []):
+        for member in team_data.get('results', []):
             status_icon = "👑" if member.get('role') == 'creator' else "👤"
             print(f"   {status_icon} {member.get('first_name')} {member.get('last_name')} ({member.get('role')}) - {member.get('email')}")
         
         print("   Pending Invitations:")
-        for invitation in team_data.get('pending_invitations', []):
+        for invitation in pending.get('results', []):
             print(f"   ⏳ {invitation.get('first_name')} {invitation.get('last_name')} ({invitation.get('role')}) - {invitation.get('email')}")
         print()
     else:
@@ -126,13 +126,16 @@ def test_email_invitation_flow():
     if response.status_code == 200:
         print("✓ Team data retrieved successfully")
         team_data = response.json()
+        pending = requests.get(
+            f'{BASE_URL}/api/users/organization/team/', params={'status': 'pending'}, headers=headers
+        ).json()
         
         print(f"  - Organization: {team_data.get('organization', {}).get('name')}")
-        print(f"  - Active members: {len(team_data.get('active_members', []))}")
-        print(f"  - Pending invitations: {len(team_data.get('pending_invitations', []))}")
+        print(f"  - Active members: {len(team_data.get('results', []))}")
+        print(f"  - Pending invitations: {len(pending.get('results', []))}")
         
         # Show active members
-        for member in team_data.get('active_members', []):
+        for member in team_data.get('results', []):
             print(f"    - {member.get('first_name')} {member.get('last_name')} ({member.get('role')})")
             
     else:
@@ -111,12 +111,13 @@ def test_view_team(creator_token):
     
     if response.status_code == 200:
         result = response.json()
+        pending = requests.get(f"{BASE_URL}/organization/team/", params={"status": "pending"}, headers=headers).json()
         print("✅ Team view successful!")
         print(f"   Organization: {result['organization']['name']}")
-        print(f"   Active Members: {len(result['active_members'])}")
-        print(f"   Pending Invitations: {len(result['pending_invitations'])}")
+        print(f"   Active Members: {len(result['results'])}")
+        print(f"   Pending Invitations: {len(pending['results'])}")
         
-        for member in result['active_members']:
+        for member in result['results']:
             print(f"     - {member['first_name']} {member['last_name']} ({member['role']})")
     else:
         print("❌ Team view failed!")
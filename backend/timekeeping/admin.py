@@ -1,37 +1,116 @@
+from datetime import date, timedelta
+
 from django.contrib import admin
-from .models import TimeEntry, Project, TimeOff
+from django.db.models import F
+from django.utils import timezone
+
+from core.admin import AutocompleteFilter, EstimatedCountPaginator
+from .models import TimeEntry, Project, TimeOff, DailyTimesheet, ClockEvent
+from .reports import local_range
+
+class ClockInMonthFilter(admin.SimpleListFilter):
+    """
+    Month drill-down for time entries. The months on offer come from the
+    daily timesheet rollup rather than a DISTINCT over every raw entry,
+    which is what date_hierarchy would run on each page load.
+    """
+    title = 'month'
+    parameter_name = 'month'
+    
+    def lookups(self, request, model_admin):
+        months = DailyTimesheet.objects.dates('date', 'month', order='DESC')
+        return [(month.strftime('%Y-%m'), month.strftime('%B %Y')) for month in months]
+    
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        year, month = map(int, self.value().split('-'))
+        first = date(year, month, 1)
+        last = (first + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        start, end = local_range(first, last, timezone.get_default_timezone())
+        return queryset.filter(clock_in__gte=start, clock_in__lt=end)
 
 class TimeEntryAdmin(admin.ModelAdmin):
     list_display = ['user', 'clock_in', 'clock_out', 'is_active', 'duration_formatted', 'project']
-    list_filter = ['user', 'clock_in', 'project']
+    list_filter = [
+        ClockInMonthFilter, ('user', AutocompleteFilter), ('organization', AutocompleteFilter),
+        'clock_in', ('project', AutocompleteFilter),
+    ]
+    list_select_related = ['user', 'project']
     search_fields = ['user__username', 'user__email', 'notes']
-    date_hierarchy = 'clock_in'
+    autocomplete_fields = ['user', 'organization', 'project']
+    # Newest first along the primary key; sorting the whole table by
+    # clock_in would need an index of its own
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(duration_value=F('clock_out') - F('clock_in'))
+    
+    @admin.display(description='Duration', ordering='duration_value')
+    def duration_formatted(self, entry):
+        return entry.duration_formatted
+
+class DailyTimesheetAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'project', 'hours', 'entry_count']
+    list_filter = [('user', AutocompleteFilter), ('organization', AutocompleteFilter), ('project', AutocompleteFilter)]
+    list_select_related = ['user', 'project']
+    search_fields = ['user__username', 'user__email']
+    date_hierarchy = 'date'
+    readonly_fields = ['user', 'organization', 'project', 'date', 'seconds', 'entry_count']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class ClockEventAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'direction', 'timestamp', 'result', 'error', 'submitted_by']
+    list_filter = ['direction', 'result']
+    list_select_related = ['user', 'submitted_by']
+    search_fields = ['key', 'user__username', 'user__email']
+    raw_id_fields = ['user', 'time_entry', 'submitted_by']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ['name', 'client', 'is_active', 'total_time_formatted']
-    list_filter = ['is_active', 'client']
+    list_display = ['name', 'organization', 'client', 'is_active', 'total_time_formatted']
+    list_filter = ['is_active', ('organization', AutocompleteFilter)]
+    # The total comes from the project's stored stats row
+    list_select_related = ['organization', 'stats']
     search_fields = ['name', 'description', 'client']
+    autocomplete_fields = ['organization']
+    
+    @admin.display(description='Total time', ordering='stats__total_duration')
+    def total_time_formatted(self, project):
+        return project.total_time_formatted
 
 class TimeOffAdmin(admin.ModelAdmin):
     list_display = ['user', 'start_date', 'end_date', 'request_type', 'status', 'days_requested']
     list_filter = ['status', 'request_type', 'start_date']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email', 'reason']
     date_hierarchy = 'start_date'
+    autocomplete_fields = ['user', 'organization', 'reviewed_by']
     
     actions = ['approve_requests', 'reject_requests']
     
+    def review_requests(self, request, queryset, status, notes=None):
+        selected = queryset.count()
+        reviewed = len(TimeOff.objects.review(queryset, status, request.user, notes))
+        message = f"{reviewed} time off request(s) were {status}."
+        if reviewed < selected:
+            message += f" {selected - reviewed} had already been reviewed."
+        self.message_user(request, message)
+    
     def approve_requests(self, request, queryset):
-        for time_off in queryset:
-            time_off.approve(request.user)
-        self.message_user(request, f"{queryset.count()} time off request(s) were approved.")
+        self.review_requests(request, queryset, 'approved')
     approve_requests.short_description = "Approve selected time off requests"
     
     def reject_requests(self, request, queryset):
-        for time_off in queryset:
-            time_off.reject(request.user, "Rejected via admin action")
-        self.message_user(request, f"{queryset.count()} time off request(s) were rejected.")
+        self.review_requests(request, queryset, 'rejected', "Rejected via admin action")
     reject_requests.short_description = "Reject selected time off requests"
 
 admin.site.register(TimeEntry, TimeEntryAdmin)
 admin.site.register(Project, ProjectAdmin)
 admin.site.register(TimeOff, TimeOffAdmin)
+admin.site.register(DailyTimesheet, DailyTimesheetAdmin)
+admin.site.register(ClockEvent, ClockEventAdmin)
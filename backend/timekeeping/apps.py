@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TimekeepingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'timekeeping'
+    
+    def ready(self):
+        import timekeeping.signals
@@ -0,0 +1,143 @@
+"""
+Caching for the dashboard payload.
+
+The per-user part of the dashboard (active entry, recent entries, pending
+time off) is cached per user, while the active projects block is shared by
+everyone in an organization and cached once per organization. Both are
+invalidated by the signal receivers in timekeeping.signals; the user blocks
+also embed project names, so editing a project drops them too. Each block
+is stored with a digest of its content for use in ETags. Hit and miss
+counters are kept in the cache itself so they can be scraped for monitoring.
+
+Invalidation only reaches other workers through a shared cache, so the
+dashboard is only cached when DASHBOARD_CACHE_TIMEOUT is set, which it is
+by default only with REDIS_URL.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+USER_BLOCK = 'user'
+PROJECTS_BLOCK = 'projects'
+
+PROJECTS_GENERATION_KEY = 'dashboard:projects:generation'
+PROJECT_DETAILS_GENERATION_KEY = 'dashboard:project-details:generation'
+
+
+def _timeout():
+    # Read on every use, 0 turns caching off
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 0)
+
+
+def _digest(data):
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return hashlib.md5(content, usedforsecurity=False).hexdigest()
+
+
+def _counter_key(block, outcome):
+    return f'dashboard:stats:{block}:{outcome}'
+
+
+def _count(block, outcome):
+    key = _counter_key(block, outcome)
+    # add() is a no-op when the counter exists; incr() is atomic on the
+    # shared backends
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def _get_or_build(block, key, build):
+    if not _timeout():
+        data = build()
+        return data, _digest(data)
+    
+    cached = cache.get(key())
+    if cached is not None:
+        _count(block, 'hits')
+        return cached
+    
+    _count(block, 'misses')
+    data = build()
+    cached = (data, _digest(data))
+    cache.set(key(), cached, _timeout())
+    return cached
+
+
+def _user_key(user_id):
+    # Bumping the generation drops the blocks of every user at once
+    generation = cache.get_or_set(PROJECT_DETAILS_GENERATION_KEY, 1, timeout=None)
+    return f'dashboard:user:{generation}:{user_id}'
+
+
+def _projects_key(organization_id):
+    # Bumping the generation drops the blocks of every organization at once
+    generation = cache.get_or_set(PROJECTS_GENERATION_KEY, 1, timeout=None)
+    return f'dashboard:projects:{generation}:{organization_id}'
+
+
+def get_user_block(user, build):
+    """
+    Return the cached per-user dashboard data and its digest, building the
+    data with build() on a miss
+    """
+    return _get_or_build(USER_BLOCK, lambda: _user_key(user.pk), build)
+
+
+def get_projects_block(organization_id, build):
+    """
+    Return the cached active projects of an organization and their digest,
+    building the data with build() on a miss
+    """
+    return _get_or_build(PROJECTS_BLOCK, lambda: _projects_key(organization_id), build)
+
+
+def _invalidate(callback):
+    # Drop the entry right away and again once the transaction commits, so
+    # a concurrent request cannot re-cache the pre-commit state
+    callback()
+    transaction.on_commit(callback)
+
+
+def _bump(*generation_keys):
+    for key in generation_keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No generation yet, so nothing has been cached
+            pass
+
+
+def invalidate_user(user_id):
+    _invalidate(lambda: cache.delete(_user_key(user_id)))
+
+
+def invalidate_projects():
+    """Drop the active projects blocks, e.g. after their totals moved"""
+    _invalidate(lambda: _bump(PROJECTS_GENERATION_KEY))
+
+
+def invalidate_project_details():
+    """Drop every block showing a project, after one was edited or deleted"""
+    _invalidate(lambda: _bump(PROJECTS_GENERATION_KEY, PROJECT_DETAILS_GENERATION_KEY))
+
+
+def cache_stats():
+    """Hit and miss counters per dashboard block"""
+    keys = {
+        (block, outcome): _counter_key(block, outcome)
+        for block in (USER_BLOCK, PROJECTS_BLOCK)
+        for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(keys.values())
+    stats = {}
+    for (block, outcome), key in keys.items():
+        stats.setdefault(block, {})[outcome] = values.get(key, 0)
+    return stats
@@ -0,0 +1,187 @@
+"""
+Bulk application of clock in/out events, as replayed by badge readers.
+
+A batch is validated with a fixed number of set-based queries (replayed
+keys, users, projects, open entries and the latest clock-out per user),
+replayed per user in timestamp order in memory, and written with
+bulk_create/bulk_update in one transaction together with the rollups and a
+ClockEvent per idempotency key.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import cache as dashboard_cache
+from .models import ClockEvent, Project, TimeEntry
+from .rollups import apply_entry_changes, contributes
+
+# Tolerated drift of the readers' clocks
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+UNKNOWN_USER = 'Unknown or inactive user.'
+UNKNOWN_PROJECT = 'Unknown or inactive project.'
+FUTURE_TIMESTAMP = 'Timestamp is in the future.'
+ALREADY_CLOCKED_IN = 'User is already clocked in.'
+OVERLAPPING_ENTRY = 'Clock in overlaps an earlier time entry.'
+NOT_CLOCKED_IN = 'User is not clocked in.'
+OUT_BEFORE_IN = 'Clock out is before clock in.'
+
+
+def result_of(event, replayed=False):
+    return {
+        'key': event.key,
+        'result': event.result,
+        'time_entry': event.time_entry_id,
+        'error': event.error,
+        'replayed': replayed,
+    }
+
+
+def apply_clock_events(events, submitted_by, users, projects=None):
+    """
+    Apply a batch of events (dicts with key, user, direction, timestamp and
+    optionally project and notes) submitted by `submitted_by`, who may only
+    clock the users in the `users` queryset onto the `projects` queryset
+    (all projects by default) of their organization. Returns one result per event,
+    in the order given; events whose key the submitter used before get
+    the stored result back.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Keys are the submitter's own: another sender's key is a fresh event
+        stored = {
+            event.key: event
+            for event in ClockEvent.objects.filter(submitted_by=submitted_by, key__in={e['key'] for e in events})
+        }
+        fresh = {}
+        for event in events:
+            if event['key'] not in stored:
+                fresh.setdefault(event['key'], event)
+        fresh = list(fresh.values())
+
+        projects = projects if projects is not None else Project.objects.all()
+        # id -> organization id, of users and projects alike
+        active_users = dict(
+            users.filter(pk__in={e['user'] for e in fresh}, is_active=True).values_list('pk', 'organization_id')
+        )
+        active_projects = dict(
+            projects.filter(
+                pk__in={e['project'] for e in fresh if e.get('project')}, is_active=True
+            ).values_list('pk', 'organization_id')
+        )
+        open_entries = {
+            entry.user_id: entry
+            for entry in TimeEntry.objects.select_for_update().filter(
+                user_id__in=active_users, clock_out__isnull=True
+            )
+        }
+        last_clock_out = dict(
+            TimeEntry.objects.filter(user_id__in=active_users, clock_out__isnull=False)
+            .order_by().values('user_id').annotate(last=Max('clock_out')).values_list('user_id', 'last')
+        )
+
+        def usable_project(project_id, organization_id):
+            # Shared projects and those of the user's organization
+            return project_id in active_projects and active_projects[project_id] in (None, organization_id)
+
+        records = {}
+        entries_by_key = {}
+        created = []
+        closed = []
+        for event in sorted(fresh, key=lambda e: (e['user'], e['timestamp'])):
+            user_id = event['user']
+            timestamp = event['timestamp']
+            record = ClockEvent(
+                key=event['key'],
+                user_id=user_id if user_id in active_users else None,
+                direction=event['direction'],
+                timestamp=timestamp,
+                submitted_by=submitted_by,
+            )
+            records[event['key']] = record
+            entry = open_entries.get(user_id)
+
+            if user_id not in active_users:
+                record.error = UNKNOWN_USER
+            elif timestamp > now + MAX_CLOCK_SKEW:
+                record.error = FUTURE_TIMESTAMP
+            elif event['direction'] == 'in':
+                if entry is not None:
+                    record.error = ALREADY_CLOCKED_IN
+                elif event.get('project') and not usable_project(event['project'], active_users[user_id]):
+                    record.error = UNKNOWN_PROJECT
+                elif user_id in last_clock_out and timestamp < last_clock_out[user_id]:
+                    record.error = OVERLAPPING_ENTRY
+                else:
+                    entry = TimeEntry(
+                        user_id=user_id,
+                        organization_id=active_users[user_id],
+                        project_id=event.get('project'),
+                        clock_in=timestamp,
+                        notes=event.get('notes', ''),
+                    )
+                    created.append(entry)
+                    open_entries[user_id] = entry
+                    record.result = 'created'
+            else:
+                if entry is None:
+                    record.error = NOT_CLOCKED_IN
+                elif timestamp < entry.clock_in:
+                    record.error = OUT_BEFORE_IN
+                else:
+                    entry.clock_out = timestamp
+                    entry.updated_at = now
+                    if event.get('notes'):
+                        entry.notes = f"{entry.notes}\n\nClock out notes: {event['notes']}" if entry.notes else event['notes']
+                    if not entry._state.adding:
+                        closed.append(entry)
+                    del open_entries[user_id]
+                    last_clock_out[user_id] = timestamp
+                    record.result = 'closed'
+
+            if record.error:
+                record.result = 'rejected'
+            else:
+                entries_by_key[event['key']] = entry
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            TimeEntry.objects.bulk_create(created, batch_size=500)
+            # bulk_create() bypasses the rollup signals
+            changes = [(None, entry.rollup_state) for entry in created]
+        else:
+            # MySQL doesn't hand back the new ids, and nothing tells the new
+            # rows apart from older ones of the same user and clock_in, so
+            # insert them one by one; save() updates the rollups itself
+            for entry in created:
+                entry.save()
+            changes = []
+        TimeEntry.objects.bulk_update(closed, ['clock_out', 'notes', 'updated_at'], batch_size=500)
+
+        for key, entry in entries_by_key.items():
+            records[key].time_entry_id = entry.pk
+        ClockEvent.objects.bulk_create(records.values(), batch_size=500)
+
+        # bulk_update() bypasses the rollup signals too
+        changes += [(entry._original_state, entry.rollup_state) for entry in closed]
+        apply_entry_changes(changes)
+        for entry in created + closed:
+            entry._original_state = entry.rollup_state
+
+        for user_id in {entry.user_id for entry in created + closed}:
+            dashboard_cache.invalidate_user(user_id)
+        if any(contributes(state) for _, state in changes):
+            dashboard_cache.invalidate_projects()
+
+    results = []
+    seen = set()
+    for event in events:
+        key = event['key']
+        if key in stored:
+            results.append(result_of(stored[key], replayed=True))
+        else:
+            results.append(result_of(records[key], replayed=key in seen))
+            seen.add(key)
+    return results
@@ -0,0 +1,204 @@
+"""
+Streaming timesheet exports.
+
+Rows are read as plain tuples with values_list(), one bounded keyset query
+per chunk (see keyset_chunks()), and are encoded and sent chunk by chunk as
+they arrive. Neither the queryset nor the file is ever held in memory, on
+any database backend, and the first bytes go out as soon as the first
+chunk has been read.
+"""
+import csv
+import io
+import re
+import zipfile
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import format_duration
+
+FORMATS = ('csv', 'xlsx')
+
+HEADER = ['id', 'user_email', 'project', 'clock_in', 'clock_out', 'duration', 'hours', 'notes']
+
+# Rows fetched per database round-trip and encoded per chunk sent
+CHUNK_SIZE = 2000
+
+# Leading characters that make spreadsheet applications evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Characters XML 1.0 does not allow, even escaped
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def keyset_chunks(queryset, field, key, descending=False, chunk_size=CHUNK_SIZE):
+    """
+    Yield the rows of `queryset` ordered by (field, id) in lists of at most
+    `chunk_size`. Each chunk is its own LIMITed query continuing after the
+    last row of the previous one, so memory stays bounded even where
+    QuerySet.iterator() can't use a server-side cursor and the driver would
+    buffer the whole result (MySQL through PyMySQL). `key` returns the
+    (field, id) values of a row.
+    """
+    queryset = queryset.order_by(f'-{field}' if descending else field, 'id')
+    after = Q()
+    while True:
+        chunk = list(queryset.filter(after)[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        value, pk = key(chunk[-1])
+        after = Q(**{f"{field}__{'lt' if descending else 'gt'}": value}) | Q(**{field: value, 'id__gt': pk})
+
+
+def export_rows(entries, tzinfo):
+    """Yield the export columns of every entry, reading plain tuples a chunk at a time"""
+    rows = entries.values_list('id', 'user__email', 'project__name', 'clock_in', 'clock_out', 'notes')
+    for chunk in keyset_chunks(rows, 'clock_in', key=lambda row: (row[3], row[0]), chunk_size=CHUNK_SIZE):
+        for pk, email, project, clock_in, clock_out, notes in chunk:
+            seconds = (clock_out - clock_in).total_seconds() if clock_out else None
+            yield [
+                pk,
+                email,
+                project or '',
+                clock_in.astimezone(tzinfo).isoformat(),
+                clock_out.astimezone(tzinfo).isoformat() if clock_out else '',
+                format_duration(seconds) if seconds is not None else '',
+                round(seconds / 3600, 2) if seconds is not None else '',
+                notes,
+            ]
+
+
+def safe_cell(value):
+    """Keep free text from being evaluated as a formula when opened in a spreadsheet"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def chunks(rows):
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, CHUNK_SIZE)):
+        yield chunk
+
+
+def csv_stream(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for chunk in chunks(rows):
+        writer.writerows([safe_cell(value) for value in row] for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _Pipe(io.RawIOBase):
+    """Write-only, unseekable sink that zipfile writes into and the stream drains"""
+
+    def __init__(self):
+        self.data = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.data)
+        self.data = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Timesheet" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_cell(value):
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_row(row):
+    return '<row>' + ''.join(xlsx_cell(value) for value in row) + '</row>'
+
+
+def xlsx_stream(rows):
+    """
+    Write a minimal single-sheet workbook (inline strings, no styles) with
+    the standard library's zipfile into an unseekable pipe, yielding the
+    compressed bytes as every chunk of rows is written
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        yield pipe.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + xlsx_row(HEADER)
+            ).encode())
+            for chunk in chunks(rows):
+                sheet.write(''.join(xlsx_row(row) for row in chunk).encode())
+                yield pipe.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield pipe.drain()
+
+
+def export_response(entries, file_format, tzinfo=None, filename='timesheet'):
+    """A streaming download of `entries` as CSV or XLSX"""
+    rows = export_rows(entries, tzinfo or timezone.get_default_timezone())
+    if file_format == 'xlsx':
+        stream = xlsx_stream(rows)
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        stream = csv_stream(rows)
+        content_type = 'text/csv; charset=utf-8'
+    return StreamingHttpResponse(stream, content_type=content_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{file_format}"',
+    })
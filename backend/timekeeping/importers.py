@@ -0,0 +1,249 @@
+"""
+Streaming import of historical time entries from CSV or NDJSON.
+
+Rows are parsed one at a time from the stream, resolved against in-memory
+maps of user emails and project names loaded up front, and inserted in
+chunks with bulk_create. Every chunk is committed together with its rollup
+changes, so memory use is bounded by the chunk size rather than the file.
+Rows that can't be decoded or parsed are rejected one by one, like invalid
+rows, rather than aborting an import whose first chunks are committed.
+
+Each row needs user_email, clock_in and clock_out; project (the name of a
+project of the user's organization or a shared one) and notes are
+optional. Naive timestamps are taken to be in TIME_ZONE. Inactive users
+can be back-filled too; a project name that several projects of the same
+organization share is rejected rather than guessed.
+"""
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache as dashboard_cache
+from .models import Project, TimeEntry
+from .rollups import apply_entry_changes, contributes
+
+FORMATS = ('csv', 'ndjson')
+
+# Stands in for the id of a project name several projects share
+AMBIGUOUS = object()
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    """Counters of an import, with the first `max_errors` rejected rows"""
+
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed) if self.elapsed else 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+def text_stream(binary, encoding='utf-8-sig'):
+    """
+    Decode a binary file object lazily; utf-8-sig drops a BOM written by
+    spreadsheets. Undecodable bytes are kept as lone surrogates, so that the
+    parsers can reject the rows holding them instead of failing mid-stream.
+    """
+    return io.TextIOWrapper(binary, encoding=encoding, errors='surrogateescape', newline='')
+
+
+def is_encodable(text):
+    """False for text holding bytes text_stream() couldn't decode"""
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def parse_csv(stream):
+    """Yield (line number, row) for the records of a CSV stream with a header row, or a RowError for malformed ones"""
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            # The reader carries on with the next line
+            yield reader.reader.line_num, RowError(f'Invalid CSV: {exc}')
+            continue
+        values = [value for value in row.values() if isinstance(value, str)]
+        if not all(is_encodable(value) for value in values):
+            yield reader.line_num, RowError('Invalid byte sequence for the file encoding')
+            continue
+        yield reader.line_num, row
+
+
+def parse_ndjson(stream):
+    """Yield (line number, row) for the lines of an NDJSON stream, or a RowError for malformed ones"""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        if not is_encodable(line):
+            yield line_number, RowError('Invalid byte sequence for the file encoding')
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, RowError(f'Invalid JSON: {exc}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError('Expected a JSON object')
+            continue
+        yield line_number, row
+
+
+def parse_timestamp(value, name):
+    if not value:
+        raise RowError(f'{name} is required')
+    try:
+        parsed = parse_datetime(str(value).strip())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError(f'{name} is not a valid datetime: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class TimeEntryImporter:
+    """
+    Import rows into time entries for the users in `users` (all users by
+    default) and the projects in `projects` (all by default), looked up by
+    email and name
+    """
+
+    def __init__(self, users=None, projects=None, chunk_size=2000, max_errors=100):
+        users = users if users is not None else get_user_model().objects.all()
+        projects = projects if projects is not None else Project.objects.all()
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        # Inactive users included, so that the time of people who have left
+        # can be back-filled
+        rows = users.values_list('pk', 'email', 'organization_id')
+        self.users = {email.lower(): (pk, organization_id) for pk, email, organization_id in rows}
+        # Names are only unique by convention, so a name shared within an
+        # organization resolves to AMBIGUOUS
+        self.project_ids = {}
+        for pk, organization_id, name in projects.values_list('pk', 'organization_id', 'name'):
+            key = (organization_id, name)
+            self.project_ids[key] = AMBIGUOUS if key in self.project_ids else pk
+
+    def build_entry(self, row):
+        email = (row.get('user_email') or '').strip().lower()
+        if email not in self.users:
+            raise RowError(f'Unknown user: {email!r}' if email else 'user_email is required')
+        user_id, organization_id = self.users[email]
+
+        project_name = (row.get('project') or '').strip()
+        project_id = None
+        if project_name:
+            project_id = self.project_ids.get(
+                (organization_id, project_name), self.project_ids.get((None, project_name))
+            )
+            if project_id is None:
+                raise RowError(f'Unknown project: {project_name!r}')
+            if project_id is AMBIGUOUS:
+                raise RowError(f'Several projects are named {project_name!r}')
+
+        clock_in = parse_timestamp(row.get('clock_in'), 'clock_in')
+        clock_out = parse_timestamp(row.get('clock_out'), 'clock_out')
+        if clock_out < clock_in:
+            raise RowError('clock_out is before clock_in')
+
+        return TimeEntry(
+            user_id=user_id,
+            organization_id=organization_id,
+            project_id=project_id,
+            clock_in=clock_in,
+            clock_out=clock_out,
+            notes=row.get('notes') or '',
+        )
+
+    def entries(self, rows, report):
+        for line, row in rows:
+            report.rows += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                yield self.build_entry(row)
+            except RowError as exc:
+                report.reject(line, str(exc))
+
+    def run(self, rows, progress=None):
+        """
+        Import the (line number, row) pairs of `rows`, calling
+        progress(report) after every chunk
+        """
+        report = ImportReport(self.max_errors)
+        entries = self.entries(rows, report)
+        touched_users = set()
+        touched_projects = False
+
+        while chunk := list(islice(entries, self.chunk_size)):
+            with transaction.atomic():
+                TimeEntry.objects.bulk_create(chunk)
+                # bulk_create() bypasses the rollup signals
+                changes = [(None, entry.rollup_state) for entry in chunk]
+                apply_entry_changes(changes)
+            report.imported += len(chunk)
+            report.elapsed = time.perf_counter() - report.started
+            touched_users.update(entry.user_id for entry in chunk)
+            touched_projects = touched_projects or any(contributes(state) for _, state in changes)
+            if progress:
+                progress(report)
+
+        for user_id in touched_users:
+            dashboard_cache.invalidate_user(user_id)
+        if touched_projects:
+            dashboard_cache.invalidate_projects()
+
+        report.elapsed = time.perf_counter() - report.started
+        return report
+
+
+def parse(stream, format):
+    if format == 'csv':
+        return parse_csv(stream)
+    return parse_ndjson(stream)
+
+
+def import_time_entries(stream, format, users=None, projects=None, chunk_size=2000, progress=None):
+    """Import a text stream in the given format; returns the ImportReport"""
+    importer = TimeEntryImporter(users=users, projects=projects, chunk_size=chunk_size)
+    return importer.run(parse(stream, format), progress=progress)
@@ -0,0 +1,248 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.benchmarks import is_test_database
+from timekeeping.models import DailyTimesheet, TimeEntry, TimeOff
+from users.models import Organization
+from timekeeping.reports import report_rows, timesheet_rows
+
+BENCH_PREFIX = 'bench-'
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a benchmark dataset and report EXPLAIN plans and p50/p99 latencies '
+        'for the hot time entry and time off queries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Number of users to seed')
+        parser.add_argument(
+            '--organizations', type=int, default=10, help='Number of organizations to spread the users over'
+        )
+        parser.add_argument('--entries-per-user', type=int, default=250, help='Time entries to seed per user')
+        parser.add_argument('--time-off-per-user', type=int, default=10, help='Time off requests to seed per user')
+        parser.add_argument('--iterations', type=int, default=200, help='Timed runs per query')
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Also run the suite with the composite indexes temporarily dropped',
+        )
+        parser.add_argument(
+            '--reports', action='store_true',
+            help='Also time the report aggregations over the last 30 days of every user',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data afterwards')
+        parser.add_argument(
+            '--i-know-this-is-a-scratch-db', action='store_true', dest='scratch_db',
+            help='Run against a database that is not a test database; it gets seeded and, '
+                 'with --compare, has indexes dropped and recreated',
+        )
+
+    def handle(self, *args, **options):
+        if not options['scratch_db'] and not is_test_database(connection):
+            raise CommandError(
+                f"{connection.settings_dict['NAME']!r} doesn't look like a test database. The benchmark writes "
+                'to it and --compare drops indexes; pass --i-know-this-is-a-scratch-db to run anyway.'
+            )
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2 to compute percentiles.')
+        self.iterations = options['iterations']
+        self.reports = options['reports']
+        random.seed(42)
+
+        # Data kept by an earlier run goes for good; this run's seed is
+        # rolled back rather than deleted, which would run the rollup
+        # signals of every seeded row
+        self.cleanup()
+        with transaction.atomic():
+            users = self.seed(
+                options['users'], options['organizations'], options['entries_per_user'], options['time_off_per_user']
+            )
+            if options['compare']:
+                with self.indexes_dropped():
+                    self.run_suite('without composite indexes', users)
+            self.run_suite('with composite indexes', users)
+            transaction.set_rollback(not options['keep'])
+        if options['compare'] and not options['keep'] and not connection.features.can_rollback_ddl:
+            # MySQL commits the open transaction on every index change
+            self.cleanup()
+
+    def seed(self, user_count, organization_count, entries_per_user, time_off_per_user):
+        UserModel = get_user_model()
+        self.stdout.write(
+            f'Seeding {organization_count} organizations with {user_count} users, '
+            f'{user_count * entries_per_user} time entries '
+            f'and {user_count * time_off_per_user} time off requests...'
+        )
+
+        organizations = Organization.objects.bulk_create(
+            Organization(name=f'{BENCH_PREFIX}{index}', slug=f'{BENCH_PREFIX}{index}', max_users=user_count)
+            for index in range(max(organization_count, 1))
+        )
+        password = make_password(None)
+        UserModel.objects.bulk_create(
+            (
+                UserModel(
+                    username=f'{BENCH_PREFIX}{index}',
+                    email=f'{BENCH_PREFIX}{index}@benchmark.invalid',
+                    password=password,
+                    organization=organizations[index % len(organizations)],
+                )
+                for index in range(user_count)
+            ),
+            batch_size=1000,
+        )
+        # bulk_create() sets no organization_id on the time rows; the seed
+        # writes it itself, as every bulk write path does
+        users = dict(
+            UserModel.objects.filter(username__startswith=BENCH_PREFIX).values_list('id', 'organization_id')
+        )
+        user_ids = list(users)
+        self.organization_of = users
+
+        now = timezone.now()
+        today = now.date()
+
+        def entries():
+            for user_id in user_ids:
+                for day in range(entries_per_user, 0, -1):
+                    clock_in = now - timedelta(days=day, hours=random.randint(0, 4))
+                    yield TimeEntry(
+                        user_id=user_id,
+                        organization_id=users[user_id],
+                        clock_in=clock_in,
+                        clock_out=clock_in + timedelta(hours=8),
+                    )
+                # Every user has one entry still in progress
+                yield TimeEntry(
+                    user_id=user_id, organization_id=users[user_id], clock_in=now - timedelta(hours=1)
+                )
+
+        def time_off():
+            for user_id in user_ids:
+                for _ in range(time_off_per_user):
+                    start_date = today + timedelta(days=random.randint(-180, 180))
+                    yield TimeOff(
+                        user_id=user_id,
+                        organization_id=users[user_id],
+                        start_date=start_date,
+                        end_date=start_date + timedelta(days=random.randint(0, 5)),
+                        request_type='vacation',
+                        status=random.choice(['pending', 'approved', 'rejected']),
+                    )
+
+        for chunk in chunked(entries(), 5000):
+            TimeEntry.objects.bulk_create(chunk)
+        for chunk in chunked(time_off(), 5000):
+            TimeOff.objects.bulk_create(chunk)
+        # bulk_create() bypasses the rollup signals
+        DailyTimesheet.objects.rebuild(user_ids=user_ids)
+
+        return user_ids
+
+    def cleanup(self):
+        """Delete the data of a run that kept it; the rows cascade from the users and organizations"""
+        with transaction.atomic():
+            get_user_model().objects.filter(username__startswith=BENCH_PREFIX).delete()
+            Organization.objects.filter(slug__startswith=BENCH_PREFIX).delete()
+
+    def queries(self, user_id):
+        today = timezone.now().date()
+        organization_id = self.organization_of[user_id]
+        return {
+            'active entry': TimeEntry.objects.filter(user_id=user_id, clock_out__isnull=True).order_by(),
+            'recent entries': TimeEntry.objects.filter(user_id=user_id).order_by('-clock_in')[:5],
+            'pending time off': TimeOff.objects.filter(user_id=user_id, status='pending'),
+            'upcoming approved time off': TimeOff.objects.filter(
+                status='approved', start_date__gte=today
+            ).order_by('start_date')[:20],
+            'organization entries of the last week': TimeEntry.objects.filter(
+                organization_id=organization_id, clock_in__gte=timezone.now() - timedelta(days=7)
+            ).order_by('-clock_in'),
+            'organization pending time off': TimeOff.objects.filter(
+                organization_id=organization_id, status='pending', start_date__gte=today
+            ).order_by('start_date'),
+        }
+
+    def report_queries(self, user_id):
+        tzinfo = timezone.get_current_timezone()
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=30)
+        entries = TimeEntry.objects.all()
+        timesheets = DailyTimesheet.objects.filter(date__gte=start_date, date__lte=end_date)
+        return {
+            f'report by {period}, user and project': partial(
+                report_rows, entries, period, ['user', 'project'], tzinfo, start_date, end_date
+            )
+            for period in ('day', 'week', 'month')
+        } | {
+            f'timesheet rollup by {period}, user and project': timesheet_rows(
+                timesheets, period, ['user', 'project']
+            )
+            for period in ('day', 'week', 'month')
+        } | {
+            'report by day for one user': partial(
+                report_rows, entries.filter(user_id=user_id), 'day', ['project'], tzinfo, start_date, end_date
+            ),
+            'timesheet rollup by day for one organization': timesheet_rows(
+                timesheets.filter(organization_id=self.organization_of[user_id]), 'day', ['user', 'project']
+            ),
+        }
+
+    def run_suite(self, label, user_ids):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label} =='))
+
+        suites = [self.queries]
+        if self.reports:
+            suites.append(self.report_queries)
+        for suite in suites:
+            for name, query in suite(user_ids[0]).items():
+                self.stdout.write(self.style.MIGRATE_LABEL(f'\n{name}'))
+                # Raw reports run more than one query, and are timed as a whole
+                if not callable(query):
+                    self.stdout.write(query.explain())
+
+                timings = []
+                for _ in range(self.iterations):
+                    query = suite(random.choice(user_ids))[name]
+                    started = time.perf_counter()
+                    list(query() if callable(query) else query)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                percentiles = statistics.quantiles(timings, n=100)
+                self.stdout.write(f'p50 {percentiles[49]:.3f} ms, p99 {percentiles[98]:.3f} ms')
+
+    @contextmanager
+    def indexes_dropped(self):
+        """Temporarily drop the composite indexes declared on the time models"""
+        dropped = [
+            (model, index)
+            for model in (TimeEntry, TimeOff)
+            for index in model._meta.indexes
+        ]
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.remove_index(model, index)
+        try:
+            yield
+        finally:
+            with connection.schema_editor() as editor:
+                for model, index in dropped:
+                    editor.add_index(model, index)
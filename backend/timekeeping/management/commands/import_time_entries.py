@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from timekeeping.importers import FORMATS, import_time_entries, text_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Import completed time entries from a CSV or NDJSON file, streaming it in chunks. '
+        'Rows need user_email, clock_in and clock_out; project (by name) and notes are optional.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input")
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='file_format',
+            help='File format (defaults to the file extension)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows inserted per transaction')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Can't tell the format of {path!r}; pass --format.")
+
+        def progress(report):
+            self.stdout.write(
+                f'{report.imported} imported, {report.rejected} rejected '
+                f'({report.rows_per_second} rows/s)'
+            )
+
+        binary = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = import_time_entries(
+                text_stream(binary), file_format, chunk_size=options['chunk_size'], progress=progress
+            )
+        finally:
+            if binary is not sys.stdin.buffer:
+                binary.close()
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['error']}"))
+        if report.rejected > len(report.errors):
+            self.stdout.write(self.style.WARNING(f'... and {report.rejected - len(report.errors)} more'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.imported} of {report.rows} row(s) in {report.elapsed:.1f}s '
+            f'({report.rows_per_second} rows/s); {report.rejected} rejected.'
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timekeeping.models import DailyTimesheet
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily timesheet rollup from the time entries, or verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the stored days against the time entries and report mismatches',
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Limit to the given user id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if not options['verify']:
+            days = DailyTimesheet.objects.rebuild(user_ids=user_ids)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(days)} daily timesheet row(s).'))
+            return
+
+        expected = DailyTimesheet.objects.compute(user_ids)
+        stored = DailyTimesheet.objects.all()
+        if user_ids is not None:
+            stored = stored.filter(user_id__in=user_ids)
+        stored = {(day.user_id, day.project_id, day.date): day for day in stored.iterator()}
+
+        mismatches = 0
+        for key in sorted(set(expected) | set(stored), key=lambda key: (key[0], key[2], key[1] or 0)):
+            want = expected.get(key, DailyTimesheet(seconds=0, entry_count=0))
+            have = stored.get(key, DailyTimesheet(seconds=0, entry_count=0))
+            if (want.seconds, want.entry_count) != (have.seconds, have.entry_count):
+                mismatches += 1
+                user_id, project_id, date = key
+                self.stdout.write(
+                    f'User {user_id}, project {project_id}, {date}: stored {have.seconds}s / '
+                    f'{have.entry_count} entries, expected {want.seconds}s / {want.entry_count} entries'
+                )
+
+        if mismatches:
+            raise CommandError(f'{mismatches} day(s) are stale; run without --verify to rebuild.')
+        self.stdout.write(self.style.SUCCESS(f'{len(expected)} daily timesheet row(s) are up to date.'))
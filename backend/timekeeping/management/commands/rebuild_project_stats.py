@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timekeeping.models import ProjectStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored project time totals from the time entries, or verify them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the stored totals against the time entries and report mismatches',
+        )
+        parser.add_argument(
+            '--project', type=int, action='append', dest='project_ids',
+            help='Limit to the given project id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        project_ids = options['project_ids']
+
+        if not options['verify']:
+            stats = ProjectStats.objects.rebuild(project_ids=project_ids)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(stats)} project(s).'))
+            return
+
+        expected = ProjectStats.objects.compute(project_ids)
+        stored = ProjectStats.objects.all()
+        if project_ids is not None:
+            stored = stored.filter(project_id__in=project_ids)
+        stored = {stats.project_id: stats for stats in stored}
+
+        mismatches = 0
+        for project_id in sorted(set(expected) | set(stored)):
+            want = expected.get(project_id, ProjectStats(project_id=project_id))
+            have = stored.get(project_id, ProjectStats(project_id=project_id))
+            fields = ('total_duration', 'entry_count', 'last_activity_at')
+            if any(getattr(want, field) != getattr(have, field) for field in fields):
+                mismatches += 1
+                self.stdout.write(
+                    f'Project {project_id}: stored {have.total_duration} / {have.entry_count} entries / '
+                    f'{have.last_activity_at}, expected {want.total_duration} / {want.entry_count} entries / '
+                    f'{want.last_activity_at}'
+                )
+
+        if mismatches:
+            raise CommandError(f'{mismatches} project(s) have stale stats; run without --verify to rebuild.')
+        self.stdout.write(self.style.SUCCESS(f'Stats for {len(expected)} project(s) are up to date.'))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:42
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Sum
+
+
+def backfill_project_stats(apps, schema_editor):
+    TimeEntry = apps.get_model('timekeeping', 'TimeEntry')
+    ProjectStats = apps.get_model('timekeeping', 'ProjectStats')
+    rows = TimeEntry.objects.filter(
+        clock_out__isnull=False, project__isnull=False
+    ).order_by().values('project_id').annotate(
+        total_duration=Sum(F('clock_out') - F('clock_in')),
+        entry_count=Count('id'),
+        last_activity_at=Max('clock_out'),
+    )
+    ProjectStats.objects.bulk_create(
+        (ProjectStats(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='timekeeping.project')),
+                ('total_duration', models.DurationField(default=datetime.timedelta(0))),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'project stats',
+            },
+        ),
+        migrations.RunPython(backfill_project_stats, migrations.RunPython.noop),
+    ]
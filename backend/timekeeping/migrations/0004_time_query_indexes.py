@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0003_projectstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'clock_out'], name='timeentry_user_clock_out_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', '-clock_in'], name='timeentry_user_clock_in_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeoff',
+            index=models.Index(fields=['user', 'status'], name='timeoff_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeoff',
+            index=models.Index(fields=['status', 'start_date'], name='timeoff_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Sum
+
+
+def close_duplicate_open_entries(apps, schema_editor):
+    """
+    Before the constraint can be added, close all but the newest open entry
+    of every user (left behind by concurrent clock-ins) with zero duration
+    """
+    TimeEntry = apps.get_model('timekeeping', 'TimeEntry')
+    ProjectStats = apps.get_model('timekeeping', 'ProjectStats')
+
+    user_ids = TimeEntry.objects.filter(clock_out__isnull=True).order_by().values('user_id').annotate(
+        open_entries=Count('id')
+    ).filter(open_entries__gt=1).values_list('user_id', flat=True)
+
+    affected_projects = set()
+    for user_id in user_ids:
+        stale = TimeEntry.objects.filter(user_id=user_id, clock_out__isnull=True).order_by('-clock_in')[1:]
+        for entry in stale:
+            entry.clock_out = entry.clock_in
+            entry.notes = (entry.notes + '\n\n' if entry.notes else '') + 'Closed automatically: duplicate open entry.'
+            entry.save(update_fields=['clock_out', 'notes'])
+            if entry.project_id:
+                affected_projects.add(entry.project_id)
+
+    # The closed entries now count towards their projects' stats
+    rows = TimeEntry.objects.filter(
+        project_id__in=affected_projects, clock_out__isnull=False
+    ).order_by().values('project_id').annotate(
+        total_duration=Sum(F('clock_out') - F('clock_in')),
+        entry_count=Count('id'),
+        last_activity_at=Max('clock_out'),
+    )
+    for row in rows:
+        ProjectStats.objects.update_or_create(project_id=row.pop('project_id'), defaults=row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0004_time_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeentry',
+            name='open_for_user',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(clock_out__isnull=True, then=models.F('user'))), output_field=models.BigIntegerField(null=True)),
+        ),
+        migrations.RunPython(close_duplicate_open_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timeentry',
+            constraint=models.UniqueConstraint(fields=('open_for_user',), name='unique_open_time_entry_per_user'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0005_single_open_time_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectstats',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
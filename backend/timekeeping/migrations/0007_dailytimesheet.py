@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:53
+
+import datetime
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_daily_timesheets(apps, schema_editor):
+    """Split every completed entry at local midnight and sum the pieces per user, project and day"""
+    TimeEntry = apps.get_model('timekeeping', 'TimeEntry')
+    DailyTimesheet = apps.get_model('timekeeping', 'DailyTimesheet')
+    tzinfo = timezone.get_default_timezone()
+
+    days = {}
+    rows = TimeEntry.objects.filter(clock_out__isnull=False).order_by().values_list(
+        'user_id', 'project_id', 'clock_in', 'clock_out'
+    )
+    for user_id, project_id, clock_in, clock_out in rows.iterator(chunk_size=2000):
+        start = clock_in.astimezone(tzinfo)
+        end = clock_out.astimezone(tzinfo)
+        while True:
+            if start.date() < end.date():
+                piece_end = datetime.datetime.combine(
+                    start.date() + datetime.timedelta(days=1), datetime.time.min, tzinfo=tzinfo
+                )
+            else:
+                piece_end = end
+            day = days.setdefault((user_id, project_id, start.date()), [0, 0])
+            day[0] += round(piece_end.timestamp()) - round(start.timestamp())
+            day[1] += 1
+            if piece_end == end:
+                break
+            start = piece_end
+
+    DailyTimesheet.objects.bulk_create(
+        (
+            DailyTimesheet(user_id=user_id, project_id=project_id, date=date, seconds=seconds, entry_count=count)
+            for (user_id, project_id, date), (seconds, count) in days.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0006_projectstats_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTimesheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('seconds', models.BigIntegerField(default=0)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('project_key', models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce(models.F('project'), models.Value(0)), output_field=models.BigIntegerField())),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_timesheets', to='timekeeping.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_timesheets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'project'], name='dailytimesheet_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date', 'project_key'), name='unique_daily_timesheet')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_timesheets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0008_clockevent'),
+        ('users', '0007_customuser_lower_lookups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailytimesheet',
+            name='organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_timesheets', to='users.organization'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='projects', to='users.organization'),
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_entries', to='users.organization'),
+        ),
+        migrations.AddField(
+            model_name='timeoff',
+            name='organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_off_requests', to='users.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='dailytimesheet',
+            index=models.Index(fields=['organization', 'date'], name='dailytimesheet_org_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['organization', 'is_active'], name='project_org_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['organization', '-clock_in'], name='timeentry_org_clock_in_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeoff',
+            index=models.Index(fields=['organization', 'status', 'start_date'], name='timeoff_org_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import migrations, models
+
+# Rows updated per statement, each committed on its own so that a large
+# table is never locked as a whole
+CHUNK_SIZE = 5000
+
+
+def backfill_from_users(apps, model_name):
+    """Copy the user's organization onto the rows of a model, one primary key range at a time"""
+    Model = apps.get_model('timekeeping', model_name)
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    organization = User.objects.filter(pk=models.OuterRef('user_id')).values('organization_id')[:1]
+
+    last_pk = Model.objects.aggregate(last=models.Max('pk'))['last'] or 0
+    for start in range(0, last_pk + 1, CHUNK_SIZE):
+        Model.objects.filter(
+            pk__gte=start, pk__lt=start + CHUNK_SIZE, organization__isnull=True
+        ).update(organization_id=models.Subquery(organization))
+
+
+def backfill_organizations(apps, schema_editor):
+    for model_name in ('TimeEntry', 'TimeOff', 'DailyTimesheet'):
+        backfill_from_users(apps, model_name)
+
+    # A project belongs to an organization when all of its entries do;
+    # projects used by several organizations, or none, stay shared
+    TimeEntry = apps.get_model('timekeeping', 'TimeEntry')
+    Project = apps.get_model('timekeeping', 'Project')
+    owners = {}
+    pairs = (
+        TimeEntry.objects.filter(project__isnull=False).order_by()
+        .values_list('project_id', 'organization_id').distinct()
+    )
+    for project_id, organization_id in pairs.iterator(chunk_size=CHUNK_SIZE):
+        owners.setdefault(project_id, set()).add(organization_id)
+    for project_id, organizations in owners.items():
+        if len(organizations) == 1 and None not in organizations:
+            Project.objects.filter(pk=project_id).update(organization_id=organizations.pop())
+
+
+class Migration(migrations.Migration):
+
+    # Commit every chunk instead of holding one transaction over all tables
+    atomic = False
+
+    dependencies = [
+        ('timekeeping', '0009_organization'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_organizations, migrations.RunPython.noop),
+    ]
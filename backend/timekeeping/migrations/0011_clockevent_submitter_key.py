@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timekeeping', '0010_backfill_organization'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='clockevent',
+            name='key',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='clockevent',
+            constraint=models.UniqueConstraint(fields=('submitted_by', 'key'), name='clockevent_submitter_key_uniq'),
+        ),
+    ]
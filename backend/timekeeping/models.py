@@ -1,10 +1,131 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Count, F, Max, Sum, Value, sql
+from django.db.models.functions import Coalesce, Concat
+from django.db.models.signals import post_save
+from django.db.models.base import DEFERRED
 from django.conf import settings
 from django.utils import timezone
+from collections import namedtuple
+
+# The columns of a time entry that feed the rollup tables
+EntryState = namedtuple('EntryState', ['user_id', 'organization_id', 'project_id', 'clock_in', 'clock_out'])
+
+def format_duration(seconds):
+    """Format a number of seconds as HH:MM:SS"""
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+
+def split_by_day(clock_in, clock_out, tzinfo):
+    """
+    Split [clock_in, clock_out) at local midnights in `tzinfo`, yielding
+    (local date, whole seconds) for every day the interval touches
+    """
+    start = clock_in.astimezone(tzinfo)
+    end = clock_out.astimezone(tzinfo)
+    while start.date() < end.date():
+        midnight = datetime.combine(start.date() + timedelta(days=1), time.min, tzinfo=tzinfo)
+        if midnight == end:
+            break
+        # Differences of timestamps, so pieces add up exactly and DST is respected
+        yield start.date(), round(midnight.timestamp()) - round(start.timestamp())
+        start = midnight
+    yield start.date(), round(end.timestamp()) - round(start.timestamp())
+
+class ReturningUpdateManager(models.Manager):
+    """Conditional UPDATEs that report the rows they changed"""
+    
+    def can_return_from_update(self):
+        """Whether the database supports UPDATE ... RETURNING"""
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            return True
+        if connection.vendor == 'sqlite':
+            return connection.Database.sqlite_version_info >= (3, 35)
+        # MySQL has no RETURNING at all and MariaDB only for INSERT/DELETE
+        return False
+    
+    def update_returning(self, queryset, **changes):
+        """
+        Apply queryset.update(**changes) as a single UPDATE ... RETURNING and
+        return the updated rows as model instances
+        """
+        query = queryset.query.chain(sql.UpdateQuery)
+        query.clear_ordering(force=True)
+        query.add_update_values(changes)
+        compiler = query.get_compiler(self.db)
+        update_sql, params = compiler.as_sql()
+        
+        connection = connections[self.db]
+        fields = self.model._meta.concrete_fields
+        update_sql += ' RETURNING ' + ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(update_sql, params)
+            rows = cursor.fetchall()
+        
+        converters = compiler.get_converters([field.get_col(self.model._meta.db_table) for field in fields])
+        if converters:
+            rows = compiler.apply_converters(rows, converters)
+        field_names = [field.attname for field in fields]
+        return [self.model.from_db(self.db, field_names, row) for row in rows]
+
+class TimeEntryManager(ReturningUpdateManager):
+    def close_active_entry(self, user, notes=None):
+        """
+        Close the user's open entry with a single conditional UPDATE and
+        return it, or None if there was no open entry. Notes are appended
+        in SQL the same way the clock-out form always did. The closed row
+        comes back through RETURNING where supported and is read back
+        otherwise, with its user and project loaded either way.
+        """
+        now = timezone.now()
+        changes = {'clock_out': now, 'updated_at': now}
+        if notes is not None:
+            changes['notes'] = models.Case(
+                models.When(notes='', then=Value(notes)),
+                default=Concat(F('notes'), Value(f"\n\nClock out notes: {notes}")),
+                output_field=models.TextField(),
+            )
+        active = self.filter(user=user, clock_out__isnull=True)
+        
+        with transaction.atomic(using=self.db):
+            if self.can_return_from_update():
+                closed = self.update_returning(active, **changes)
+                if not closed:
+                    return None
+                entry = closed[0]
+                entry.user = user
+                # RETURNING can't join, so read the project as select_related() would
+                if entry.project_id is not None:
+                    entry.project = Project._base_manager.get(pk=entry.project_id)
+            else:
+                if not active.update(**changes):
+                    return None
+                entry = self.select_related('user', 'project').filter(
+                    user=user, clock_out=now
+                ).order_by('-clock_in')[0]
+            
+            # QuerySet.update() bypasses save(), so notify the rollup
+            # receivers as if the open entry had been saved
+            entry._original_state = entry.rollup_state._replace(clock_out=None)
+            post_save.send(
+                sender=self.model, instance=entry, created=False,
+                update_fields=frozenset(changes), raw=False, using=self.db,
+            )
+        entry._original_state = entry.rollup_state
+        return entry
 
 class TimeEntry(models.Model):
     """Model for tracking time entries"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='time_entries')
+    # The user's organization, copied when the entry is created so that
+    # organization wide queries filter on an indexed column of their own
+    # instead of joining the users. Indexed by the composite index below.
+    organization = models.ForeignKey(
+        'users.Organization', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='time_entries', db_index=False
+    )
     clock_in = models.DateTimeField()
     clock_out = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
@@ -15,12 +136,66 @@ class TimeEntry(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # The user's id while the entry is open and NULL once it is closed. A
+    # unique constraint on it allows at most one open entry per user; being
+    # a generated column it works on MySQL, which has no partial indexes.
+    open_for_user = models.GeneratedField(
+        expression=models.Case(models.When(clock_out__isnull=True, then=F('user'))),
+        output_field=models.BigIntegerField(null=True),
+        db_persist=True,
+    )
+    
+    objects = TimeEntryManager()
+    
     class Meta:
         ordering = ['-clock_in']
+        constraints = [
+            models.UniqueConstraint(fields=['open_for_user'], name='unique_open_time_entry_per_user'),
+        ]
+        indexes = [
+            # Active entry lookups: filter(user=..., clock_out__isnull=True)
+            models.Index(fields=['user', 'clock_out'], name='timeentry_user_clock_out_idx'),
+            # Per-user history: filter(user=...).order_by('-clock_in')
+            models.Index(fields=['user', '-clock_in'], name='timeentry_user_clock_in_idx'),
+            # Organization lists, reports and exports: filter(organization=..., clock_in__range=...)
+            models.Index(fields=['organization', '-clock_in'], name='timeentry_org_clock_in_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.clock_in.strftime('%Y-%m-%d %H:%M')}"
     
+    # Snapshot of the rollup-relevant columns as last read from or written to
+    # the database; the rollup signals diff against it to apply deltas.
+    _original_state = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(loaded.get(name, DEFERRED) is not DEFERRED for name in EntryState._fields):
+            instance._original_state = EntryState(*(loaded[name] for name in EntryState._fields))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.organization_id is None:
+            self.organization_id = self.user.organization_id
+        # Keep the row and its rollups in a single transaction
+        with transaction.atomic():
+            if self._original_state is None and self.pk is not None:
+                # Built without being loaded (e.g. TimeEntry(pk=...)): read the
+                # stored row, so the rollups can move time off its old project
+                stored = type(self)._base_manager.select_for_update().filter(pk=self.pk).values_list(
+                    *EntryState._fields
+                ).first()
+                if stored is not None:
+                    self._original_state = EntryState(*stored)
+            super().save(*args, **kwargs)
+        self._original_state = self.rollup_state
+    
+    @property
+    def rollup_state(self):
+        return EntryState(self.user_id, self.organization_id, self.project_id, self.clock_in, self.clock_out)
+    
     @property
     def is_active(self):
         return self.clock_out is None
@@ -41,12 +216,24 @@ class TimeEntry(models.Model):
         if seconds is None:
             return "In progress"
         
-        hours, remainder = divmod(seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+        return format_duration(seconds)
+
+class ProjectQuerySet(models.QuerySet):
+    def for_organization(self, organization_id):
+        """The projects of an organization together with the shared ones"""
+        return self.filter(models.Q(organization_id=organization_id) | models.Q(organization__isnull=True))
+    
+    def with_total_time(self):
+        """Load each project's stored stats with it, so total_time costs no query"""
+        return self.select_related('stats')
 
 class Project(models.Model):
     """Model for tracking projects"""
+    # Projects without an organization are shared by every organization
+    organization = models.ForeignKey(
+        'users.Organization', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='projects', db_index=False
+    )
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     client = models.CharField(max_length=100, blank=True)
@@ -55,25 +242,349 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'is_active'], name='project_org_active_idx'),
+        ]
+    
     def __str__(self):
         return self.name
     
     @property
     def total_time(self):
-        """Calculate the total time spent on the project in seconds"""
-        total_seconds = 0
-        for entry in self.time_entries.all():
-            if entry.duration:
-                total_seconds += entry.duration
-        return total_seconds
+        """Total time spent on the project in seconds, read from its stored rollup"""
+        try:
+            return self.stats.total_duration.total_seconds()
+        except ProjectStats.DoesNotExist:
+            # No completed entries have been recorded against this project yet
+            return 0
     
     @property
     def total_time_formatted(self):
         """Format the total time as HH:MM:SS"""
-        seconds = self.total_time
-        hours, remainder = divmod(seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+        return format_duration(self.total_time)
+
+class ProjectStatsManager(models.Manager):
+    def apply_deltas(self, deltas):
+        """
+        Apply per-project changes to the stored totals.
+        `deltas` maps project id to (duration, entry_count, last_activity_at);
+        last_activity_at is None when no newer activity was added.
+        """
+        missing = []
+        for project_id, (duration, count, last_activity) in deltas.items():
+            changes = {
+                'total_duration': F('total_duration') + duration,
+                'entry_count': F('entry_count') + count,
+                'updated_at': timezone.now(),
+            }
+            if last_activity is not None:
+                changes['last_activity_at'] = models.Case(
+                    models.When(last_activity_at__gte=last_activity, then=F('last_activity_at')),
+                    default=models.Value(last_activity, output_field=models.DateTimeField()),
+                )
+            if not self.filter(project_id=project_id).update(**changes):
+                missing.append(project_id)
+        
+        # Projects without a stats row yet are rebuilt from their entries,
+        # which also covers rows lost to a concurrent rebuild
+        if missing:
+            self.rebuild(project_ids=missing)
+    
+    def refresh_last_activity(self, project_ids):
+        """Recompute last_activity_at after entries were removed from projects"""
+        latest = TimeEntry.objects.filter(
+            project=models.OuterRef('project_id'),
+            clock_out__isnull=False,
+        ).order_by('-clock_out').values('clock_out')[:1]
+        self.filter(project_id__in=project_ids).update(
+            last_activity_at=models.Subquery(latest), updated_at=timezone.now()
+        )
+    
+    def compute(self, project_ids=None):
+        """Aggregate the stats for the given projects (or all) from their time entries"""
+        entries = TimeEntry.objects.filter(clock_out__isnull=False, project__isnull=False)
+        if project_ids is not None:
+            entries = entries.filter(project_id__in=project_ids)
+        rows = entries.order_by().values('project_id').annotate(
+            total_duration=Sum(F('clock_out') - F('clock_in')),
+            entry_count=Count('id'),
+            last_activity_at=Max('clock_out'),
+        )
+        return {
+            row['project_id']: self.model(
+                project_id=row['project_id'],
+                total_duration=row['total_duration'] or timedelta(0),
+                entry_count=row['entry_count'],
+                last_activity_at=row['last_activity_at'],
+            )
+            for row in rows
+        }
+    
+    def rebuild(self, project_ids=None):
+        """Replace the stored stats for the given projects (or all) with freshly computed ones"""
+        stats = self.compute(project_ids)
+        with transaction.atomic():
+            existing = self.all()
+            if project_ids is not None:
+                existing = existing.filter(project_id__in=project_ids)
+            existing.delete()
+            self.bulk_create(stats.values(), batch_size=1000)
+        return stats
+
+class ProjectStats(models.Model):
+    """Incrementally maintained rollup of the completed time entries of a project"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_duration = models.DurationField(default=timedelta(0))
+    entry_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = ProjectStatsManager()
+    
+    class Meta:
+        verbose_name_plural = 'project stats'
+    
+    def __str__(self):
+        return f"{self.project_id} - {self.entry_count} entries"
+
+class DailyTimesheetManager(models.Manager):
+    def apply_deltas(self, deltas):
+        """
+        Apply changes to the stored days.
+        `deltas` maps (user_id, project_id, date) to (seconds, entry_count,
+        organization_id); the organization is only used for new rows.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta[:2])}
+        if len(deltas) > 1:
+            return self._apply_deltas_in_bulk(deltas)
+        
+        for (user_id, project_id, date), (seconds, count, organization_id) in deltas.items():
+            rows = self.filter(user_id=user_id, project_id=project_id, date=date)
+            changes = {'seconds': F('seconds') + seconds, 'entry_count': F('entry_count') + count}
+            if rows.update(**changes):
+                if count < 0 or seconds < 0:
+                    rows.filter(entry_count=0, seconds=0).delete()
+                continue
+            if count <= 0 and seconds <= 0:
+                # Nothing stored to take away from, e.g. after a concurrent rebuild
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(
+                        user_id=user_id, organization_id=organization_id, project_id=project_id,
+                        date=date, seconds=seconds, entry_count=count,
+                    )
+            except IntegrityError:
+                # Created concurrently in the meantime
+                rows.update(**changes)
+    
+    def _apply_deltas_in_bulk(self, deltas):
+        """
+        Apply many changes with a locked read and one bulk write per kind.
+        A row created concurrently for a new day raises IntegrityError.
+        """
+        with transaction.atomic():
+            rows = self.select_for_update().filter(
+                user_id__in={user_id for user_id, _, _ in deltas},
+                date__in={date for _, _, date in deltas},
+            )
+            stored = {(row.user_id, row.project_id, row.date): row for row in rows}
+            
+            changed, created, emptied = [], [], []
+            for key, (seconds, count, organization_id) in deltas.items():
+                row = stored.get(key)
+                if row is None:
+                    if count > 0 or seconds > 0:
+                        user_id, project_id, date = key
+                        created.append(self.model(
+                            user_id=user_id, organization_id=organization_id, project_id=project_id,
+                            date=date, seconds=seconds, entry_count=count,
+                        ))
+                    continue
+                row.seconds += seconds
+                row.entry_count += count
+                (changed if row.entry_count > 0 or row.seconds > 0 else emptied).append(row)
+            
+            self.bulk_update(changed, ['seconds', 'entry_count'], batch_size=1000)
+            self.bulk_create(created, batch_size=1000)
+            if emptied:
+                self.filter(pk__in=[row.pk for row in emptied]).delete()
+    
+    def move_to_no_project(self, project_id):
+        """Fold the days of a project into the project-less days of the same users"""
+        rows = self.filter(project_id=project_id)
+        deltas = {
+            (row['user_id'], None, row['date']): (row['seconds'], row['entry_count'], row['organization_id'])
+            for row in rows.values('user_id', 'organization_id', 'date', 'seconds', 'entry_count')
+        }
+        with transaction.atomic():
+            rows.delete()
+            self.apply_deltas(deltas)
+    
+    def compute(self, user_ids=None):
+        """Aggregate the days of the given users (or all) from their completed time entries"""
+        tzinfo = timezone.get_default_timezone()
+        entries = TimeEntry.objects.filter(clock_out__isnull=False)
+        if user_ids is not None:
+            entries = entries.filter(user_id__in=user_ids)
+        days = {}
+        rows = entries.order_by().values_list('user_id', 'organization_id', 'project_id', 'clock_in', 'clock_out')
+        for user_id, organization_id, project_id, clock_in, clock_out in rows.iterator(chunk_size=2000):
+            for index, (date, seconds) in enumerate(split_by_day(clock_in, clock_out, tzinfo)):
+                key = (user_id, project_id, date)
+                if key not in days:
+                    days[key] = self.model(
+                        user_id=user_id, organization_id=organization_id, project_id=project_id,
+                        date=date, seconds=0, entry_count=0,
+                    )
+                days[key].seconds += seconds
+                if index == 0:
+                    days[key].entry_count += 1
+        return days
+    
+    def rebuild(self, user_ids=None):
+        """Replace the stored days of the given users (or all) with freshly computed ones"""
+        days = self.compute(user_ids)
+        with transaction.atomic():
+            existing = self.all()
+            if user_ids is not None:
+                existing = existing.filter(user_id__in=user_ids)
+            existing.delete()
+            self.bulk_create(days.values(), batch_size=1000)
+        return days
+
+class DailyTimesheet(models.Model):
+    """
+    Incrementally maintained per user, project and local day totals of the
+    completed time entries. Entries crossing midnight (in TIME_ZONE) are split
+    between the days they touch and counted once, on the day they were
+    clocked in; a day can hold time but no entries.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_timesheets')
+    # The organization of the entries summed up, like TimeEntry.organization
+    organization = models.ForeignKey(
+        'users.Organization', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='daily_timesheets', db_index=False
+    )
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_timesheets')
+    date = models.DateField()
+    seconds = models.BigIntegerField(default=0)
+    entry_count = models.PositiveIntegerField(default=0)
+    
+    # project_id with 0 for "no project", so the unique constraint below also
+    # covers project-less days (NULLs never collide in a unique index)
+    project_key = models.GeneratedField(
+        expression=Coalesce(F('project'), Value(0)),
+        output_field=models.BigIntegerField(),
+        db_persist=True,
+    )
+    
+    objects = DailyTimesheetManager()
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'project_key'], name='unique_daily_timesheet'),
+        ]
+        indexes = [
+            # Project wide and global ranges: filter(date__range=...)
+            models.Index(fields=['date', 'project'], name='dailytimesheet_date_idx'),
+            # Organization reports: filter(organization=..., date__range=...)
+            models.Index(fields=['organization', 'date'], name='dailytimesheet_org_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.date} ({format_duration(self.seconds)})"
+    
+    @property
+    def hours(self):
+        return round(self.seconds / 3600, 2)
+
+class ClockEvent(models.Model):
+    """
+    A clock in/out event received in a bulk batch (e.g. replayed by a badge
+    reader), kept with its outcome under the sender's idempotency key so
+    that a replayed batch gets the original results instead of new entries
+    """
+    DIRECTION_CHOICES = (
+        ('in', 'Clock in'),
+        ('out', 'Clock out'),
+    )
+    
+    RESULT_CHOICES = (
+        ('created', 'Created'),
+        ('closed', 'Closed'),
+        ('rejected', 'Rejected'),
+    )
+    
+    # Unique per submitter, so senders can't see each other's results by
+    # reusing their keys
+    key = models.CharField(max_length=100)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='clock_events')
+    direction = models.CharField(max_length=3, choices=DIRECTION_CHOICES)
+    timestamp = models.DateTimeField()
+    result = models.CharField(max_length=10, choices=RESULT_CHOICES)
+    error = models.CharField(max_length=200, blank=True)
+    time_entry = models.ForeignKey(TimeEntry, on_delete=models.SET_NULL, null=True, blank=True, related_name='clock_events')
+    
+    submitted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='submitted_clock_events'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submitted_by', 'key'], name='clockevent_submitter_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} - {self.direction} ({self.result})"
+
+class TimeOffManager(ReturningUpdateManager):
+    def review(self, queryset, status, reviewer, notes=None):
+        """
+        Approve or reject the pending requests of `queryset` with a single
+        conditional UPDATE and return the requests it changed. Requests
+        that are no longer pending are left alone, so when reviewers race
+        each request is reviewed by exactly one of them. Existing review
+        notes are kept unless `notes` is given.
+        """
+        now = timezone.now()
+        changes = {
+            'status': status,
+            'reviewed_by': reviewer,
+            'reviewed_at': now,
+            'updated_at': now,
+        }
+        if notes is not None:
+            changes['review_notes'] = notes
+        pending = queryset.filter(status='pending')
+        
+        with transaction.atomic(using=self.db):
+            if self.can_return_from_update():
+                reviewed = self.update_returning(pending, **changes)
+            else:
+                # Lock the pending rows first so the ids read are exactly
+                # the rows the UPDATE changes
+                ids = list(pending.select_for_update().values_list('pk', flat=True))
+                self.filter(pk__in=ids, status='pending').update(**changes)
+                reviewed = list(self.filter(pk__in=ids)) if ids else []
+            
+            # QuerySet.update() bypasses save(), so notify the receivers
+            # (the dashboard cache) as if each request had been saved
+            for time_off in reviewed:
+                post_save.send(
+                    sender=self.model, instance=time_off, created=False,
+                    update_fields=frozenset(changes), raw=False, using=self.db,
+                )
+        return reviewed
 
 class TimeOff(models.Model):
     """Model for tracking time off requests"""
@@ -91,6 +602,11 @@ class TimeOff(models.Model):
     )
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='time_off_requests')
+    # Copied from the user when the request is created, like TimeEntry.organization
+    organization = models.ForeignKey(
+        'users.Organization', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='time_off_requests', db_index=False
+    )
     start_date = models.DateField()
     end_date = models.DateField()
     request_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
@@ -111,6 +627,20 @@ class TimeOff(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TimeOffManager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='timeoff_user_status_idx'),
+            models.Index(fields=['status', 'start_date'], name='timeoff_status_start_idx'),
+            models.Index(fields=['organization', 'status', 'start_date'], name='timeoff_org_status_start_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.organization_id is None:
+            self.organization_id = self.user.organization_id
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.user.username} - {self.start_date} to {self.end_date} ({self.get_request_type_display()})"
     
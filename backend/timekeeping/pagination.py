@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+class TimeEntryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over time entries, newest first. Pages are fetched
+    with a WHERE on the clock_in of the last row seen instead of an OFFSET,
+    so deep pages cost the same as the first one.
+    """
+    ordering = ('-clock_in', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,151 @@
+"""
+Timesheet aggregation for the reports endpoint.
+
+Durations are grouped by period and by user and/or project in the
+database; only the grouped rows come back to Python, where they are laid
+out as columns. Periods are truncated in the report's timezone so that day,
+week and month boundaries match the reader's calendar.
+
+In the default timezone the days are read from the DailyTimesheet rollup
+instead of the raw entries, so long ranges scan a few rows per user and day.
+Both paths follow the rollup's rules: time is split at local midnight, so a
+day holds exactly the time worked on it, and an entry is counted once, on
+the day it was clocked in.
+"""
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+from .models import Project, split_by_day
+
+# Truncation of the clock-in time of raw entries
+PERIODS = {
+    'day': lambda tzinfo: TruncDate('clock_in', tzinfo=tzinfo),
+    'week': lambda tzinfo: TruncWeek('clock_in', output_field=DateField(), tzinfo=tzinfo),
+    'month': lambda tzinfo: TruncMonth('clock_in', output_field=DateField(), tzinfo=tzinfo),
+}
+
+# Truncation of the local date of daily timesheets
+TIMESHEET_PERIODS = {
+    'day': lambda: F('date'),
+    'week': lambda: TruncWeek('date', output_field=DateField()),
+    'month': lambda: TruncMonth('date', output_field=DateField()),
+}
+
+# Truncation of local dates, for entries split in Python
+DATE_PERIODS = {
+    'day': lambda date: date,
+    'week': lambda date: date - timedelta(days=date.weekday()),
+    'month': lambda date: date.replace(day=1),
+}
+
+GROUP_FIELDS = {
+    'user': 'user_id',
+    'project': 'project_id',
+}
+
+
+def local_range(start_date, end_date, tzinfo):
+    """The [start, end) datetimes covering whole local days from start_date to end_date"""
+    start = datetime.combine(start_date, time.min, tzinfo=tzinfo)
+    end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tzinfo)
+    return start, end
+
+
+def report_rows(entries, period, group_by, tzinfo, start_date, end_date):
+    """
+    The grouped aggregate rows for the completed entries in `entries` that
+    overlap the local days from start_date to end_date
+    """
+    group_fields = [GROUP_FIELDS[name] for name in group_by]
+    start, end = local_range(start_date, end_date, tzinfo)
+    entries = entries.filter(clock_out__isnull=False).alias(
+        clock_in_date=TruncDate('clock_in', tzinfo=tzinfo),
+        clock_out_date=TruncDate('clock_out', tzinfo=tzinfo),
+    )
+    
+    # Entries within one local day, nearly all of them, are summed up by the database
+    same_day = (
+        entries.filter(clock_in__gte=start, clock_in__lt=end, clock_in_date=F('clock_out_date'))
+        .annotate(period=PERIODS[period](tzinfo))
+        .order_by()
+        .values('period', *group_fields)
+        .annotate(duration=Sum(F('clock_out') - F('clock_in')), entries=Count('id'))
+    )
+    rows = {}
+    for row in same_day:
+        key = (row['period'], *(row[field] for field in group_fields))
+        rows[key] = {**row, 'seconds': round(row.pop('duration').total_seconds())}
+    
+    # Entries crossing midnight are split like the rollup does, including
+    # the part of entries clocked in before the range that falls within it
+    crossing = (
+        entries.filter(clock_in__lt=end, clock_out__gt=start)
+        .exclude(clock_in_date=F('clock_out_date'))
+        .values_list(*group_fields, 'clock_in', 'clock_out')
+    )
+    for *groups, clock_in, clock_out in crossing:
+        for index, (date, seconds) in enumerate(split_by_day(clock_in, clock_out, tzinfo)):
+            if not start_date <= date <= end_date:
+                continue
+            key = (DATE_PERIODS[period](date), *groups)
+            if key not in rows:
+                rows[key] = {'period': key[0], **dict(zip(group_fields, groups)), 'seconds': 0, 'entries': 0}
+            rows[key]['seconds'] += seconds
+            if index == 0:
+                rows[key]['entries'] += 1
+    
+    # Project-less rows first, like the database orders NULLs
+    return [rows[key] for key in sorted(rows, key=lambda key: [(value is not None, value) for value in key])]
+
+
+def timesheet_rows(timesheets, period, group_by):
+    """The grouped aggregate rows for the daily timesheets in `timesheets`"""
+    group_fields = [GROUP_FIELDS[name] for name in group_by]
+    return (
+        timesheets
+        .annotate(period=TIMESHEET_PERIODS[period]())
+        .order_by()
+        .values('period', *group_fields)
+        .annotate(seconds=Sum('seconds'), entries=Sum('entry_count'))
+        .order_by('period', *group_fields)
+    )
+
+
+def columnar(rows, group_by):
+    """Lay out aggregate rows as one list per column, plus id -> label lookups"""
+    columns = {'period': [], **{name: [] for name in group_by}, 'seconds': [], 'entries': []}
+    for row in rows:
+        columns['period'].append(row['period'].isoformat())
+        for name in group_by:
+            columns[name].append(row[GROUP_FIELDS[name]])
+        columns['seconds'].append(row['seconds'])
+        columns['entries'].append(row['entries'])
+
+    labels = {}
+    if 'user' in group_by:
+        users = get_user_model().objects.filter(pk__in=set(columns['user'])).values_list('pk', 'email')
+        labels['user'] = {str(pk): email for pk, email in users}
+    if 'project' in group_by:
+        projects = Project.objects.filter(pk__in=set(columns['project']) - {None}).values_list('pk', 'name')
+        labels['project'] = {str(pk): name for pk, name in projects}
+
+    return columns, labels
+
+
+def build_report(rows, period, group_by, tzinfo):
+    columns, labels = columnar(rows, group_by)
+    total_seconds = sum(columns['seconds'])
+    return {
+        'period': period,
+        'group_by': group_by,
+        'timezone': str(tzinfo),
+        'columns': list(columns),
+        'data': columns,
+        'labels': labels,
+        'total_seconds': total_seconds,
+        'total_hours': round(total_seconds / 3600, 2),
+        'total_entries': sum(columns['entries']),
+    }
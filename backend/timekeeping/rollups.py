@@ -0,0 +1,80 @@
+"""
+Incremental maintenance of the rollups derived from time entries.
+
+Every write path (model saves and deletes via signals, and the set-based
+paths that bypass them) describes its effect as (previous, current) pairs of
+EntryState, where None stands for "no row". Only completed entries that
+belong to a project contribute to the project totals; every completed entry
+contributes to the daily timesheets, split at local midnight and counted on
+the day it was clocked in.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DailyTimesheet, ProjectStats, split_by_day
+
+
+def contributes(state):
+    return state is not None and state.project_id is not None and state.clock_out is not None
+
+
+def is_completed(state):
+    return state is not None and state.clock_out is not None
+
+
+def timesheet_deltas(changes):
+    """Per (user, project, local day) changes in seconds and entry count, with the organization"""
+    tzinfo = timezone.get_default_timezone()
+    deltas = defaultdict(lambda: [0, 0, None])
+    for previous, current in changes:
+        if previous == current:
+            continue
+        for state, sign in ((previous, -1), (current, 1)):
+            if not is_completed(state):
+                continue
+            for index, (date, seconds) in enumerate(split_by_day(state.clock_in, state.clock_out, tzinfo)):
+                delta = deltas[(state.user_id, state.project_id, date)]
+                delta[0] += sign * seconds
+                # Counted once, on the day it was clocked in
+                if index == 0:
+                    delta[1] += sign
+                delta[2] = state.organization_id
+    return deltas
+
+
+def apply_entry_changes(changes):
+    """Fold a batch of entry changes into the rollup tables in one transaction"""
+    deltas = defaultdict(lambda: [timedelta(0), 0, None])
+    removed_from = set()
+    
+    for previous, current in changes:
+        if previous == current:
+            continue
+        if contributes(previous):
+            delta = deltas[previous.project_id]
+            delta[0] -= previous.clock_out - previous.clock_in
+            delta[1] -= 1
+            removed_from.add(previous.project_id)
+        if contributes(current):
+            delta = deltas[current.project_id]
+            delta[0] += current.clock_out - current.clock_in
+            delta[1] += 1
+            if delta[2] is None or current.clock_out > delta[2]:
+                delta[2] = current.clock_out
+    
+    days = timesheet_deltas(changes)
+    if not deltas and not days:
+        return
+    
+    # Part of the caller's transaction when there is one
+    with transaction.atomic(savepoint=False):
+        if deltas:
+            ProjectStats.objects.apply_deltas(deltas)
+        # The removed entry may have been the latest one on its project
+        if removed_from:
+            ProjectStats.objects.refresh_last_activity(removed_from)
+        if days:
+            DailyTimesheet.objects.apply_deltas(days)
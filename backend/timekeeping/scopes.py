@@ -0,0 +1,31 @@
+"""
+Who sees and records what: the users and projects within reach of a user,
+shared by the views and the serializers validating their input.
+"""
+from django.contrib.auth import get_user_model
+
+from .models import Project
+
+# Roles that manage the time of everyone in their organization
+MANAGER_ROLES = ['creator', 'admin', 'manager']
+
+def sees_every_organization(user):
+    """Superusers, and staff members outside any organization, work across organizations"""
+    return user.is_superuser or (user.is_staff and not user.organization_id)
+
+def manages_organization(user):
+    return bool(user.organization_id) and (user.is_staff or user.role in MANAGER_ROLES)
+
+def managed_users(user):
+    """The users whose time `user` may report on and record"""
+    users = get_user_model().objects.all()
+    if sees_every_organization(user):
+        return users
+    if manages_organization(user):
+        return users.filter(organization_id=user.organization_id)
+    return users.filter(pk=user.pk)
+
+def visible_projects(user):
+    if sees_every_organization(user):
+        return Project.objects.all()
+    return Project.objects.for_organization(user.organization_id)
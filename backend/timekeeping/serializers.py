@@ -1,8 +1,23 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
 from rest_framework import serializers
-from .models import TimeEntry, Project, TimeOff
+from rest_framework.settings import api_settings
+from .models import TimeEntry, Project, TimeOff, ClockEvent
+from .reports import PERIODS, GROUP_FIELDS
+from .exports import FORMATS as EXPORT_FORMATS
+from .scopes import visible_projects
 from django.utils import timezone
 
+ACTIVE_ENTRY_EXISTS_MESSAGE = "You already have an active time entry. Please clock out first."
+
 class ProjectSerializer(serializers.ModelSerializer):
+    """
+    Project representation. Querysets passed in should use
+    Project.objects.with_total_time() to join the stored totals.
+    """
     total_time_formatted = serializers.ReadOnlyField()
     
     class Meta:
@@ -10,11 +25,33 @@ class ProjectSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'client', 'is_active', 'total_time_formatted', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class TimeEntrySerializer(serializers.ModelSerializer):
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """Lightweight project representation for nesting, free of per-project aggregates"""
+    
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'client', 'is_active']
+        read_only_fields = fields
+
+class VisibleProjectMixin:
+    """Only accept projects the requesting user can see: their organization's and shared ones"""
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            fields['project'].queryset = visible_projects(request.user)
+        return fields
+
+class TimeEntrySerializer(VisibleProjectMixin, serializers.ModelSerializer):
+    """
+    Time entry representation. Querysets passed in should use
+    select_related('user', 'project') to avoid a lookup per entry.
+    """
     duration_formatted = serializers.ReadOnlyField()
     is_active = serializers.ReadOnlyField()
     user = serializers.StringRelatedField(read_only=True)
-    project_details = ProjectSerializer(source='project', read_only=True)
+    project_details = ProjectSummarySerializer(source='project', read_only=True)
     
     class Meta:
         model = TimeEntry
@@ -22,7 +59,7 @@ class TimeEntrySerializer(serializers.ModelSerializer):
                   'is_active', 'duration_formatted', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class ClockInSerializer(serializers.ModelSerializer):
+class ClockInSerializer(VisibleProjectMixin, serializers.ModelSerializer):
     class Meta:
         model = TimeEntry
         fields = ['project', 'notes']
@@ -31,48 +68,44 @@ class ClockInSerializer(serializers.ModelSerializer):
         # Get the current user from the context
         user = self.context['request'].user
         
-        # Check if the user already has an active time entry
-        active_entries = TimeEntry.objects.filter(user=user, clock_out__isnull=True)
-        if active_entries.exists():
-            raise serializers.ValidationError("You already have an active time entry. Please clock out first.")
-        
-        # Create a new time entry
-        time_entry = TimeEntry.objects.create(
-            user=user,
-            clock_in=timezone.now(),
-            **validated_data
-        )
+        # A single INSERT; the unique constraint on open entries rejects it
+        # if the user is already clocked in, even under concurrent requests
+        try:
+            time_entry = TimeEntry.objects.create(
+                user=user,
+                clock_in=timezone.now(),
+                **validated_data
+            )
+        except IntegrityError:
+            raise serializers.ValidationError(ACTIVE_ENTRY_EXISTS_MESSAGE)
         
         return time_entry
 
 class ClockOutSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
     
-    def validate(self, attrs):
+    def save(self):
         user = self.context['request'].user
         
-        # Find the active time entry for the user
-        try:
-            active_entry = TimeEntry.objects.get(user=user, clock_out__isnull=True)
-        except TimeEntry.DoesNotExist:
-            raise serializers.ValidationError("You don't have an active time entry to clock out from.")
-            
-        # Add the active entry to the validated data
-        attrs['active_entry'] = active_entry
-        return attrs
-    
-    def update(self, instance, validated_data):
-        # Update the clock out time and notes if provided
-        instance.clock_out = timezone.now()
+        # Close the active entry with a single conditional UPDATE
+        time_entry = TimeEntry.objects.close_active_entry(user, notes=self.validated_data.get('notes'))
+        if time_entry is None:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ["You don't have an active time entry to clock out from."]
+            })
         
-        if 'notes' in validated_data:
-            if instance.notes:
-                instance.notes += f"\n\nClock out notes: {validated_data['notes']}"
-            else:
-                instance.notes = validated_data['notes']
-                
-        instance.save()
-        return instance
+        return time_entry
+
+class ClockEventSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=100)
+    user = serializers.IntegerField()
+    direction = serializers.ChoiceField(choices=ClockEvent.DIRECTION_CHOICES)
+    timestamp = serializers.DateTimeField()
+    project = serializers.IntegerField(required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+class BulkClockEventSerializer(serializers.Serializer):
+    events = ClockEventSerializer(many=True, allow_empty=False, max_length=1000)
 
 class TimeOffSerializer(serializers.ModelSerializer):
     status = serializers.ChoiceField(choices=TimeOff.STATUS_CHOICES, read_only=True)
@@ -125,13 +158,74 @@ class TimeOffReviewSerializer(serializers.Serializer):
     
     def save(self):
         time_off = self.validated_data['time_off']
-        status = self.validated_data['status']
-        review_notes = self.validated_data.get('review_notes', '')
         reviewer = self.context['request'].user
         
-        if status == 'approved':
-            time_off.approve(reviewer)
-        else:
-            time_off.reject(reviewer, review_notes)
-            
-        return time_off
+        # Conditional on the request still being pending, so a concurrent
+        # review of the same request can't be overwritten
+        reviewed = TimeOff.objects.review(
+            TimeOff.objects.filter(pk=time_off.pk), self.validated_data['status'], reviewer,
+            self.validated_data.get('review_notes'),
+        )
+        if not reviewed:
+            time_off.refresh_from_db(fields=['status'])
+            raise serializers.ValidationError(f"Time off request has already been {time_off.status}")
+        return reviewed[0]
+
+class TimeOffBulkReviewSerializer(serializers.Serializer):
+    """Approve or reject many time off requests at once"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=['approved', 'rejected'])
+    review_notes = serializers.CharField(required=False, allow_blank=True)
+
+class TimesheetQuerySerializer(serializers.Serializer):
+    """
+    Query parameters selecting time entries for reports and exports. Dates
+    are inclusive local dates in `timezone`.
+    """
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    timezone = serializers.CharField(required=False)
+    user = serializers.IntegerField(required=False)
+    project = serializers.IntegerField(required=False)
+    
+    def validate_timezone(self, value):
+        try:
+            return ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError(f"Unknown timezone '{value}'.")
+    
+    def validate(self, attrs):
+        attrs.setdefault('timezone', ZoneInfo(settings.TIME_ZONE))
+        start_date, end_date = attrs.get('start_date'), attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError({'end_date': 'End date must be after start date'})
+        return attrs
+
+class ReportQuerySerializer(TimesheetQuerySerializer):
+    """
+    Query parameters of the timesheet report; the range defaults to the
+    last seven days.
+    """
+    period = serializers.ChoiceField(choices=list(PERIODS), default='day')
+    group_by = serializers.CharField(required=False, allow_blank=True, default='user,project')
+    
+    def validate_group_by(self, value):
+        group_by = []
+        for name in filter(None, (part.strip() for part in value.split(','))):
+            if name not in GROUP_FIELDS:
+                raise serializers.ValidationError(
+                    f"Unknown grouping '{name}'. Choose from: {', '.join(GROUP_FIELDS)}."
+                )
+            if name not in group_by:
+                group_by.append(name)
+        return group_by
+    
+    def validate(self, attrs):
+        tzinfo = attrs.setdefault('timezone', ZoneInfo(settings.TIME_ZONE))
+        end_date = attrs.setdefault('end_date', timezone.now().astimezone(tzinfo).date())
+        attrs.setdefault('start_date', end_date - timedelta(days=6))
+        return super().validate(attrs)
+
+class ExportQuerySerializer(TimesheetQuerySerializer):
+    """Query parameters of the timesheet export; without dates every entry is exported"""
+    type = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='csv')
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from . import cache as dashboard_cache
+from .models import TimeEntry, TimeOff, Project, ProjectStats, DailyTimesheet
+from .rollups import apply_entry_changes, contributes
+
+@receiver(post_save, sender=TimeEntry)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    """Apply the difference between the stored and the saved entry to the rollups"""
+    if raw:
+        return
+    
+    if not created and instance._original_state is None:
+        # Updated a row that TimeEntry.save() couldn't read beforehand, so
+        # the previous values are unknown
+        if instance.project_id:
+            ProjectStats.objects.rebuild(project_ids=[instance.project_id])
+        DailyTimesheet.objects.rebuild(user_ids=[instance.user_id])
+        return
+    
+    previous = None if created else instance._original_state
+    apply_entry_changes([(previous, instance.rollup_state)])
+
+@receiver(post_delete, sender=TimeEntry)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """Remove a deleted entry's contribution from the rollups"""
+    previous = instance._original_state or instance.rollup_state
+    apply_entry_changes([(previous, None)])
+
+@receiver(pre_delete, sender=Project)
+def move_timesheets_on_project_delete(sender, instance, **kwargs):
+    """The project's entries are kept with project set to NULL, so keep their days too"""
+    DailyTimesheet.objects.move_to_no_project(instance.pk)
+
+@receiver(post_save, sender=TimeEntry)
+@receiver(post_delete, sender=TimeEntry)
+def invalidate_dashboard_on_time_entry_change(sender, instance, **kwargs):
+    dashboard_cache.invalidate_user(instance.user_id)
+    # Project totals only move when a completed entry is involved
+    if contributes(instance.rollup_state) or contributes(instance._original_state):
+        dashboard_cache.invalidate_projects()
+
+@receiver(post_save, sender=TimeOff)
+@receiver(post_delete, sender=TimeOff)
+def invalidate_dashboard_on_time_off_change(sender, instance, **kwargs):
+    dashboard_cache.invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_dashboard_on_project_change(sender, instance, **kwargs):
+    # The user blocks show the names of the projects of their entries too
+    dashboard_cache.invalidate_project_details()
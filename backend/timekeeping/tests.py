@@ -1,3 +1,1346 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipIf, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.admin import EstimatedCountPaginator
+from users.models import CustomUser, Organization
+from .admin import TimeOffAdmin
+from .importers import import_time_entries, text_stream
+from .models import TimeEntry, TimeEntryManager, Project, ProjectStats, TimeOff, DailyTimesheet
+from .views import TimeEntryViewSet
+
+
+class ProjectTotalsQueryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_projects(self, count):
+        now = timezone.now()
+        for index in range(count):
+            project = Project.objects.create(name=f'Project {index}')
+            for hours in (1, 2):
+                TimeEntry.objects.create(
+                    user=self.user,
+                    project=project,
+                    clock_in=now - timedelta(hours=hours + 1),
+                    clock_out=now - timedelta(hours=1),
+                )
+
+    def test_projects_list_query_count_is_constant(self):
+        # Two ETag fingerprint queries plus the list joined with its stats
+        self.create_projects(2)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('project-list'))
+        self.assertEqual(len(response.data), 2)
+
+        self.create_projects(8)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('project-list'))
+        self.assertEqual(len(response.data), 10)
+
+    def test_projects_list_reports_summed_time(self):
+        self.create_projects(1)
+        response = self.client.get(reverse('project-list'))
+        self.assertEqual(response.data[0]['total_time_formatted'], '03:00:00')
+
+    def test_project_without_entries_reports_zero(self):
+        Project.objects.create(name='Empty')
+        response = self.client.get(reverse('project-list'))
+        self.assertEqual(response.data[0]['total_time_formatted'], '00:00:00')
+
+
+class ProjectStatsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='worker', email='worker@example.com')
+        self.website = Project.objects.create(name='Website')
+        self.mobile = Project.objects.create(name='Mobile')
+        self.now = timezone.now()
+
+    def log(self, project, hours):
+        return TimeEntry.objects.create(
+            user=self.user, project=project,
+            clock_in=self.now - timedelta(hours=hours), clock_out=self.now,
+        )
+
+    def totals(self):
+        return {
+            stats.project.name: (stats.total_duration, stats.entry_count)
+            for stats in ProjectStats.objects.select_related('project')
+        }
+
+    def test_editing_reassigning_and_deleting_entries(self):
+        entry = self.log(self.website, 2)
+        self.log(self.website, 1)
+        self.assertEqual(self.totals(), {'Website': (timedelta(hours=3), 2)})
+
+        entry.clock_in = self.now - timedelta(hours=4)
+        entry.save()
+        self.assertEqual(self.totals()['Website'], (timedelta(hours=5), 2))
+
+        entry.project = self.mobile
+        entry.save()
+        self.assertEqual(self.totals(), {
+            'Website': (timedelta(hours=1), 1), 'Mobile': (timedelta(hours=4), 1),
+        })
+
+        entry.delete()
+        self.assertEqual(self.totals()['Mobile'], (timedelta(0), 0))
+
+    def test_reassigning_an_entry_that_was_not_loaded(self):
+        entry = self.log(self.website, 2)
+        TimeEntry(
+            pk=entry.pk, user=self.user, organization=None, project=self.mobile,
+            clock_in=entry.clock_in, clock_out=entry.clock_out, created_at=entry.created_at,
+        ).save()
+        self.assertEqual(self.totals(), {
+            'Website': (timedelta(0), 0), 'Mobile': (timedelta(hours=2), 1),
+        })
+
+    def test_list_reads_the_rollup(self):
+        self.log(self.website, 2)
+        ProjectStats.objects.update(total_duration=timedelta(hours=7))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        totals = {project['name']: project['total_time_formatted'] for project in client.get(reverse('project-list')).data}
+        self.assertEqual(totals, {'Website': '07:00:00', 'Mobile': '00:00:00'})
+
+    def test_rebuild_command(self):
+        self.log(self.website, 2)
+        # Queryset updates bypass the signals
+        TimeEntry.objects.update(project=self.mobile)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_project_stats', '--verify', stdout=io.StringIO())
+
+        call_command('rebuild_project_stats', stdout=io.StringIO())
+        self.assertEqual(self.totals(), {'Mobile': (timedelta(hours=2), 1)})
+        call_command('rebuild_project_stats', '--verify', stdout=io.StringIO())
+
+class TimeEntryQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.project = Project.objects.create(name='Website')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_entries(self, count):
+        now = timezone.now()
+        for index in range(count):
+            project = Project.objects.create(name=f'Project {index}')
+            TimeEntry.objects.create(
+                user=self.user,
+                project=project,
+                clock_in=now - timedelta(days=index + 1, hours=8),
+                clock_out=now - timedelta(days=index + 1),
+            )
+
+    def test_time_entry_list_query_count_is_constant(self):
+        self.create_entries(2)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('time-entry-list'))
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.create_entries(8)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('time-entry-list'))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['user'], self.user.email)
+
+    def test_current_entry_is_a_single_query(self):
+        TimeEntry.objects.create(user=self.user, project=self.project, clock_in=timezone.now())
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('time-entry-current'))
+        self.assertEqual(response.data['project_details']['name'], 'Website')
+
+    def test_dashboard_query_count_is_constant(self):
+        self.create_entries(2)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('dashboard'))
+
+        self.create_entries(8)
+        TimeEntry.objects.create(user=self.user, project=self.project, clock_in=timezone.now())
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.data['recent_time_entries']), 5)
+        self.assertEqual(response.data['active_time_entry']['project_details']['name'], 'Website')
+
+    def test_clock_in_and_out_responses_do_not_refetch_relations(self):
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('clock-in'), {'project': self.project.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['project_details']['name'], 'Website')
+
+        response = self.client.post(reverse('clock-out'), {'notes': 'Done'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user'], self.user.email)
+        self.assertEqual(response.data['project_details']['name'], 'Website')
+
+
+class TimeEntryListTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # One eight hour entry a day, ending on 2024-03-10 (UTC)
+        self.entries = [
+            TimeEntry.objects.create(
+                user=self.user,
+                clock_in=datetime(2024, 3, 10 - index, 9, tzinfo=dt_timezone.utc),
+                clock_out=datetime(2024, 3, 10 - index, 17, tzinfo=dt_timezone.utc),
+            )
+            for index in range(7)
+        ]
+
+    def test_pages_follow_the_cursor(self):
+        url = reverse('time-entry-list')
+        page = self.client.get(url, {'page_size': 3}).data
+        self.assertEqual(len(page['results']), 3)
+        self.assertIsNone(page['previous'])
+
+        seen = [entry['id'] for entry in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).data
+            self.assertLessEqual(len(page['results']), 3)
+            seen += [entry['id'] for entry in page['results']]
+        # Newest first, each entry exactly once
+        self.assertEqual(seen, [entry.pk for entry in self.entries])
+
+    def test_date_range_selects_older_weeks(self):
+        response = self.client.get(reverse('time-entry-list'), {
+            'start_date': '2024-03-04', 'end_date': '2024-03-05', 'timezone': 'UTC',
+        })
+        self.assertEqual([entry['id'] for entry in response.data['results']], [self.entries[5].pk, self.entries[6].pk])
+
+        # Days are local to the timezone: 09:00 UTC on the 4th is still the 3rd in Honolulu
+        response = self.client.get(reverse('time-entry-list'), {
+            'start_date': '2024-03-03', 'end_date': '2024-03-03', 'timezone': 'Pacific/Honolulu',
+        })
+        self.assertEqual([entry['id'] for entry in response.data['results']], [self.entries[6].pk])
+
+        response = self.client.get(reverse('time-entry-list'), {'start_date': '2024-03-05', 'end_date': '2024-03-04'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ndjson_stream(self):
+        response = self.client.get(reverse('time-entry-list'), {
+            'stream': 'ndjson', 'start_date': '2024-03-08', 'timezone': 'UTC',
+        })
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [entry.pk for entry in self.entries[:3]])
+        self.assertEqual(rows[0]['user'], self.user.email)
+        self.assertEqual(rows[0]['clock_in'], '2024-03-10T09:00:00Z')
+
+    def test_ndjson_stream_reads_keyset_chunks(self):
+        # Entries sharing a clock_in straddle the chunk boundaries
+        tied = self.entries[1]
+        self.entries[2:2] = [
+            TimeEntry.objects.create(user=self.user, clock_in=tied.clock_in, clock_out=tied.clock_out)
+            for _ in range(2)
+        ]
+        with mock.patch.object(TimeEntryViewSet, 'stream_chunk_size', 2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('time-entry-list'), {'stream': 'ndjson'})
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [entry.pk for entry in self.entries])
+        # Each chunk is its own bounded query
+        self.assertEqual(sum('LIMIT 2' in query['sql'] for query in queries), 5)
+
+class ClockInOutTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_clock_in_is_rejected(self):
+        self.assertEqual(self.client.post(reverse('clock-in')).status_code, 201)
+        response = self.client.post(reverse('clock-in'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already have an active time entry', response.data[0])
+        self.assertEqual(TimeEntry.objects.filter(user=self.user, clock_out__isnull=True).count(), 1)
+
+    def test_database_allows_one_open_entry_per_user(self):
+        TimeEntry.objects.create(user=self.user, clock_in=timezone.now())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TimeEntry.objects.create(user=self.user, clock_in=timezone.now())
+
+    def test_projects_of_other_organizations_are_rejected(self):
+        acme = Organization.objects.create(name='Acme', slug='acme')
+        other = Organization.objects.create(name='Other', slug='other')
+        self.user.organization = acme
+        self.user.save()
+        private = Project.objects.create(name='Secret', organization=other)
+        shared = Project.objects.create(name='Shared')
+
+        response = self.client.post(reverse('clock-in'), {'project': private.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.data)
+        start = timezone.now() - timedelta(hours=2)
+        response = self.client.post(reverse('time-entry-list'), {
+            'project': private.pk, 'clock_in': start.isoformat(), 'clock_out': (start + timedelta(hours=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.data)
+        self.assertFalse(TimeEntry.objects.exists())
+        self.assertFalse(ProjectStats.objects.filter(project=private).exists())
+
+        response = self.client.post(reverse('clock-in'), {'project': shared.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['project_details']['name'], 'Shared')
+
+    def test_clock_out_without_active_entry(self):
+        response = self.client.post(reverse('clock-out'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+
+    def test_clock_out_appends_notes(self):
+        self.client.post(reverse('clock-in'), {'notes': 'Morning shift'})
+        response = self.client.post(reverse('clock-out'), {'notes': 'Done'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['is_active'])
+        self.assertEqual(response.data['notes'], 'Morning shift\n\nClock out notes: Done')
+
+        # The user can clock in again once the entry is closed
+        self.assertEqual(self.client.post(reverse('clock-in')).status_code, 201)
+
+
+class CloseActiveEntryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+
+    @skipUnless(TimeEntry.objects.can_return_from_update(), 'UPDATE ... RETURNING not supported')
+    def test_clock_out_is_a_single_statement(self):
+        now = timezone.now()
+        # An earlier entry the same day, so today's timesheet row already exists
+        TimeEntry.objects.create(user=self.user, clock_in=now, clock_out=now)
+        TimeEntry.objects.create(user=self.user, clock_in=now, notes='Start')
+        # Savepoint, UPDATE ... RETURNING, daily timesheet UPDATE, savepoint release
+        with self.assertNumQueries(4):
+            entry = TimeEntry.objects.close_active_entry(self.user, notes='End')
+        self.assertIsNotNone(entry.clock_out)
+        self.assertEqual(entry.notes, 'Start\n\nClock out notes: End')
+
+    def test_closing_updates_project_stats(self):
+        project = Project.objects.create(name='Website')
+        TimeEntry.objects.create(user=self.user, project=project, clock_in=timezone.now() - timedelta(hours=1))
+        entry = TimeEntry.objects.close_active_entry(self.user)
+        project.refresh_from_db()
+        self.assertEqual(project.stats.entry_count, 1)
+        self.assertEqual(project.stats.last_activity_at, entry.clock_out)
+
+    def test_returns_none_without_open_entry(self):
+        self.assertIsNone(TimeEntry.objects.close_active_entry(self.user))
+
+    def assertClosesWithRelatedObjects(self):
+        project = Project.objects.create(name='Website')
+        TimeEntry.objects.create(user=self.user, project=project, clock_in=timezone.now(), notes='Start')
+        entry = TimeEntry.objects.close_active_entry(self.user, notes='End')
+        self.assertEqual(entry.notes, 'Start\n\nClock out notes: End')
+        self.assertEqual(TimeEntry.objects.get().clock_out, entry.clock_out)
+        self.assertEqual(ProjectStats.objects.get(project=project).entry_count, 1)
+        # The clock-out response renders both without further queries
+        with self.assertNumQueries(0):
+            self.assertEqual((entry.project.name, entry.user.email), ('Website', 'worker@example.com'))
+        self.assertIsNone(TimeEntry.objects.close_active_entry(self.user))
+
+    def test_closed_entry_comes_with_its_project(self):
+        self.assertClosesWithRelatedObjects()
+
+    def test_closing_without_returning_reads_the_entry_back(self):
+        # MySQL and old SQLite versions
+        with mock.patch.object(TimeEntryManager, 'can_return_from_update', return_value=False):
+            self.assertClosesWithRelatedObjects()
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and connection.is_in_memory_db(),
+    'In-memory SQLite shares one cache between threads and fails on lock conflicts',
+)
+class ConcurrentClockOutTests(TransactionTestCase):
+    def test_concurrent_clock_outs_close_the_entry_once(self):
+        self.clock_out_concurrently()
+
+    def test_concurrent_clock_outs_without_returning_close_the_entry_once(self):
+        with mock.patch.object(TimeEntryManager, 'can_return_from_update', return_value=False):
+            self.clock_out_concurrently()
+
+    def clock_out_concurrently(self):
+        user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        project = Project.objects.create(name='Website')
+        TimeEntry.objects.create(user=user, project=project, clock_in=timezone.now() - timedelta(hours=1))
+
+        workers = 4
+        barrier = threading.Barrier(workers)
+        results = []
+        errors = []
+
+        def clock_out(index):
+            try:
+                barrier.wait()
+                results.append(TimeEntry.objects.close_active_entry(user, notes=f'worker {index}'))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=clock_out, args=(index,)) for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        closed = [entry for entry in results if entry is not None]
+        self.assertEqual(len(closed), 1)
+        entry = TimeEntry.objects.get()
+        self.assertEqual(entry.clock_out, closed[0].clock_out)
+        self.assertEqual(entry.notes, closed[0].notes)
+        self.assertEqual(Project.objects.get().stats.entry_count, 1)
+
+
+@override_settings(DASHBOARD_CACHE_TIMEOUT=300)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.other = CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='password'
+        )
+        self.project = Project.objects.create(name='Website')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.client.get(reverse('dashboard'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.data['active_projects'][0]['name'], 'Website')
+
+    def test_projects_block_is_shared_between_users(self):
+        self.client.get(reverse('dashboard'))
+        self.client.force_authenticate(self.other)
+        # Only the three per-user queries run
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+
+    def test_clock_in_and_out_invalidate_the_dashboard(self):
+        self.client.get(reverse('dashboard'))
+        self.client.post(reverse('clock-in'), {'project': self.project.id})
+        response = self.client.get(reverse('dashboard'))
+        self.assertTrue(response.data['active_time_entry']['is_active'])
+
+        self.client.post(reverse('clock-out'))
+        response = self.client.get(reverse('dashboard'))
+        self.assertIsNone(response.data['active_time_entry'])
+        self.assertEqual(len(response.data['recent_time_entries']), 1)
+
+    def test_other_users_changes_keep_the_user_block(self):
+        self.client.get(reverse('dashboard'))
+        TimeEntry.objects.create(user=self.other, clock_in=timezone.now())
+        with self.assertNumQueries(0):
+            self.client.get(reverse('dashboard'))
+
+    def test_project_changes_invalidate_the_projects_block(self):
+        self.client.get(reverse('dashboard'))
+        Project.objects.create(name='Mobile app')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.data['active_projects']), 2)
+
+    def test_project_edits_reach_the_user_block(self):
+        self.client.post(reverse('clock-in'), {'project': self.project.id})
+        self.client.get(reverse('dashboard'))
+        self.project.name = 'Storefront'
+        self.project.save()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.data['active_time_entry']['project_details']['name'], 'Storefront')
+        self.assertEqual(response.data['active_projects'][0]['name'], 'Storefront')
+
+    @override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+    def test_nothing_is_cached_without_a_timeout(self):
+        # The default without a shared cache, where other workers couldn't be invalidated
+        self.client.get(reverse('dashboard'))
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.data['active_projects'][0]['name'], 'Website')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_time_off_changes_invalidate_the_user_block(self):
+        self.client.get(reverse('dashboard'))
+        TimeOff.objects.create(
+            user=self.user, start_date=timezone.now().date(),
+            end_date=timezone.now().date(), request_type='vacation',
+        )
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.data['pending_time_off']), 1)
+
+    def test_cache_stats_are_exposed_to_staff(self):
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(self.client.get(reverse('dashboard-cache-stats')).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('dashboard-cache-stats'))
+        self.assertEqual(response.data['user'], {'hits': 1, 'misses': 1})
+        self.assertEqual(response.data['projects'], {'hits': 1, 'misses': 1})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.project = Project.objects.create(name='Website')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_projects_list_etag(self):
+        url = reverse('project-list')
+        etag = self.client.get(url)['ETag']
+        # Only the fingerprint queries run for an unchanged list
+        with self.assertNumQueries(2):
+            self.assertNotModified(url, etag)
+
+        # A completed entry changes the totals and therefore the ETag
+        TimeEntry.objects.create(
+            user=self.user, project=self.project,
+            clock_in=timezone.now() - timedelta(hours=1), clock_out=timezone.now(),
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_time_off_list_etag(self):
+        url = reverse('time-off-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        TimeOff.objects.create(
+            user=self.user, start_date=timezone.now().date(),
+            end_date=timezone.now().date(), request_type='vacation',
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(DASHBOARD_CACHE_TIMEOUT=300)
+    def test_dashboard_etag(self):
+        url = reverse('dashboard')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, etag)
+
+        self.client.post(reverse('clock-in'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme')
+        self.manager = CustomUser.objects.create_user(
+            username='manager', email='manager@example.com', password='password',
+            organization=self.organization, role='manager',
+        )
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password',
+            organization=self.organization,
+        )
+        self.outsider = CustomUser.objects.create_user(
+            username='outsider', email='outsider@example.com', password='password'
+        )
+        self.website = Project.objects.create(name='Website')
+        self.app = Project.objects.create(name='App')
+        self.client = APIClient()
+
+    def log(self, user, project, start, hours):
+        TimeEntry.objects.create(
+            user=user, project=project, clock_in=start, clock_out=start + timedelta(hours=hours)
+        )
+
+    def get_report(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('reports'), params)
+
+    def test_groups_by_day_user_and_project(self):
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        self.log(self.user, self.website, day, 2)
+        self.log(self.user, self.website, day + timedelta(hours=3), 1)
+        self.log(self.user, self.app, day, 4)
+        self.log(self.manager, self.app, day + timedelta(days=1), 8)
+        TimeEntry.objects.create(user=self.user, project=self.app, clock_in=day + timedelta(days=1))
+
+        response = self.get_report(self.manager, start_date='2026-03-01', end_date='2026-03-07')
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual(data['period'], ['2026-03-02', '2026-03-02', '2026-03-03'])
+        self.assertEqual(data['user'], [self.user.id, self.user.id, self.manager.id])
+        self.assertEqual(data['project'], [self.website.id, self.app.id, self.app.id])
+        self.assertEqual(data['seconds'], [3 * 3600, 4 * 3600, 8 * 3600])
+        self.assertEqual(data['entries'], [2, 1, 1])
+        self.assertEqual(response.data['total_hours'], 15)
+        self.assertEqual(response.data['labels']['project'][str(self.app.id)], 'App')
+
+    def test_monthly_totals_per_project(self):
+        self.log(self.user, self.website, datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc), 2)
+        self.log(self.user, self.website, datetime(2026, 3, 20, 9, tzinfo=dt_timezone.utc), 3)
+        self.log(self.user, self.website, datetime(2026, 4, 1, 9, tzinfo=dt_timezone.utc), 1)
+
+        response = self.get_report(
+            self.user, start_date='2026-03-01', end_date='2026-04-30', period='month', group_by='project'
+        )
+        self.assertEqual(response.data['data']['period'], ['2026-03-01', '2026-04-01'])
+        self.assertEqual(response.data['data']['seconds'], [5 * 3600, 3600])
+        self.assertNotIn('user', response.data['data'])
+
+    def test_days_follow_requested_timezone(self):
+        # 23:30 UTC on the 2nd is already the 3rd in Manila
+        self.log(self.user, self.website, datetime(2026, 3, 2, 23, 30, tzinfo=dt_timezone.utc), 1)
+
+        response = self.get_report(
+            self.user, start_date='2026-03-01', end_date='2026-03-07', timezone='Asia/Manila'
+        )
+        self.assertEqual(response.data['data']['period'], ['2026-03-03'])
+
+    def test_midnight_crossing_entries_agree_on_both_paths(self):
+        self.log(self.user, self.website, datetime(2026, 3, 1, 22, tzinfo=dt_timezone.utc), 3.5)
+        self.log(self.user, self.website, datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc), 1)
+
+        # UTC reads the rollup; Etc/GMT is the same offset, aggregated from the raw entries
+        for timezone_name in ('UTC', 'Etc/GMT'):
+            with self.subTest(timezone=timezone_name):
+                report = self.get_report(
+                    self.user, start_date='2026-03-01', end_date='2026-03-07', timezone=timezone_name
+                ).data
+                self.assertEqual(report['data']['period'], ['2026-03-01', '2026-03-02'])
+                self.assertEqual(report['data']['seconds'], [7200, 5400 + 3600])
+                self.assertEqual(report['data']['entries'], [1, 1])
+                self.assertEqual(report['total_entries'], 2)
+
+                # Only the time worked within the range; the entry belongs to the 1st
+                report = self.get_report(
+                    self.user, start_date='2026-03-02', end_date='2026-03-07', timezone=timezone_name
+                ).data
+                self.assertEqual(report['data']['seconds'], [5400 + 3600])
+                self.assertEqual(report['total_entries'], 1)
+
+                report = self.get_report(
+                    self.user, start_date='2026-02-23', end_date='2026-03-01',
+                    period='week', timezone=timezone_name,
+                ).data
+                self.assertEqual(report['data']['period'], ['2026-02-23'])
+                self.assertEqual(report['data']['seconds'], [7200])
+
+    def test_report_is_scoped_to_visible_entries(self):
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        self.log(self.user, self.website, day, 1)
+        self.log(self.outsider, self.website, day, 2)
+
+        params = {'start_date': '2026-03-01', 'end_date': '2026-03-07'}
+        self.assertEqual(self.get_report(self.user, **params).data['total_hours'], 1)
+        self.assertEqual(self.get_report(self.manager, **params).data['total_hours'], 1)
+        self.assertEqual(self.get_report(self.outsider, **params).data['total_hours'], 2)
+
+    def test_invalid_parameters_are_rejected(self):
+        response = self.get_report(self.user, group_by='client', timezone='Mars/Olympus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('group_by', response.data)
+        self.assertIn('timezone', response.data)
+
+    def test_report_query_count_is_constant(self):
+        start = datetime(2026, 3, 1, 9, tzinfo=dt_timezone.utc)
+        for day in range(20):
+            self.log(self.user, self.website if day % 2 else self.app, start + timedelta(days=day), 1)
+
+        # The aggregate plus one label lookup per grouping
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('reports'), {'start_date': '2026-03-01', 'end_date': '2026-03-31'})
+
+
+class DailyTimesheetTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.project = Project.objects.create(name='Website')
+
+    def days(self):
+        return {
+            (day.project_id, day.date.isoformat()): (day.seconds, day.entry_count)
+            for day in DailyTimesheet.objects.filter(user=self.user)
+        }
+
+    def test_entries_crossing_midnight_are_split(self):
+        TimeEntry.objects.create(
+            user=self.user, project=self.project,
+            clock_in=datetime(2026, 3, 1, 22, tzinfo=dt_timezone.utc),
+            clock_out=datetime(2026, 3, 2, 1, 30, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(self.days(), {
+            (self.project.id, '2026-03-01'): (7200, 1),
+            (self.project.id, '2026-03-02'): (5400, 0),
+        })
+
+        TimeEntry.objects.get().delete()
+        self.assertEqual(self.days(), {})
+
+    def test_edits_and_deletes_are_applied_incrementally(self):
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        first = TimeEntry.objects.create(user=self.user, clock_in=day, clock_out=day + timedelta(hours=2))
+        TimeEntry.objects.create(
+            user=self.user, project=self.project, clock_in=day, clock_out=day + timedelta(hours=1)
+        )
+
+        entry = TimeEntry.objects.get(pk=first.pk)
+        entry.project = self.project
+        entry.clock_out = day + timedelta(hours=3)
+        entry.save()
+        self.assertEqual(self.days(), {(self.project.id, '2026-03-02'): (4 * 3600, 2)})
+
+        entry.delete()
+        self.assertEqual(self.days(), {(self.project.id, '2026-03-02'): (3600, 1)})
+
+    def test_open_entries_are_not_counted_until_closed(self):
+        TimeEntry.objects.create(user=self.user, clock_in=timezone.now() - timedelta(minutes=30))
+        self.assertEqual(self.days(), {})
+
+        TimeEntry.objects.close_active_entry(self.user)
+        ((seconds, count),) = self.days().values()
+        self.assertEqual(count, 1)
+        self.assertAlmostEqual(seconds, 1800, delta=1)
+
+    def test_deleting_a_project_keeps_its_days(self):
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        TimeEntry.objects.create(user=self.user, clock_in=day, clock_out=day + timedelta(hours=1))
+        TimeEntry.objects.create(
+            user=self.user, project=self.project, clock_in=day, clock_out=day + timedelta(hours=2)
+        )
+
+        self.project.delete()
+        self.assertEqual(self.days(), {(None, '2026-03-02'): (3 * 3600, 2)})
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        start = datetime(2026, 3, 1, 20, tzinfo=dt_timezone.utc)
+        for index in range(5):
+            TimeEntry.objects.create(
+                user=self.user, project=self.project if index % 2 else None,
+                clock_in=start + timedelta(hours=7 * index),
+                clock_out=start + timedelta(hours=7 * index + 6),
+            )
+        incremental = self.days()
+        DailyTimesheet.objects.rebuild()
+        self.assertEqual(self.days(), incremental)
+
+    def test_report_reads_days_from_the_rollup(self):
+        TimeEntry.objects.create(
+            user=self.user, project=self.project,
+            clock_in=datetime(2026, 3, 1, 22, tzinfo=dt_timezone.utc),
+            clock_out=datetime(2026, 3, 2, 1, tzinfo=dt_timezone.utc),
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('reports'), {
+            'start_date': '2026-03-01', 'end_date': '2026-03-02', 'group_by': '',
+        })
+        self.assertEqual(response.data['data']['period'], ['2026-03-01', '2026-03-02'])
+        self.assertEqual(response.data['data']['seconds'], [7200, 3600])
+
+
+class BulkClockEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='Acme', slug='acme')
+        self.kiosk = CustomUser.objects.create_user(
+            username='kiosk', email='kiosk@example.com', password='password',
+            organization=self.organization, role='manager',
+        )
+        self.project = Project.objects.create(name='Warehouse')
+        self.client = APIClient()
+        self.client.force_authenticate(self.kiosk)
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=10)
+
+    def create_workers(self, count):
+        return [
+            CustomUser.objects.create_user(
+                username=f'worker{index}', email=f'worker{index}@example.com', password='password',
+                organization=self.organization,
+            )
+            for index in range(count)
+        ]
+
+    def shift(self, user, prefix='shift'):
+        return [
+            {'key': f'{prefix}-{user.id}-in', 'user': user.id, 'direction': 'in',
+             'timestamp': self.start.isoformat(), 'project': self.project.id},
+            {'key': f'{prefix}-{user.id}-out', 'user': user.id, 'direction': 'out',
+             'timestamp': (self.start + timedelta(hours=8)).isoformat()},
+        ]
+
+    def post(self, events):
+        return self.client.post(reverse('clock-events'), {'events': events}, format='json')
+
+    def test_new_entries_get_their_ids_without_returning_rows(self):
+        # MySQL; an older entry of the worker, e.g. imported, shares the new clock_in
+        worker, = self.create_workers(1)
+        older = TimeEntry.objects.create(user=worker, clock_in=self.start, clock_out=self.start)
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock) as returns:
+            returns.return_value = False
+            response = self.post(self.shift(worker))
+        self.assertEqual([result['result'] for result in response.data['results']], ['created', 'closed'])
+        entry = TimeEntry.objects.exclude(pk=older.pk).get()
+        self.assertEqual({result['time_entry'] for result in response.data['results']}, {entry.pk})
+        self.assertEqual(entry.project, self.project)
+        stats = ProjectStats.objects.get(project=self.project)
+        self.assertEqual((stats.entry_count, stats.total_duration), (1, timedelta(hours=8)))
+        self.assertEqual(
+            sum(DailyTimesheet.objects.filter(user=worker).values_list('seconds', flat=True)), 8 * 3600
+        )
+
+    def test_keys_are_scoped_to_the_submitter(self):
+        worker, = self.create_workers(1)
+        self.post(self.shift(worker))
+
+        other = Organization.objects.create(name='Other', slug='other')
+        other_kiosk = CustomUser.objects.create_user(
+            username='other-kiosk', email='other-kiosk@example.com', organization=other, role='manager',
+        )
+        stranger = CustomUser.objects.create_user(username='stranger', email='stranger@example.com', organization=other)
+        self.client.force_authenticate(other_kiosk)
+        # Same keys, but the other kiosk's own events: nothing of Acme's comes back
+        events = [dict(event, user=stranger.id) for event in self.shift(worker)]
+        del events[0]['project']
+        response = self.post(events)
+        self.assertEqual([result['replayed'] for result in response.data['results']], [False, False])
+        self.assertEqual([result['result'] for result in response.data['results']], ['created', 'closed'])
+        entry = TimeEntry.objects.get(user=stranger)
+        self.assertEqual({result['time_entry'] for result in response.data['results']}, {entry.pk})
+
+        # Each kiosk still replays its own
+        response = self.post(events)
+        self.assertTrue(all(result['replayed'] for result in response.data['results']))
+        self.assertEqual(TimeEntry.objects.count(), 2)
+
+    def test_batch_creates_and_closes_entries(self):
+        first, second = self.create_workers(2)
+        events = self.shift(first) + self.shift(second)[:1]
+        response = self.post(events)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['result'] for result in response.data['results']], ['created', 'closed', 'created'])
+        self.assertEqual(response.data['closed'], 1)
+        entry = TimeEntry.objects.get(user=first)
+        self.assertEqual(entry.clock_out - entry.clock_in, timedelta(hours=8))
+        self.assertTrue(TimeEntry.objects.get(user=second).is_active)
+        self.assertEqual(self.project.stats.entry_count, 1)
+        self.assertEqual(sum(DailyTimesheet.objects.values_list('seconds', flat=True)), 8 * 3600)
+
+    def test_closes_entries_opened_before_the_batch(self):
+        (worker,) = self.create_workers(1)
+        self.post(self.shift(worker)[:1])
+        response = self.post(self.shift(worker)[1:])
+        self.assertEqual(response.data['results'][0]['result'], 'closed')
+        self.assertFalse(TimeEntry.objects.get(user=worker).is_active)
+
+    def test_replayed_batch_returns_stored_results(self):
+        (worker,) = self.create_workers(1)
+        first = self.post(self.shift(worker))
+        replay = self.post(self.shift(worker))
+
+        self.assertEqual(TimeEntry.objects.filter(user=worker).count(), 1)
+        self.assertEqual(
+            [result['time_entry'] for result in replay.data['results']],
+            [result['time_entry'] for result in first.data['results']],
+        )
+        self.assertTrue(all(result['replayed'] for result in replay.data['results']))
+
+    def test_invalid_events_are_rejected_individually(self):
+        (worker,) = self.create_workers(1)
+        outsider = CustomUser.objects.create_user(
+            username='outsider', email='outsider@example.com', password='password'
+        )
+        response = self.post([
+            {'key': 'a', 'user': worker.id, 'direction': 'out', 'timestamp': self.start.isoformat()},
+            {'key': 'b', 'user': outsider.id, 'direction': 'in', 'timestamp': self.start.isoformat()},
+            {'key': 'c', 'user': worker.id, 'direction': 'in',
+             'timestamp': (timezone.now() + timedelta(hours=1)).isoformat()},
+        ] + self.shift(worker))
+
+        results = response.data['results']
+        self.assertEqual([result['result'] for result in results], ['rejected'] * 3 + ['created', 'closed'])
+        self.assertEqual(results[0]['error'], 'User is not clocked in.')
+        self.assertEqual(results[1]['error'], 'Unknown or inactive user.')
+        self.assertEqual(results[2]['error'], 'Timestamp is in the future.')
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def count_queries(workers, prefix):
+            events = [event for worker in workers for event in self.shift(worker, prefix)]
+            with CaptureQueriesContext(connection) as queries:
+                self.post(events)
+            return len(queries)
+
+        workers = self.create_workers(21)
+        # The first batch also creates the project's stats row
+        count_queries(workers[:1], 'warm-up')
+        self.assertEqual(count_queries(workers[1:3], 'small'), count_queries(workers[3:], 'large'))
+
+
+class TimeEntryImportTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme')
+        self.manager = CustomUser.objects.create_user(
+            username='manager', email='manager@example.com', password='password',
+            organization=self.organization, role='manager',
+        )
+        self.worker = CustomUser.objects.create_user(
+            username='worker', email='Worker@Example.com', password='password',
+            organization=self.organization,
+        )
+        self.outsider = CustomUser.objects.create_user(
+            username='outsider', email='outsider@example.com', password='password'
+        )
+        self.project = Project.objects.create(name='Website')
+
+    def test_imports_csv_in_chunks_and_rejects_bad_rows(self):
+        csv_data = (
+            'user_email,project,clock_in,clock_out,notes\n'
+            'worker@example.com,Website,2026-03-02T09:00:00Z,2026-03-02T12:00:00Z,Morning\n'
+            'worker@example.com,,2026-03-02 13:00,2026-03-02 17:00,\n'
+            'nobody@example.com,,2026-03-02T09:00:00Z,2026-03-02T10:00:00Z,\n'
+            'worker@example.com,Nope,2026-03-03T09:00:00Z,2026-03-03T10:00:00Z,\n'
+            'worker@example.com,Website,2026-03-03T09:00:00Z,2026-03-03T08:00:00Z,\n'
+            'worker@example.com,Website,2026-03-04T09:00:00Z,2026-03-04T10:00:00Z,\n'
+        )
+        report = import_time_entries(io.StringIO(csv_data), 'csv', chunk_size=2)
+
+        self.assertEqual((report.rows, report.imported, report.rejected), (6, 3, 3))
+        self.assertEqual([error['line'] for error in report.errors], [4, 5, 6])
+        self.assertEqual(self.worker.time_entries.count(), 3)
+        self.assertEqual(self.project.stats.entry_count, 2)
+        self.assertEqual(
+            sum(DailyTimesheet.objects.filter(user=self.worker).values_list('seconds', flat=True)),
+            8 * 3600,
+        )
+
+    def test_undecodable_and_malformed_rows_are_rejected_mid_stream(self):
+        rows = [
+            b'user_email,clock_in,clock_out,notes',
+            b'worker@example.com,2026-03-02T09:00:00Z,2026-03-02T10:00:00Z,',
+            b'worker@example.com,2026-03-03T09:00:00Z,2026-03-03T10:00:00Z,caf\xe9',
+            b'worker@example.com,2026-03-04T09:00:00Z,2026-03-04T10:00:00Z,' + b'x' * 200000,
+            b'worker@example.com,2026-03-05T09:00:00Z,2026-03-05T10:00:00Z,',
+        ]
+        report = import_time_entries(text_stream(io.BytesIO(b'\n'.join(rows))), 'csv', chunk_size=1)
+        self.assertEqual((report.rows, report.imported, report.rejected), (4, 2, 2))
+        self.assertEqual([error['line'] for error in report.errors], [3, 4])
+        self.assertIn('byte sequence', report.errors[0]['error'])
+        self.assertIn('Invalid CSV', report.errors[1]['error'])
+
+        lines = [
+            b'{"user_email": "worker@example.com", "clock_in": "2026-03-06T09:00:00Z", "clock_out": "2026-03-06T10:00:00Z", "notes": "caf\xe9"}',
+            b'{"user_email": "worker@example.com", "clock_in": "2026-03-07T09:00:00Z", "clock_out": "2026-03-07T10:00:00Z"}',
+        ]
+        report = import_time_entries(text_stream(io.BytesIO(b'\n'.join(lines))), 'ndjson')
+        self.assertEqual((report.imported, report.rejected), (1, 1))
+        self.assertEqual(TimeEntry.objects.filter(user=self.worker).count(), 3)
+
+    def test_back_fills_inactive_users_and_rejects_ambiguous_projects(self):
+        CustomUser.objects.filter(pk=self.worker.pk).update(is_active=False)
+        Project.objects.create(name='Support', organization=self.organization)
+        Project.objects.create(name='Support', organization=self.organization)
+        csv_data = (
+            'user_email,project,clock_in,clock_out\n'
+            'worker@example.com,Website,2026-03-02T09:00:00Z,2026-03-02T10:00:00Z\n'
+            'worker@example.com,Support,2026-03-03T09:00:00Z,2026-03-03T10:00:00Z\n'
+        )
+        report = import_time_entries(io.StringIO(csv_data), 'csv')
+
+        self.assertEqual((report.imported, report.rejected), (1, 1))
+        self.assertEqual(report.errors, [{'line': 3, 'error': "Several projects are named 'Support'"}])
+        self.assertEqual(self.worker.time_entries.get().project, self.project)
+
+    def test_upload_endpoint_imports_ndjson_for_managed_users(self):
+        lines = [
+            {'user_email': 'worker@example.com', 'clock_in': '2026-03-02T09:00:00Z',
+             'clock_out': '2026-03-02T10:00:00Z', 'project': 'Website'},
+            {'user_email': 'outsider@example.com', 'clock_in': '2026-03-02T09:00:00Z',
+             'clock_out': '2026-03-02T10:00:00Z'},
+        ]
+        upload = SimpleUploadedFile(
+            'entries.ndjson', ('\n'.join(json.dumps(line) for line in lines) + '\n{oops\n').encode()
+        )
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        response = client.post(reverse('time-entry-import-entries'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['rejected'], 2)
+        self.assertFalse(self.outsider.time_entries.exists())
+
+
+class TimesheetExportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password'
+        )
+        self.other = CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='password'
+        )
+        self.project = Project.objects.create(name='Website')
+        start = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        for day in range(3):
+            TimeEntry.objects.create(
+                user=self.user, project=self.project,
+                clock_in=start + timedelta(days=day),
+                clock_out=start + timedelta(days=day, hours=2, minutes=30),
+                notes='=HYPERLINK("http://example.com")' if day == 0 else '',
+            )
+        TimeEntry.objects.create(user=self.other, clock_in=start, clock_out=start + timedelta(hours=1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_export_streams_own_entries(self):
+        response = self.client.get(reverse('time-entry-export'), {'end_date': '2026-03-03'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:3], ['id', 'user_email', 'project'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][1:3], ['worker@example.com', 'Website'])
+        self.assertEqual(rows[1][5:7], ['02:30:00', '2.5'])
+        # Spreadsheets must not evaluate free text as a formula
+        self.assertEqual(rows[1][7], '\'=HYPERLINK("http://example.com")')
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        response = self.client.get(reverse('time-entry-export'), {'type': 'xlsx'})
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+        namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        self.assertEqual(len(sheet.findall(f'{namespace}sheetData/{namespace}row')), 4)
+
+    def test_export_pages_through_keyset_chunks(self):
+        start = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        TimeEntry.objects.create(user=self.user, clock_in=start, clock_out=start + timedelta(hours=1))
+        expected = list(
+            TimeEntry.objects.filter(user=self.user).order_by('clock_in', 'id').values_list('id', flat=True)
+        )
+        with mock.patch('timekeeping.exports.CHUNK_SIZE', 2):
+            response = self.client.get(reverse('time-entry-export'))
+            rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row[0]) for row in rows[1:]], expected)
+
+    def test_export_reads_rows_without_model_instances(self):
+        # One query for the rows, whatever the number of entries
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('time-entry-export'))
+            b''.join(response.streaming_content)
+
+
+class BenchmarkCommandTests(TestCase):
+    def benchmark(self, *args):
+        call_command(
+            'benchmark_timekeeping', '--users', '3', '--organizations', '2', '--entries-per-user', '3',
+            '--time-off-per-user', '1', *args, stdout=io.StringIO(),
+        )
+
+    def test_runs_and_removes_its_data_without_touching_the_rollups_row_by_row(self):
+        user = CustomUser.objects.create_user(username='worker', email='worker@example.com', password='password')
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        TimeEntry.objects.create(user=user, clock_in=day, clock_out=day + timedelta(hours=1))
+
+        with mock.patch.object(DailyTimesheet.objects, 'apply_deltas') as apply_deltas:
+            self.benchmark('--iterations', '2', '--reports')
+        apply_deltas.assert_not_called()
+        self.assertFalse(CustomUser.objects.filter(username__startswith='bench-').exists())
+        self.assertFalse(Organization.objects.filter(slug__startswith='bench-').exists())
+        self.assertEqual(TimeEntry.objects.count(), 1)
+        self.assertEqual(DailyTimesheet.objects.get().user, user)
+
+    def test_kept_data_is_removed_by_the_next_run(self):
+        self.benchmark('--iterations', '2', '--keep')
+        self.assertEqual(CustomUser.objects.filter(username__startswith='bench-').count(), 3)
+        self.assertTrue(DailyTimesheet.objects.exists())
+
+        self.benchmark('--iterations', '2')
+        self.assertFalse(CustomUser.objects.filter(username__startswith='bench-').exists())
+        self.assertFalse(TimeEntry.objects.exists())
+        self.assertFalse(DailyTimesheet.objects.exists())
+
+    def test_refuses_databases_that_are_not_test_databases(self):
+        with mock.patch('timekeeping.management.commands.benchmark_timekeeping.is_test_database', return_value=False):
+            with self.assertRaisesMessage(CommandError, '--i-know-this-is-a-scratch-db'):
+                self.benchmark()
+            self.benchmark('--iterations', '2', '--i-know-this-is-a-scratch-db')
+        self.assertFalse(CustomUser.objects.filter(username__startswith='bench-').exists())
+
+    def test_needs_two_iterations_for_percentiles(self):
+        with self.assertRaisesMessage(CommandError, '--iterations'):
+            self.benchmark('--iterations', '1')
+        self.assertFalse(CustomUser.objects.filter(username__startswith='bench-').exists())
+
+
+class OrganizationScopeTests(TestCase):
+    def setUp(self):
+        self.acme = Organization.objects.create(name='Acme', slug='acme')
+        self.globex = Organization.objects.create(name='Globex', slug='globex')
+        self.staff = CustomUser.objects.create_user(
+            username='staff', email='staff@acme.example', password='password', organization=self.acme, is_staff=True,
+        )
+        self.worker = CustomUser.objects.create_user(
+            username='worker', email='worker@acme.example', password='password', organization=self.acme,
+        )
+        self.outsider = CustomUser.objects.create_user(
+            username='outsider', email='outsider@globex.example', password='password', organization=self.globex,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        now = timezone.now()
+        for user in (self.worker, self.outsider):
+            TimeEntry.objects.create(user=user, clock_in=now - timedelta(hours=2), clock_out=now - timedelta(hours=1))
+            TimeOff.objects.create(user=user, start_date=now.date(), end_date=now.date(), request_type='sick')
+
+    def test_rows_are_stamped_with_the_users_organization(self):
+        entry = TimeEntry.objects.get(user=self.worker)
+        self.assertEqual(entry.organization_id, self.acme.pk)
+        self.assertEqual(TimeOff.objects.get(user=self.worker).organization_id, self.acme.pk)
+        self.assertEqual(DailyTimesheet.objects.get(user=self.worker).organization_id, self.acme.pk)
+
+    def test_staff_only_see_their_organization(self):
+        entries = self.client.get(reverse('time-entry-list')).data['results']
+        self.assertEqual([entry['user'] for entry in entries], [self.worker.email])
+        time_off = self.client.get(reverse('time-off-list')).data
+        self.assertEqual(len(time_off), 1)
+
+        superuser = CustomUser.objects.create_superuser(
+            username='root', email='root@example.com', password='password', organization=self.acme,
+        )
+        self.client.force_authenticate(superuser)
+        self.assertEqual(len(self.client.get(reverse('time-entry-list')).data['results']), 2)
+
+    def test_reports_filter_on_the_organization_column(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('reports'), {'group_by': 'user'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['user'], [self.worker.pk])
+        aggregate = next(query['sql'] for query in queries if 'timekeeping_dailytimesheet' in query['sql'])
+        self.assertIn('organization_id', aggregate)
+        self.assertNotIn('users_customuser', aggregate)
+
+    def test_projects_are_the_organizations_and_the_shared_ones(self):
+        Project.objects.create(name='Shared')
+        Project.objects.create(name='Globex only', organization=self.globex)
+        response = self.client.post(reverse('project-list'), {'name': 'Acme only'})
+        self.assertEqual(Project.objects.get(pk=response.data['id']).organization, self.acme)
+
+        names = [project['name'] for project in self.client.get(reverse('project-list')).data]
+        self.assertEqual(sorted(names), ['Acme only', 'Shared'])
+
+    def test_bulk_paths_set_the_organization(self):
+        globex_project = Project.objects.create(name='Globex only', organization=self.globex)
+        response = self.client.post(reverse('clock-events'), {'events': [
+            {'key': 'a', 'user': self.worker.pk, 'direction': 'in', 'timestamp': timezone.now().isoformat()},
+            {'key': 'b', 'user': self.staff.pk, 'direction': 'in', 'timestamp': timezone.now().isoformat(),
+             'project': globex_project.pk},
+        ]}, format='json')
+        self.assertEqual([result['result'] for result in response.data['results']], ['created', 'rejected'])
+        self.assertEqual(TimeEntry.objects.get(clock_out__isnull=True).organization, self.acme)
+
+        csv_data = 'user_email,clock_in,clock_out\nstaff@acme.example,2024-01-01T09:00:00,2024-01-01T10:00:00\n'
+        import_time_entries(io.StringIO(csv_data), 'csv')
+        self.assertEqual(TimeEntry.objects.get(user=self.staff).organization, self.acme)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme', max_users=100)
+        self.superuser = CustomUser.objects.create_superuser(
+            username='root', email='root@example.com', password='password',
+        )
+        self.client.force_login(self.superuser)
+
+    def add_rows(self, count):
+        now = timezone.now()
+        start = CustomUser.objects.count()
+        for index in range(start, start + count):
+            user = CustomUser.objects.create_user(
+                username=f'worker{index}', email=f'worker{index}@example.com', organization=self.organization,
+            )
+            project = Project.objects.create(name=f'Project {index}', organization=self.organization)
+            TimeEntry.objects.create(
+                user=user, project=project, clock_in=now - timedelta(hours=2), clock_out=now - timedelta(hours=1),
+            )
+
+    def count_queries(self, model_name, app_label='timekeeping', **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:{app_label}_{model_name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        changelists = [
+            ('timeentry', 'timekeeping'), ('project', 'timekeeping'), ('dailytimesheet', 'timekeeping'),
+            ('customuser', 'users'), ('organization', 'users'),
+        ]
+        self.add_rows(2)
+        small = [self.count_queries(model_name, app_label) for model_name, app_label in changelists]
+        self.add_rows(8)
+        self.assertEqual([self.count_queries(model_name, app_label) for model_name, app_label in changelists], small)
+
+    def test_autocomplete_filter(self):
+        self.add_rows(3)
+        user = CustomUser.objects.get(username='worker2')
+        url = reverse('admin:timekeeping_timeentry_changelist')
+        response = self.client.get(url)
+        self.assertContains(response, 'admin-autocomplete')
+        # The sidebar doesn't list the users
+        self.assertNotContains(response, 'worker3@example.com</a></li>')
+
+        response = self.client.get(url, {'user__id__exact': user.pk})
+        self.assertEqual([entry.user_id for entry in response.context['cl'].result_list], [user.pk])
+        # The picked user is preselected in the search box
+        self.assertContains(response, f'<option value="{user.pk}" selected>')
+
+    def test_estimated_count_for_large_unfiltered_tables(self):
+        self.add_rows(3)
+        with mock.patch('core.admin.estimated_row_count', return_value=5000000):
+            self.assertEqual(EstimatedCountPaginator(TimeEntry.objects.all(), 100).count, 5000000)
+            # Filtered lists are counted
+            self.assertEqual(EstimatedCountPaginator(TimeEntry.objects.filter(project__isnull=False), 100).count, 3)
+        with mock.patch('core.admin.estimated_row_count', return_value=500):
+            self.assertEqual(EstimatedCountPaginator(TimeEntry.objects.all(), 100).count, 3)
+        # No estimate on sqlite
+        self.assertEqual(EstimatedCountPaginator(TimeEntry.objects.all(), 100).count, Paginator(TimeEntry.objects.all(), 100).count)
+
+
+class TimeOffReviewTests(TestCase):
+    def setUp(self):
+        self.acme = Organization.objects.create(name='Acme', slug='acme')
+        self.other = Organization.objects.create(name='Other', slug='other')
+        self.manager = CustomUser.objects.create_user(
+            username='manager', email='manager@example.com', organization=self.acme, is_staff=True,
+        )
+        self.worker = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', organization=self.acme,
+        )
+        self.outsider = CustomUser.objects.create_user(
+            username='outsider', email='outsider@example.com', organization=self.other,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.url = reverse('time-off-bulk-review')
+
+    def request_time_off(self, user, count=1, **fields):
+        today = timezone.now().date()
+        return [
+            TimeOff.objects.create(user=user, start_date=today, end_date=today, request_type='vacation', **fields).pk
+            for _ in range(count)
+        ]
+
+    def test_bulk_review_changes_only_pending_visible_requests(self):
+        pending = self.request_time_off(self.worker, 3)
+        done = self.request_time_off(self.worker, status='rejected')
+        foreign = self.request_time_off(self.outsider)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'ids': pending + done + foreign, 'status': 'approved', 'review_notes': 'Enjoy',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'reviewed': pending, 'skipped': done + foreign})
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+
+        for time_off in TimeOff.objects.filter(pk__in=pending):
+            self.assertEqual((time_off.status, time_off.reviewed_by, time_off.review_notes), ('approved', self.manager, 'Enjoy'))
+            self.assertIsNotNone(time_off.reviewed_at)
+        self.assertEqual(TimeOff.objects.get(pk=done[0]).status, 'rejected')
+        self.assertEqual(TimeOff.objects.get(pk=foreign[0]).status, 'pending')
+
+    def test_a_request_is_reviewed_only_once(self):
+        ids = self.request_time_off(self.worker, 2)
+        self.client.post(self.url, {'ids': ids, 'status': 'approved'}, format='json')
+        response = self.client.post(self.url, {'ids': ids, 'status': 'rejected'}, format='json')
+        self.assertEqual(response.data, {'reviewed': [], 'skipped': ids})
+        self.assertEqual(set(TimeOff.objects.values_list('status', flat=True)), {'approved'})
+
+        # The single review endpoint reports the lost race too
+        response = self.client.post(reverse('time-off-review', args=[ids[0]]), {'status': 'rejected'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_without_update_returning(self):
+        ids = self.request_time_off(self.worker, 2)
+        with mock.patch('timekeeping.models.TimeOffManager.can_return_from_update', return_value=False):
+            reviewed = TimeOff.objects.review(TimeOff.objects.filter(pk__in=ids), 'rejected', self.manager, 'No')
+        self.assertEqual(sorted(time_off.pk for time_off in reviewed), ids)
+        self.assertEqual(set(TimeOff.objects.values_list('status', 'review_notes')), {('rejected', 'No')})
+
+    def test_reviews_without_notes_keep_existing_notes(self):
+        ids = self.request_time_off(self.worker, review_notes='Cover arranged with Sam')
+        self.client.post(self.url, {'ids': ids, 'status': 'approved'}, format='json')
+        self.assertEqual(TimeOff.objects.get(pk=ids[0]).review_notes, 'Cover arranged with Sam')
+
+        ids = self.request_time_off(self.worker, review_notes='Cover arranged with Sam')
+        TimeOffAdmin(TimeOff, admin.site).approve_requests(mock.Mock(user=self.manager), TimeOff.objects.filter(pk__in=ids))
+        self.assertEqual(TimeOff.objects.get(pk=ids[0]).review_notes, 'Cover arranged with Sam')
+
+    def test_dashboard_sees_the_review(self):
+        ids = self.request_time_off(self.worker)
+        worker = APIClient()
+        worker.force_authenticate(self.worker)
+        self.assertEqual(len(worker.get(reverse('dashboard')).data['pending_time_off']), 1)
+
+        self.client.post(self.url, {'ids': ids, 'status': 'approved'}, format='json')
+        self.assertEqual(worker.get(reverse('dashboard')).data['pending_time_off'], [])
+
+    def test_employees_cannot_review(self):
+        ids = self.request_time_off(self.worker)
+        self.client.force_authenticate(self.worker)
+        response = self.client.post(self.url, {'ids': ids, 'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_actions(self):
+        ids = self.request_time_off(self.worker, 2) + self.request_time_off(self.worker, status='approved')
+        superuser = CustomUser.objects.create_superuser(username='root', email='root@example.com', password='password')
+        self.client.force_login(superuser)
+        response = self.client.post(reverse('admin:timekeeping_timeoff_changelist'), {
+            'action': 'reject_requests', '_selected_action': ids,
+        }, follow=True)
+        self.assertContains(response, '2 time off request(s) were rejected. 1 had already been reviewed.')
+        self.assertEqual(TimeOff.objects.filter(status='rejected', reviewed_by=superuser).count(), 2)
@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     TimeEntryViewSet, ProjectViewSet, TimeOffViewSet,
-    ClockInView, ClockOutView, DashboardView
+    ClockInView, ClockOutView, DashboardView, DashboardCacheStatsView,
+    ReportView, BulkClockEventView
 )
 
 # Create a router for ViewSets
@@ -15,5 +16,8 @@ urlpatterns = [
     path('', include(router.urls)),
     path('clock-in/', ClockInView.as_view(), name='clock-in'),
     path('clock-out/', ClockOutView.as_view(), name='clock-out'),
+    path('clock-events/', BulkClockEventView.as_view(), name='clock-events'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('dashboard/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
+    path('reports/', ReportView.as_view(), name='reports'),
 ]
@@ -1,39 +1,189 @@
+import json
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status, permissions, viewsets, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.etags import ConditionalListMixin, etag_matches, make_etag, not_modified
 
-from .models import TimeEntry, Project, TimeOff
+from . import cache as dashboard_cache
+from .models import TimeEntry, Project, ProjectStats, TimeOff, DailyTimesheet
+from .pagination import TimeEntryCursorPagination
 from .serializers import (
     TimeEntrySerializer, ProjectSerializer, TimeOffSerializer,
-    ClockInSerializer, ClockOutSerializer, TimeOffReviewSerializer
+    ClockInSerializer, ClockOutSerializer, TimeOffReviewSerializer, TimeOffBulkReviewSerializer,
+    TimesheetQuerySerializer, ReportQuerySerializer, ExportQuerySerializer, BulkClockEventSerializer,
+    ACTIVE_ENTRY_EXISTS_MESSAGE
 )
+from .clock_events import apply_clock_events
+from .exports import export_response, keyset_chunks
+from .importers import FORMATS as IMPORT_FORMATS, import_time_entries, text_stream
+from .reports import build_report, local_range, report_rows, timesheet_rows
+from .scopes import managed_users, manages_organization, sees_every_organization, visible_projects
+
+def timesheet_filter(user, params):
+    """
+    Filter on time entries or daily timesheets for reports and exports:
+    superusers see everyone, organization managers and staff their
+    organization (on its own indexed column) and everyone else themselves,
+    narrowed to the requested user and project
+    """
+    if sees_every_organization(user):
+        filters = Q()
+    elif manages_organization(user):
+        filters = Q(organization_id=user.organization_id)
+    else:
+        filters = Q(user=user)
+    if 'user' in params:
+        filters &= Q(user_id=params['user'])
+    if 'project' in params:
+        filters &= Q(project_id=params['project'])
+    return filters
+
+def clock_in_range(entries, params):
+    """Narrow entries to those clocked in on the requested local days"""
+    if 'start_date' in params:
+        start, _ = local_range(params['start_date'], params['start_date'], params['timezone'])
+        entries = entries.filter(clock_in__gte=start)
+    if 'end_date' in params:
+        _, end = local_range(params['end_date'], params['end_date'], params['timezone'])
+        entries = entries.filter(clock_in__lt=end)
+    return entries
 
 class TimeEntryViewSet(viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing time entries
+    
+    Lists are cursor paginated; pass ?stream=ndjson to instead receive every
+    matching entry as newline-delimited JSON, streamed as it is read.
     """
     serializer_class = TimeEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimeEntryCursorPagination
+    
+    # Rows fetched from the database per round-trip while streaming
+    stream_chunk_size = 2000
     
     def get_queryset(self):
         """
-        Filter time entries to only show the current user's entries
-        unless the user is a staff member or superuser
+        Filter time entries to only show the current user's entries, unless
+        the user is a staff member (their organization's entries) or a
+        superuser
         """
         user = self.request.user
+        queryset = TimeEntry.objects.select_related('user', 'project')
         
         # Admin users can see all entries
-        if user.is_staff or user.is_superuser:
-            return TimeEntry.objects.all()
+        if sees_every_organization(user):
+            return queryset
+        if user.is_staff:
+            return queryset.filter(organization_id=user.organization_id)
         
         # Regular users can only see their own entries
-        return TimeEntry.objects.filter(user=user)
+        return queryset.filter(user=user)
+    
+    def filter_queryset(self, queryset):
+        """
+        Lists take the date, timezone, user and project parameters of the
+        reports endpoint, so a client can fetch e.g. one week of entries
+        """
+        if self.action != 'list':
+            return queryset
+        serializer = TimesheetQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if 'user' in params:
+            queryset = queryset.filter(user_id=params['user'])
+        if 'project' in params:
+            queryset = queryset.filter(project_id=params['project'])
+        return clock_in_range(queryset, params)
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') == 'ndjson':
+            return self.stream_ndjson()
+        return super().list(request, *args, **kwargs)
+    
+    def stream_ndjson(self):
+        """
+        Stream the whole queryset as NDJSON without materializing it, so the
+        worker only ever holds one chunk of rows in memory
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        # Newest first, like the pages (TimeEntryCursorPagination.ordering)
+        chunks = keyset_chunks(
+            queryset, 'clock_in', key=lambda entry: (entry.clock_in, entry.pk),
+            descending=True, chunk_size=self.stream_chunk_size,
+        )
+        
+        def rows():
+            for chunk in chunks:
+                for entry in chunk:
+                    yield json.dumps(serializer.to_representation(entry), cls=JSONEncoder) + '\n'
+        
+        return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        try:
+            serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError(ACTIVE_ENTRY_EXISTS_MESSAGE)
+    
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except IntegrityError:
+            raise ValidationError(ACTIVE_ENTRY_EXISTS_MESSAGE)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_entries(self, request):
+        """
+        Import completed time entries from an uploaded CSV or NDJSON file
+        (form field `file`, format from `type` or the file extension) for
+        the users the requester manages. Returns the import report.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was uploaded.']}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('type') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {'type': [f"Unsupported format. Choose from: {', '.join(IMPORT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Large uploads are spooled to a temporary file by Django, and the
+        # importer reads it one row at a time
+        report = import_time_entries(
+            text_stream(upload.file), file_format,
+            users=managed_users(request.user), projects=visible_projects(request.user),
+        )
+        return Response(report.as_dict())
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Download time entries as CSV or XLSX (?type=csv|xlsx), streamed as
+        they are read. Takes the same date, timezone, user and project
+        parameters as the reports endpoint.
+        """
+        serializer = ExportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        entries = clock_in_range(TimeEntry.objects.filter(timesheet_filter(request.user, params)), params)
+        return export_response(entries, params['type'], params['timezone'])
     
     @action(detail=False, methods=['get'])
     def current(self, request):
@@ -41,7 +191,9 @@ class TimeEntryViewSet(viewsets.ModelViewSet):
         Get the currently active time entry for the current user, if any
         """
         try:
-            active_entry = TimeEntry.objects.get(user=request.user, clock_out__isnull=True)
+            active_entry = TimeEntry.objects.select_related('user', 'project').get(
+                user=request.user, clock_out__isnull=True
+            )
             serializer = self.get_serializer(active_entry)
             return Response(serializer.data)
         except TimeEntry.DoesNotExist:
@@ -69,12 +221,41 @@ class ClockOutView(APIView):
     def post(self, request):
         serializer = ClockOutSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            active_entry = serializer.validated_data['active_entry']
-            time_entry = serializer.update(active_entry, serializer.validated_data)
+            time_entry = serializer.save()
             return Response(TimeEntrySerializer(time_entry).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class BulkClockEventView(APIView):
+    """
+    API endpoint for batches of clock in/out events, e.g. swipes buffered by
+    badge readers. Every event carries an idempotency key, so a batch can
+    safely be sent again; each event gets its own result.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BulkClockEventSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            results = apply_clock_events(
+                serializer.validated_data['events'], request.user,
+                managed_users(request.user), visible_projects(request.user),
+            )
+        except IntegrityError:
+            # A concurrent batch clocked the same users or used the same keys
+            return Response(
+                {'detail': 'The batch conflicts with a concurrent one. Send it again.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        counts = {result: 0 for result in ('created', 'closed', 'rejected')}
+        for result in results:
+            counts[result['result']] += 1
+        return Response({'results': results, **counts})
+
+class ProjectViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing projects
     """
@@ -83,10 +264,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        return self.get_projects().with_total_time()
+    
+    def get_projects(self):
         """
-        Filter projects to only show active ones by default
+        The organization's own and the shared projects, optionally only
+        the active ones
         """
-        queryset = Project.objects.all()
+        queryset = visible_projects(self.request.user)
         
         # Filter by active status if requested
         active_only = self.request.query_params.get('active_only', None)
@@ -94,8 +279,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(is_active=True)
             
         return queryset
+    
+    def get_etag_querysets(self):
+        # The listed totals change with the project stats, not the projects
+        projects = self.get_projects()
+        return [projects, ProjectStats.objects.filter(project__in=projects)]
+    
+    def perform_create(self, serializer):
+        serializer.save(organization=self.request.user.organization)
 
-class TimeOffViewSet(viewsets.ModelViewSet):
+class TimeOffViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing time off requests
     """
@@ -109,9 +302,11 @@ class TimeOffViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         
-        # Admin users can see all requests
-        if user.is_staff or user.is_superuser:
+        # Admin users can see all requests, staff those of their organization
+        if sees_every_organization(user):
             return TimeOff.objects.all()
+        if user.is_staff:
+            return TimeOff.objects.filter(organization_id=user.organization_id)
         
         # Regular users can only see their own requests
         return TimeOff.objects.filter(user=user)
@@ -143,38 +338,136 @@ class TimeOffViewSet(viewsets.ModelViewSet):
             return Response(TimeOffSerializer(time_off).data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-review')
+    def bulk_review(self, request):
+        """
+        Approve or reject many requests with one conditional UPDATE.
+        Requests that are no longer pending, or not visible to the
+        reviewer, are reported as skipped rather than failing the batch.
+        """
+        if not request.user.is_staff and not request.user.is_superuser:
+            return Response(
+                {'detail': 'You do not have permission to review time off requests'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = TimeOffBulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        reviewed = TimeOff.objects.review(
+            self.get_queryset().filter(pk__in=ids),
+            serializer.validated_data['status'],
+            request.user,
+            serializer.validated_data.get('review_notes'),
+        )
+        reviewed_ids = {time_off.pk for time_off in reviewed}
+        return Response({
+            'reviewed': sorted(reviewed_ids),
+            'skipped': [pk for pk in dict.fromkeys(ids) if pk not in reviewed_ids],
+        })
 
 class DashboardView(APIView):
     """
     API endpoint to get dashboard data for the current user
+    
+    The payload is served from the dashboard cache (see timekeeping.cache),
+    which the model signals invalidate whenever the underlying rows change.
+    Its ETag combines the digests stored with the cached blocks, so polling
+    clients get a 304 without anything being queried or rendered.
     """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         user = request.user
+        user_data, user_digest = dashboard_cache.get_user_block(
+            user, lambda: self.build_user_block(user)
+        )
+        active_projects_data, projects_digest = dashboard_cache.get_projects_block(
+            user.organization_id, lambda: self.build_projects_block(user.organization_id)
+        )
+        
+        etag = make_etag(user_digest, projects_digest)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
+        return Response({
+            'active_time_entry': user_data['active_time_entry'],
+            'recent_time_entries': user_data['recent_time_entries'],
+            'pending_time_off': user_data['pending_time_off'],
+            'active_projects': active_projects_data
+        }, headers={'ETag': etag})
+    
+    def build_user_block(self, user):
+        time_entries = TimeEntry.objects.select_related('user', 'project')
         
         # Get the user's active time entry if any
         try:
-            active_entry = TimeEntry.objects.get(user=user, clock_out__isnull=True)
+            active_entry = time_entries.get(user=user, clock_out__isnull=True)
             active_entry_data = TimeEntrySerializer(active_entry).data
         except TimeEntry.DoesNotExist:
             active_entry_data = None
         
         # Get the user's recent time entries
-        recent_entries = TimeEntry.objects.filter(user=user).order_by('-clock_in')[:5]
+        recent_entries = time_entries.filter(user=user).order_by('-clock_in')[:5]
         recent_entries_data = TimeEntrySerializer(recent_entries, many=True).data
         
         # Get the user's pending time off requests
-        pending_time_off = TimeOff.objects.filter(user=user, status='pending')
+        pending_time_off = TimeOff.objects.filter(user=user, status='pending').select_related('reviewed_by')
         pending_time_off_data = TimeOffSerializer(pending_time_off, many=True).data
         
-        # Get active projects
-        active_projects = Project.objects.filter(is_active=True)
-        active_projects_data = ProjectSerializer(active_projects, many=True).data
-        
-        return Response({
+        return {
             'active_time_entry': active_entry_data,
             'recent_time_entries': recent_entries_data,
             'pending_time_off': pending_time_off_data,
-            'active_projects': active_projects_data
+        }
+    
+    def build_projects_block(self, organization_id):
+        # Get the organization's active projects
+        active_projects = Project.objects.for_organization(organization_id).filter(is_active=True).with_total_time()
+        return ProjectSerializer(active_projects, many=True).data
+
+class DashboardCacheStatsView(APIView):
+    """
+    API endpoint exposing the dashboard cache hit/miss counters for monitoring
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(dashboard_cache.cache_stats())
+
+class ReportView(APIView):
+    """
+    API endpoint for timesheet reports: durations of completed entries
+    grouped by period (day, week or month) and by user and/or project,
+    aggregated in the database and returned as columns.
+    
+    Reports in the default timezone are read from the daily timesheet rollup.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = ReportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        filters = timesheet_filter(request.user, params)
+        if str(params['timezone']) == settings.TIME_ZONE:
+            timesheets = DailyTimesheet.objects.filter(
+                filters, date__gte=params['start_date'], date__lte=params['end_date']
+            )
+            rows = timesheet_rows(timesheets, params['period'], params['group_by'])
+        else:
+            rows = report_rows(
+                TimeEntry.objects.filter(filters), params['period'], params['group_by'],
+                params['timezone'], params['start_date'], params['end_date'],
+            )
+        
+        report = build_report(rows, params['period'], params['group_by'], params['timezone'])
+        return Response({
+            'start_date': params['start_date'],
+            'end_date': params['end_date'],
+            **report,
         })
+
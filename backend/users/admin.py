@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, UserProfile, Organization
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+
+from core.admin import AutocompleteFilter
+from .models import CustomUser, UserProfile, Organization, OrganizationFull, OutgoingEmail
 
 class OrganizationAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug', 'user_count', 'max_users', 'is_active', 'created_at']
@@ -8,12 +12,18 @@ class OrganizationAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     readonly_fields = ['user_count', 'created_at', 'updated_at']
     prepopulated_fields = {'slug': ('name',)}
+    
+    @admin.display(description='Users', ordering='seat_count')
+    def user_count(self, organization):
+        return organization.seat_count
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
     list_display = ['email', 'username', 'first_name', 'last_name', 'organization', 'role', 'is_staff']
-    list_filter = ['organization', 'role', 'is_staff', 'is_invited']
+    list_filter = [('organization', AutocompleteFilter), 'role', 'is_staff', 'is_invited']
+    list_select_related = ['organization']
     search_fields = ['email', 'username', 'first_name', 'last_name']
+    autocomplete_fields = ['organization', 'invited_by']
     fieldsets = UserAdmin.fieldsets + (
         ('Organization Info', {'fields': ('organization', 'role')}),
         ('Additional Info', {'fields': ('job_title', 'department', 'phone_number')}),
@@ -24,11 +34,36 @@ class CustomUserAdmin(UserAdmin):
         ('Additional Info', {'fields': ('email', 'job_title', 'department', 'phone_number')}),
     )
     readonly_fields = ['invitation_token', 'invited_at']
+    
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # The form checks for a free seat, but the seat is only taken on
+        # save and another request may have taken the last one in between
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except OrganizationFull as error:
+            self.message_user(request, error.message, messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
 
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'date_of_birth', 'hire_date']
+    list_select_related = ['user']
     search_fields = ['user__email', 'user__username']
 
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['to', 'kind', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['to', 'subject']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
+    raw_id_fields = ['user']
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} email(s) were queued for the next worker run.")
+    retry_now.short_description = "Retry selected emails now"
+
 admin.site.register(Organization, OrganizationAdmin)
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(UserProfile, UserProfileAdmin)
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
@@ -6,27 +6,37 @@ from django.db.models import Q
 class EmailOrUsernameModelBackend(ModelBackend):
     """
     Authentication backend which allows users to authenticate using either their
-    username or email address
+    username or email address, case-insensitively
     """
     def authenticate(self, request, username=None, password=None, email=None, **kwargs):
         UserModel = get_user_model()
-        
-        # If email is explicitly provided, use it
-        if email:
-            kwargs = {'email': email}
-        # If username looks like an email, try to authenticate with email
-        elif username and '@' in username:
-            kwargs = {'email': username}
-        # Otherwise try to authenticate with username
-        else:
-            kwargs = {'username': username}
-            
-        try:
-            user = UserModel.objects.get(**kwargs)
-            if user.check_password(password):
-                return user
-        except UserModel.DoesNotExist:
+        identifier = email or username
+        if not identifier or password is None:
+            return None
+
+        # One indexed query matches either identifier; an email is preferred
+        # over a username that happens to look the same, and an exact match
+        # over one differing only in case
+        lowered = identifier.lower()
+        field = 'email' if email or '@' in identifier else 'username'
+        candidates = (
+            # Login responses serialize these right away
+            UserModel.objects.select_related('profile', 'organization', 'auth_token')
+            .filter(Q(email_lower=lowered) | Q(username_lower=lowered))
+        )
+        candidates = sorted(candidates, key=lambda user: (
+            getattr(user, field).lower() != lowered,
+            identifier not in (user.email, user.username),
+        ))
+
+        if not candidates:
+            # Hash anyway, so unknown identifiers take as long as wrong passwords
+            UserModel().set_password(password)
             return None
+        user = candidates[0]
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
 
     def get_user(self, user_id):
         UserModel = get_user_model()
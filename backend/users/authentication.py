@@ -0,0 +1,103 @@
+"""
+Token authentication that remembers recently seen tokens.
+
+DRF's TokenAuthentication reads the token and its user from the database on
+every request. CachedTokenAuthentication keeps token -> user in the shared
+Django cache for TOKEN_CACHE_TTL seconds, so every worker reads the same
+entries and an eviction applies to all of them at once. Tokens are only
+cached with TOKEN_CACHE_SHARED (the default when REDIS_URL is set): a copy
+kept per process would outlive a logout or a deactivation in the other
+workers. Users are stored pickled, so a request can't alter the cached copy.
+
+Deleting a token (logout, password change) evicts it. Saving a user evicts
+their tokens and records a fingerprint of their is_active flag and password
+hash; cached copies with another fingerprint are refused, including one
+written by a request that read the user just before the save.
+"""
+import hashlib
+import pickle
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _shared_key(key):
+    # Never put raw tokens into the shared cache's key space
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def user_fingerprint(user):
+    """What a cached copy of `user` must still match to be accepted"""
+    return hashlib.sha256(f'{user.is_active}:{user.password}'.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Token key -> pickled user in the shared cache, with expiry. Settings
+    are read on every use unless given here.
+    """
+
+    def __init__(self, ttl=None, enabled=None):
+        self._ttl = ttl
+        self._enabled = enabled
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, 'TOKEN_CACHE_TTL', 30)
+
+    @property
+    def enabled(self):
+        return self._enabled if self._enabled is not None else getattr(settings, 'TOKEN_CACHE_SHARED', False)
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        entry = cache.get(_shared_key(key))
+        if entry is None:
+            return None
+        user_id, fingerprint, data = entry
+        current = cache.get(_user_key(user_id))
+        if current is not None and current != fingerprint:
+            # Deactivated or given a new password since it was cached
+            cache.delete(_shared_key(key))
+            return None
+        return pickle.loads(data)
+
+    def set(self, key, user):
+        if self.enabled:
+            cache.set(_shared_key(key), (user.pk, user_fingerprint(user), pickle.dumps(user)), self.ttl)
+
+    def delete(self, *keys):
+        if self.enabled and keys:
+            cache.delete_many([_shared_key(key) for key in keys])
+
+    def user_changed(self, user):
+        """Evict every cached token of a saved user and refuse stale copies of them"""
+        if not self.enabled:
+            return
+        # Outlives any entry cached from a read made before the save
+        cache.set(_user_key(user.pk), user_fingerprint(user), self.ttl * 2)
+        keys = Token.objects.filter(user_id=user.pk).values_list('key', flat=True)
+        self.delete(*keys)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token query for recently seen tokens"""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        # The token was loaded together with the user and pickled with it
+        return user, user.auth_token
@@ -0,0 +1,78 @@
+"""
+Password hashers whose cost comes from settings.
+
+They keep the algorithm names of Django's hashers, so existing hashes stay
+valid: when the preferred hasher (PASSWORD_HASHER) or its cost changes,
+a user's hash is upgraded by check_password() on their next successful
+login. Costs are read on every use, so they can be changed per
+environment without touching the hashes already stored.
+"""
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PBKDF2_ITERATIONS iterations"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', None) or hashers.PBKDF2PasswordHasher.iterations
+
+
+def scrypt_maxmem(n, r, p):
+    """
+    The memory scrypt needs for these costs, as OpenSSL counts it;
+    hashlib.scrypt() refuses to use more than 32 MiB unless told otherwise
+    """
+    return max(128 * r * (n + p + 2), 32 * 1024 * 1024)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """scrypt with SCRYPT_WORK_FACTOR (N), SCRYPT_BLOCK_SIZE (r) and SCRYPT_PARALLELISM (p)"""
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'SCRYPT_WORK_FACTOR', None) or hashers.ScryptPasswordHasher.work_factor
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'SCRYPT_BLOCK_SIZE', None) or hashers.ScryptPasswordHasher.block_size
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'SCRYPT_PARALLELISM', None) or hashers.ScryptPasswordHasher.parallelism
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        # As Django's, but with room for the cost being hashed with: verify()
+        # passes the n, r and p of the stored hash, not those of the settings
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=scrypt_maxmem(n, r, p), dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and
+    ARGON2_PARALLELISM; needs the argon2-cffi package
+    """
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', None) or hashers.Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', None) or hashers.Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', None) or hashers.Argon2PasswordHasher.parallelism
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        'Time password verification with each hasher profile at the configured '
+        'costs and report p50/p99 latencies and logins per second per core'
+    )
+
+    def add_arguments(self, parser):
+        profiles = list(settings.PASSWORD_HASHER_PROFILES)
+        parser.add_argument(
+            'profiles', nargs='*', default=profiles,
+            help=f"Profiles to benchmark (default: all of {', '.join(profiles)})",
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed verifications per profile')
+
+    def handle(self, *args, **options):
+        unknown = set(options['profiles']) - set(settings.PASSWORD_HASHER_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(f'Preferred profile: {settings.PASSWORD_HASHER}')
+        password = 'correct horse battery staple'
+        for profile in options['profiles']:
+            hasher = import_string(settings.PASSWORD_HASHER_PROFILES[profile])()
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as exc:
+                # e.g. a hasher whose library is missing
+                self.stdout.write(self.style.WARNING(f'\n{profile}: skipped ({exc})'))
+                continue
+
+            # One untimed run so the timings don't include warming up
+            hasher.verify(password, encoded)
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                hasher.verify(password, encoded)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            percentiles = statistics.quantiles(timings, n=100)
+            self.stdout.write(self.style.MIGRATE_LABEL(f'\n{profile}'))
+            parameters = ', '.join(
+                f'{name} {value}' for name, value in hasher.safe_summary(encoded).items()
+                if str(name) not in ('algorithm', 'salt', 'hash')
+            )
+            self.stdout.write(f'parameters: {parameters}')
+            self.stdout.write(
+                f'p50 {percentiles[49]:.1f} ms, p99 {percentiles[98]:.1f} ms, '
+                f'{1000 / statistics.mean(timings):.1f} logins/s per core'
+            )
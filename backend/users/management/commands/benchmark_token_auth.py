@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import is_test_database
+from users.authentication import token_cache
+
+BENCH_USERNAME = 'bench-token-auth'
+
+ENDPOINTS = ['user-detail', 'dashboard', 'time-entry-list', 'time-off-list']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare queries and p50/p99 latencies of hot GET endpoints with a cold '
+        'token cache (one token lookup per request) and a warm one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Timed requests per endpoint and mode')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark user afterwards')
+        parser.add_argument(
+            '--i-know-this-is-a-scratch-db', action='store_true', dest='scratch_db',
+            help='Run against a database that is not a test database; a benchmark user is created in it',
+        )
+
+    def handle(self, *args, **options):
+        if not options['scratch_db'] and not is_test_database(connection):
+            raise CommandError(
+                f"{connection.settings_dict['NAME']!r} doesn't look like a test database. The benchmark "
+                'writes to it; pass --i-know-this-is-a-scratch-db to run anyway.'
+            )
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2 to compute percentiles.')
+        UserModel = get_user_model()
+        UserModel.objects.filter(username=BENCH_USERNAME).delete()
+        user = UserModel.objects.create_user(
+            username=BENCH_USERNAME, email=f'{BENCH_USERNAME}@benchmark.invalid', password=None,
+        )
+        key = Token.objects.get(user=user).key
+        if not token_cache.enabled:
+            self.stdout.write(self.style.WARNING(
+                'Tokens are only cached with TOKEN_CACHE_SHARED; both modes run uncached.'
+            ))
+        factory = APIRequestFactory()
+        try:
+            for name in ENDPOINTS:
+                path = reverse(name)
+                view = resolve(path).func
+                self.stdout.write(self.style.MIGRATE_LABEL(f'\n{path}'))
+                for label, cold in (('uncached token', True), ('cached token', False)):
+                    token_cache.delete(key)
+                    timings = []
+                    queries = []
+                    for _ in range(options['iterations']):
+                        if cold:
+                            token_cache.delete(key)
+                        request = factory.get(path, HTTP_AUTHORIZATION=f'Token {key}')
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            view(request).render()
+                            timings.append((time.perf_counter() - started) * 1000)
+                        queries.append(len(captured))
+
+                    percentiles = statistics.quantiles(timings, n=100)
+                    self.stdout.write(
+                        f'{label}: {statistics.median(queries):.0f} queries, '
+                        f'p50 {percentiles[49]:.3f} ms, p99 {percentiles[98]:.3f} ms'
+                    )
+        finally:
+            token_cache.delete(key)
+            if not options['keep']:
+                UserModel.objects.filter(username=BENCH_USERNAME).delete()
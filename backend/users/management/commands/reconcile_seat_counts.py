@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from users.models import CustomUser, Organization
+
+HOLDS_SEAT = Q(is_active=True) | Q(is_invited=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the seats (members and pending invitations) of every organization and '
+        'fix the stored counters that drifted, e.g. after bulk updates that bypass save()'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted counters without fixing them')
+
+    def handle(self, *args, **options):
+        counts = dict(
+            CustomUser.objects.filter(HOLDS_SEAT, organization__isnull=False).order_by()
+            .values('organization_id').annotate(seats=Count('pk')).values_list('organization_id', 'seats')
+        )
+        drifted = 0
+        for organization in Organization.objects.only('pk', 'name', 'seat_count').iterator():
+            if organization.seat_count == counts.get(organization.pk, 0):
+                continue
+            drifted += 1
+            if options['dry_run']:
+                self.stdout.write(
+                    f'{organization.name}: stored {organization.seat_count}, '
+                    f'counted {counts.get(organization.pk, 0)}'
+                )
+                continue
+
+            # Recount under the row lock that seat reservations also take,
+            # so users created meanwhile are either counted or added after
+            with transaction.atomic():
+                locked = Organization.objects.select_for_update().only('pk', 'seat_count').get(pk=organization.pk)
+                seats = CustomUser.objects.filter(HOLDS_SEAT, organization_id=organization.pk).count()
+                Organization.objects.filter(pk=organization.pk).update(seat_count=seats)
+            self.stdout.write(f'{organization.name}: {locked.seat_count} -> {seats}')
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted} organization(s) with a drifted seat count.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed the seat count of {drifted} organization(s).'))
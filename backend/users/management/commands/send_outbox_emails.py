@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import MAX_ATTEMPTS, deliver_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued emails in batches over a single mail connection per batch, '
+        'retrying failures with exponential backoff'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per connection')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='Attempts before giving up')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running as a worker, polling for new emails once the outbox is drained',
+        )
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        # Drain everything that is due, then either stop or wait for more
+        while True:
+            sent, failed = deliver_outbox(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} email(s), {failed} failed.')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0006_customuser_manager'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='email_lower',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('email'), output_field=models.CharField(max_length=254)),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='username_lower',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('username'), output_field=models.CharField(max_length=150)),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email_lower'], name='customuser_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['username_lower'], name='customuser_username_lower_idx'),
+        ),
+    ]
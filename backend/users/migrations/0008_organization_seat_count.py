@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+def count_seats(apps, schema_editor):
+    """Members and pending invitations hold a seat"""
+    Organization = apps.get_model('users', 'Organization')
+    seats = Organization.objects.annotate(
+        seats=models.Count('users', filter=models.Q(users__is_active=True) | models.Q(users__is_invited=True))
+    ).values_list('pk', 'seats')
+    for pk, count in seats:
+        Organization.objects.filter(pk=pk).update(seat_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_customuser_lower_lookups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='seat_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_seats, migrations.RunPython.noop),
+    ]
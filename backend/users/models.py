@@ -1,7 +1,40 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db import models, transaction
+from django.db.models import F
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 import uuid
+from collections import Counter
+
+# The fields of a user that decide whether they hold a seat
+SEAT_FIELDS = ('organization_id', 'is_active', 'is_invited')
+UNKNOWN_SEAT = object()
+
+class OrganizationFull(ValidationError):
+    """
+    Raised when a user would take an organization past its max_users. A
+    ValidationError, so that forms and callers validating input report it
+    as invalid input rather than failing.
+    """
+
+class OrganizationManager(models.Manager):
+    def reserve_seats(self, organization_id, count=1):
+        """
+        Take `count` seats with a single conditional UPDATE, so concurrent
+        requests can't overshoot max_users together. Returns False, taking
+        nothing, when there aren't enough free seats.
+        """
+        return bool(
+            self.alias(seats_after=F('seat_count') + count)
+            .filter(pk=organization_id, seats_after__lte=F('max_users'))
+            .update(seat_count=F('seat_count') + count)
+        )
+    
+    def release_seats(self, organization_id, count=1):
+        self.filter(pk=organization_id, seat_count__gte=count).update(seat_count=F('seat_count') - count)
 
 class Organization(models.Model):
     """
@@ -14,7 +47,12 @@ class Organization(models.Model):
     
     # Organization settings
     is_active = models.BooleanField(default=True)
-    max_users = models.PositiveIntegerField(default=50)  # Team size limit
+    max_users = models.PositiveIntegerField(default=50)  # Seat limit, see seat_count
+    
+    # Users holding a seat (active members and pending invitations), kept
+    # up to date by CustomUser.save() and the user delete signal; see
+    # reconcile_seat_counts. Deactivated users don't take a seat.
+    seat_count = models.PositiveIntegerField(default=0)
     
     # Contact information
     address = models.TextField(blank=True)
@@ -24,17 +62,74 @@ class Organization(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrganizationManager()
+    
     def __str__(self):
         return self.name
     
     @property
     def user_count(self):
-        """Get current number of users in the organization"""
-        return self.users.count()
+        """Get current number of users in the organization, read from the seat counter"""
+        return self.seat_count
     
-    def can_add_users(self):
+    def can_add_users(self, count=1):
         """Check if organization can add more users"""
-        return self.user_count < self.max_users
+        return self.seat_count + count <= self.max_users
+    
+    def reserve_seats(self, count=1):
+        """Take `count` seats, see OrganizationManager.reserve_seats()"""
+        reserved = Organization.objects.reserve_seats(self.pk, count)
+        if reserved:
+            self.seat_count += count
+        return reserved
+    
+    def release_seats(self, count=1):
+        Organization.objects.release_seats(self.pk, count)
+        self.seat_count = max(self.seat_count - count, 0)
+
+class CustomUserManager(UserManager):
+    def bulk_create_with_related(self, users, batch_size=None):
+        """
+        Insert many users together with their profiles and auth tokens, one
+        bulk INSERT per table instead of the per-user post_save signals
+        (which bulk_create() doesn't send). Users without a password get an
+        unusable one. Raises OrganizationFull, inserting nothing, when the
+        users don't fit into their organizations.
+        """
+        from rest_framework.authtoken.models import Token
+        
+        unusable_password = None
+        for user in users:
+            if not user.password:
+                unusable_password = unusable_password or make_password(None)
+                user.password = unusable_password
+        
+        seats = Counter(user.seat_organization_id for user in users if user.seat_organization_id)
+        with transaction.atomic():
+            for organization_id, count in seats.items():
+                if not Organization.objects.reserve_seats(organization_id, count):
+                    raise OrganizationFull(f'Organization {organization_id} has no room for {count} more user(s).')
+            
+            users = self.bulk_create(users, batch_size=batch_size)
+            if users and users[0].pk is None:
+                # Backends that don't return ids from bulk inserts (MySQL)
+                ids = dict(self.filter(email__in=[user.email for user in users]).values_list('email', 'pk'))
+                for user in users:
+                    user.pk = ids[user.email]
+            
+            # Creating them through the forward relation also caches user.profile
+            # and user.auth_token, so reading them afterwards costs no query
+            profiles = UserProfile.objects.bulk_create(
+                [UserProfile(user=user) for user in users], batch_size=batch_size
+            )
+            Token.objects.bulk_create(
+                [Token(user=user, key=Token.generate_key()) for user in users], batch_size=batch_size
+            )
+        for profile in profiles:
+            profile.snapshot()
+        for user in users:
+            user._seat_of = user.seat_organization_id
+        return users
 
 class CustomUser(AbstractUser):
     """
@@ -77,13 +172,103 @@ class CustomUser(AbstractUser):
     )
     invited_at = models.DateTimeField(null=True, blank=True)
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Lowercased copies of the login identifiers, indexed so logins can
+    # match either one case-insensitively without a function on the column
+    email_lower = models.GeneratedField(
+        expression=Lower('email'),
+        output_field=models.CharField(max_length=254),
+        db_persist=True,
+    )
+    username_lower = models.GeneratedField(
+        expression=Lower('username'),
+        output_field=models.CharField(max_length=150),
+        db_persist=True,
+    )
+    
+    objects = CustomUserManager()
+    
     # Add any other fields you might need
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['email_lower'], name='customuser_email_lower_idx'),
+            models.Index(fields=['username_lower'], name='customuser_username_lower_idx'),
+            # Team roster pages: one organization's members or invitations by name
+            models.Index(fields=['organization', 'is_active', 'first_name'], name='customuser_org_roster_idx'),
+        ]
+    
     def __str__(self):
         return self.email
+    
+    # The organization whose seat the user held as last read from or
+    # written to the database (None for no seat), or UNKNOWN_SEAT when the
+    # user wasn't loaded with the fields that decide it
+    _seat_of = UNKNOWN_SEAT
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in field_names for name in SEAT_FIELDS):
+            instance._seat_of = instance.seat_organization_id
+        return instance
+    
+    @property
+    def seat_organization_id(self):
+        """The organization whose seat the user takes: members and pending invitations hold one"""
+        if self.is_active or self.is_invited:
+            return self.organization_id
+        return None
+    
+    def stored_seat_organization_id(self):
+        if self._state.adding:
+            return None
+        if self._seat_of is UNKNOWN_SEAT:
+            stored = CustomUser.objects.filter(pk=self.pk).values_list(*SEAT_FIELDS).first()
+            if stored is None:
+                return None
+            organization_id, is_active, is_invited = stored
+            self._seat_of = organization_id if is_active or is_invited else None
+        return self._seat_of
+    
+    def clean(self):
+        super().clean()
+        seat = self.seat_organization_id
+        if seat and seat != self.stored_seat_organization_id() and not self.organization.can_add_users():
+            raise ValidationError(_('The organization has reached its maximum number of users.'))
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) & {'organization', *SEAT_FIELDS}:
+            # e.g. last_login: the seat can't have moved
+            return super().save(*args, **kwargs)
+        
+        previous = self.stored_seat_organization_id()
+        current = self.seat_organization_id
+        if previous == current:
+            super().save(*args, **kwargs)
+            self._seat_of = current
+            return
+        with transaction.atomic():
+            if current:
+                if not self.seat_organization().reserve_seats():
+                    raise OrganizationFull(f'{self.organization} has reached its maximum number of users.')
+            super().save(*args, **kwargs)
+            if previous:
+                Organization.objects.release_seats(previous)
+        self._seat_of = current
+    
+    def seat_organization(self):
+        # The cached organization when there is one, so that its counter
+        # stays current for whoever renders it next
+        organization = self._state.fields_cache.get('organization')
+        if organization is None or organization.pk != self.organization_id:
+            organization = Organization(pk=self.organization_id)
+        return organization
 
 class UserProfile(models.Model):
     """
@@ -95,5 +280,81 @@ class UserProfile(models.Model):
     date_of_birth = models.DateField(blank=True, null=True)
     hire_date = models.DateField(blank=True, null=True)
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Values of the editable fields as last read from or written to the
+    # database, so saving the user only writes the profile when it changed
+    _loaded_values = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.snapshot()
+    
+    def snapshot(self):
+        """Record the current values as the stored ones"""
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+    
+    def has_changes(self):
+        if self._state.adding or self._loaded_values is None:
+            return True
+        return any(
+            getattr(self, field.attname) != self._loaded_values.get(field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self._loaded_values and field.name != 'updated_at'
+        )
+    
     def __str__(self):
         return f"{self.user.email}'s profile"
+
+class OutgoingEmail(models.Model):
+    """
+    Outbox of emails to be delivered by the send_outbox_emails worker, so
+    requests never wait on the mail server
+    """
+    KIND_CHOICES = (
+        ('invitation', 'Invitation'),
+    )
+    
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    to = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outgoing_emails'
+    )
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When the worker may (re)try the email; also pushed forward while a
+    # worker holds it, so a crashed worker's emails are picked up again
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Worker polling: filter(status='pending', next_attempt_at__lte=now)
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoingemail_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} to {self.to} ({self.status})"
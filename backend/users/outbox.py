@@ -0,0 +1,131 @@
+"""
+Queued email delivery.
+
+Requests only insert OutgoingEmail rows, in the same transaction as the
+change they announce. The send_outbox_emails worker claims due rows in
+batches, sends each batch over a single reused mail connection, and
+reschedules failures with exponential backoff until they run out of
+attempts.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+# How long a claimed batch is reserved for the worker that claimed it
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def invitation_url(user):
+    return f"{settings.FRONTEND_URL}/accept-invitation?token={user.invitation_token}"
+
+
+def invitation_email(invited_user, inviter):
+    """An unsaved OutgoingEmail inviting `invited_user` to the inviter's organization"""
+    organization = inviter.organization
+    return OutgoingEmail(
+        kind='invitation',
+        to=invited_user.email,
+        from_email=settings.DEFAULT_FROM_EMAIL or '',
+        user=invited_user,
+        subject=f"You're invited to join {organization.name}",
+        body=f"""
+Hi {invited_user.first_name},
+
+You've been invited by {inviter.get_full_name()} to join {organization.name} as a {invited_user.role}.
+
+To accept this invitation and create your account, please click the link below:
+{invitation_url(invited_user)}
+
+This invitation will expire in 7 days.
+
+Welcome to the team!
+
+Best regards,
+The {organization.name} Team
+                """,
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: 1, 2, 4, ... minutes up to an hour, with jitter"""
+    delay = min(60 * 2 ** (attempts - 1), 3600)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(size):
+    """
+    Reserve up to `size` due emails for this worker. Concurrent workers
+    skip each other's locked rows instead of waiting on them.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:size]
+        )
+        if batch:
+            OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=now + CLAIM_TIMEOUT
+            )
+    return batch
+
+
+def deliver_outbox(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Send one batch of due emails over one connection.
+    Returns the number of (sent, failed) emails.
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        # The mail server is unreachable: every email in the batch failed
+        errors = {email.pk: exc for email in batch}
+    else:
+        errors = {}
+        try:
+            for email in batch:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or None,
+                    to=[email.to],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as exc:
+                    errors[email.pk] = exc
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    for email in batch:
+        email.attempts += 1
+        if email.pk in errors:
+            email.last_error = f'{type(errors[email.pk]).__name__}: {errors[email.pk]}'
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+            else:
+                email.next_attempt_at = now + backoff(email.attempts)
+        else:
+            email.status = 'sent'
+            email.sent_at = now
+            email.last_error = ''
+    OutgoingEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return len(batch) - len(errors), len(errors)
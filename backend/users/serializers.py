@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db.models import Q
 from django.utils.text import slugify
 from django.utils import timezone
 import uuid
-from .models import CustomUser, UserProfile, Organization
+from .models import CustomUser, UserProfile, Organization, OrganizationFull, OutgoingEmail
+from .outbox import invitation_email
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,6 +32,24 @@ class UserSerializer(serializers.ModelSerializer):
                   'organization', 'role']
         read_only_fields = ['id']
 
+class TeamMemberSerializer(serializers.ModelSerializer):
+    """
+    A member or pending invitation of the requesting user's organization;
+    the organization itself is rendered once next to the page
+    """
+    profile = UserProfileSerializer(read_only=True)
+    invited_by = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'email', 'username', 'first_name', 'last_name',
+                  'job_title', 'department', 'phone_number', 'profile', 'role',
+                  'is_active', 'is_invited', 'invited_at', 'invited_by']
+        read_only_fields = fields
+    
+    def get_invited_by(self, user):
+        return user.invited_by.get_full_name() if user.invited_by else None
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
     password2 = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -133,27 +153,26 @@ class TeamMemberInviteSerializer(serializers.Serializer):
         organization = self.context['organization']
         inviter = self.context['inviter']
         
-        # Check if organization can add more users
-        if not organization.can_add_users():
-            raise serializers.ValidationError("Organization has reached maximum user limit.")
-        
-        # Create invited user
+        # Create invited user, taking a seat in the organization
         invitation_token = uuid.uuid4()
-        user = CustomUser.objects.create_user(
-            username=validated_data['email'],  # Use email as username initially
-            email=validated_data['email'],
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            job_title=validated_data.get('job_title', ''),
-            department=validated_data.get('department', ''),
-            organization=organization,
-            role=validated_data['role'],
-            is_invited=True,
-            is_active=False,  # User is inactive until they accept invitation
-            invitation_token=invitation_token,
-            invited_by=inviter,
-            invited_at=timezone.now()
-        )
+        try:
+            user = CustomUser.objects.create_user(
+                username=validated_data['email'],  # Use email as username initially
+                email=validated_data['email'],
+                first_name=validated_data['first_name'],
+                last_name=validated_data['last_name'],
+                job_title=validated_data.get('job_title', ''),
+                department=validated_data.get('department', ''),
+                organization=organization,
+                role=validated_data['role'],
+                is_invited=True,
+                is_active=False,  # User is inactive until they accept invitation
+                invitation_token=invitation_token,
+                invited_by=inviter,
+                invited_at=timezone.now()
+            )
+        except OrganizationFull:
+            raise serializers.ValidationError("Organization has reached maximum user limit.")
         
         # Set a temporary password - user will set their own when accepting invitation
         user.set_unusable_password()
@@ -161,6 +180,81 @@ class TeamMemberInviteSerializer(serializers.Serializer):
         
         return user
 
+class BulkInviteEntrySerializer(TeamMemberInviteSerializer):
+    """One invitation of a bulk invite; existing emails are checked for the whole batch at once"""
+    
+    def validate_email(self, value):
+        return value
+
+class BulkTeamMemberInviteSerializer(serializers.Serializer):
+    """
+    Serializer for inviting many team members at once. The batch is
+    validated with one query for existing users and one seat check, and
+    users, profiles, tokens and invitation emails are each inserted in bulk.
+    """
+    invitations = BulkInviteEntrySerializer(many=True, allow_empty=False, max_length=1000)
+    
+    def validate_invitations(self, invitations):
+        emails = [invitation['email'] for invitation in invitations]
+        candidates = {email.lower() for email in emails}
+        # Invited users get their email as username, so both have to be free
+        taken = set()
+        for email, username in CustomUser.objects.filter(
+            Q(email_lower__in=candidates) | Q(username_lower__in=candidates)
+        ).values_list('email_lower', 'username_lower'):
+            taken.update((email, username))
+        
+        errors = []
+        seen = set()
+        for email in emails:
+            if email.lower() in taken:
+                errors.append({'email': ["A user with this email already exists."]})
+            elif email.lower() in seen:
+                errors.append({'email': ["This email appears more than once in the batch."]})
+            else:
+                errors.append({})
+            seen.add(email.lower())
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return invitations
+    
+    def create(self, validated_data):
+        organization = self.context['organization']
+        inviter = self.context['inviter']
+        invitations = validated_data['invitations']
+        
+        # The batch takes its seats with one conditional UPDATE, so
+        # concurrent invites can't overshoot the limit together
+        now = timezone.now()
+        try:
+            users = CustomUser.objects.bulk_create_with_related([
+                CustomUser(
+                    username=invitation['email'],  # Use email as username initially
+                    email=invitation['email'],
+                    first_name=invitation['first_name'],
+                    last_name=invitation['last_name'],
+                    job_title=invitation.get('job_title', ''),
+                    department=invitation.get('department', ''),
+                    organization=organization,
+                    role=invitation['role'],
+                    is_invited=True,
+                    is_active=False,  # Users are inactive until they accept the invitation
+                    invitation_token=uuid.uuid4(),
+                    invited_by=inviter,
+                    invited_at=now,
+                )
+                for invitation in invitations
+            ])
+        except OrganizationFull:
+            organization.refresh_from_db(fields=['seat_count', 'max_users'])
+            raise serializers.ValidationError(
+                f"Organization has room for {max(organization.max_users - organization.seat_count, 0)} "
+                f"more user(s), but {len(invitations)} were invited."
+            )
+        OutgoingEmail.objects.bulk_create([invitation_email(user, inviter) for user in users])
+        
+        return users
+
 class AcceptInvitationSerializer(serializers.Serializer):
     """
     Serializer for accepting team member invitations
@@ -252,7 +346,8 @@ class UpdateUserSerializer(serializers.ModelSerializer):
         instance.job_title = validated_data.get('job_title', instance.job_title)
         instance.department = validated_data.get('department', instance.department)
         instance.phone_number = validated_data.get('phone_number', instance.phone_number)
-        instance.save()
+        # Only the fields edited here, never a possibly outdated is_active or password
+        instance.save(update_fields=['first_name', 'last_name', 'job_title', 'department', 'phone_number'])
         
         profile.bio = profile_data.get('bio', profile.bio)
         profile.date_of_birth = profile_data.get('date_of_birth', profile.date_of_birth)
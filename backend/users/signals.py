@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 from rest_framework.authtoken.models import Token
-from .models import CustomUser, UserProfile
+from .authentication import token_cache
+from .models import UNKNOWN_SEAT, CustomUser, Organization, UserProfile
 
 @receiver(post_save, sender=CustomUser)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -12,11 +13,34 @@ def create_user_profile(sender, instance, created, **kwargs):
         
 @receiver(post_save, sender=CustomUser)
 def save_user_profile(sender, instance, **kwargs):
-    """Save the user profile when the user is saved"""
-    instance.profile.save()
+    """Save the user profile along with the user, if it was loaded and changed"""
+    # Never load the profile just to save it back unchanged, e.g. when
+    # only last_login or the password hash moved
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None and profile.has_changes():
+        profile.save()
 
 @receiver(post_save, sender=CustomUser)
 def create_auth_token(sender, instance, created, **kwargs):
     """Create an auth token for the user when they are created"""
     if created:
         Token.objects.create(user=instance)
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token from the cache once it is deleted (logout, password change)"""
+    token_cache.delete(instance.key)
+
+@receiver(post_save, sender=CustomUser)
+def forget_cached_user(sender, instance, created, update_fields=None, **kwargs):
+    """Drop the user's cached token so the next request sees the saved user, e.g. deactivated"""
+    if created or update_fields == frozenset(['last_login']):
+        return
+    token_cache.user_changed(instance)
+
+@receiver(post_delete, sender=CustomUser)
+def release_seat(sender, instance, **kwargs):
+    """Give a deleted member's or invitation's seat back to the organization"""
+    seat = instance._seat_of if instance._seat_of is not UNKNOWN_SEAT else instance.seat_organization_id
+    if seat:
+        Organization.objects.release_seats(seat)
@@ -1,3 +1,657 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache as default_cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import TokenCache, token_cache
+from .hashers import ScryptPasswordHasher
+from .models import CustomUser, Organization, OrganizationFull, OutgoingEmail, UserProfile
+from .outbox import deliver_outbox
+
+
+class UserDetailConditionalGetTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme')
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password',
+            organization=self.organization,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('user-detail')
+
+    def test_unchanged_user_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_profile_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.user.profile.bio = 'Hello'
+        self.user.profile.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_organization_member_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        CustomUser.objects.create_user(
+            username='colleague', email='colleague@example.com', password='password',
+            organization=self.organization,
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class InvitationOutboxTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme')
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='password',
+            organization=self.organization, role='admin',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def invite(self, email):
+        return self.client.post(reverse('invite-team-member'), {
+            'email': email, 'first_name': 'New', 'last_name': 'Member',
+        })
+
+    def test_invite_queues_the_email_instead_of_sending_it(self):
+        response = self.invite('new@example.com')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual((queued.to, queued.kind, queued.status), ('new@example.com', 'invitation', 'pending'))
+        self.assertIn(str(CustomUser.objects.get(email='new@example.com').invitation_token), queued.body)
+
+    def test_worker_sends_a_batch_over_one_connection(self):
+        for index in range(3):
+            self.invite(f'new{index}@example.com')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_connection:
+            self.assertEqual(deliver_outbox(), (3, 0))
+        open_connection.assert_called_once()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            'new0@example.com', 'new1@example.com', 'new2@example.com',
+        ])
+        self.assertFalse(OutgoingEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(deliver_outbox(), (0, 0))
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        self.invite('new@example.com')
+        failing = mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=ConnectionRefusedError('SMTP down'),
+        )
+        with failing:
+            self.assertEqual(deliver_outbox(max_attempts=2), (0, 1))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=30))
+        self.assertIn('SMTP down', email.last_error)
+
+        # Not due yet
+        self.assertEqual(deliver_outbox(max_attempts=2), (0, 0))
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        with failing:
+            deliver_outbox(max_attempts=2)
+        self.assertEqual(OutgoingEmail.objects.get().status, 'failed')
+
+
+class BulkInviteTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme', max_users=10)
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='password',
+            organization=self.organization, role='admin',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('bulk-invite-team-members')
+
+    def invitations(self, count, prefix='member'):
+        return [
+            {'email': f'{prefix}{index}@example.com', 'first_name': 'New', 'last_name': f'Member {index}'}
+            for index in range(count)
+        ]
+
+    def test_invites_users_with_profiles_tokens_and_queued_emails(self):
+        response = self.client.post(self.url, {'invitations': self.invitations(3)}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        invited = CustomUser.objects.filter(is_invited=True)
+        self.assertEqual(invited.count(), 3)
+        self.assertFalse(any(user.is_active or user.has_usable_password() for user in invited))
+        self.assertEqual(UserProfile.objects.filter(user__in=invited).count(), 3)
+        self.assertEqual(Token.objects.filter(user__in=invited).count(), 3)
+        self.assertEqual(OutgoingEmail.objects.filter(kind='invitation').count(), 3)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def count_queries(invitations):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {'invitations': invitations}, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+
+        self.assertEqual(count_queries(self.invitations(2, 'small')), count_queries(self.invitations(6, 'large')))
+
+    def test_existing_and_repeated_emails_are_rejected(self):
+        invitations = self.invitations(2) + [
+            {'email': 'ADMIN@example.com', 'first_name': 'Dup', 'last_name': 'Licate'},
+            {'email': 'member0@example.com', 'first_name': 'Dup', 'last_name': 'Licate'},
+        ]
+        response = self.client.post(self.url, {'invitations': invitations}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['invitations']
+        self.assertEqual([bool(error) for error in errors], [False, False, True, True])
+        self.assertFalse(CustomUser.objects.filter(is_invited=True).exists())
+
+    def test_batch_exceeding_the_seat_limit_is_rejected_whole(self):
+        response = self.client.post(self.url, {'invitations': self.invitations(10)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.organization.users.count(), 1)
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_employees_cannot_bulk_invite(self):
+        self.admin.role = 'employee'
+        self.admin.save()
+        response = self.client.post(self.url, {'invitations': self.invitations(1)}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class UserWriteQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_registration_query_count(self):
+        # Two uniqueness checks, then the user, profile and token INSERTs
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('register'), {
+                'email': 'new@example.com', 'username': 'new', 'first_name': 'New', 'last_name': 'User',
+                'password': 'Secret-pass-123', 'password2': 'Secret-pass-123',
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['token'], Token.objects.get(user__email='new@example.com').key)
+
+    def test_login_query_count(self):
+        organization = Organization.objects.create(name='Acme', slug='acme')
+        CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password', organization=organization,
+        )
+        # The user with profile, organization and token; the member count
+        # is the organization's seat counter
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('login'), {'email': 'worker@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['organization']['user_count'], 1)
+
+    def test_saving_a_user_does_not_rewrite_an_unchanged_profile(self):
+        user = CustomUser.objects.create_user(username='worker', email='worker@example.com', password='password')
+        user = CustomUser.objects.select_related('profile').get(pk=user.pk)
+        user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            user.save()
+
+        user.profile.bio = 'Hello'
+        user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).bio, 'Hello')
+
+    def test_users_created_in_bulk_get_profiles_and_tokens(self):
+        users = CustomUser.objects.bulk_create_with_related([
+            CustomUser(username=f'bulk{index}', email=f'bulk{index}@example.com') for index in range(3)
+        ])
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+        self.assertEqual(Token.objects.filter(user__in=users).count(), 3)
+        self.assertFalse(users[0].has_usable_password())
+        with self.assertNumQueries(0):
+            users[0].profile, users[0].auth_token
+
+
+@override_settings(
+    TOKEN_CACHE_SHARED=True, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        default_cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password',
+        )
+        self.token = Token.objects.get(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cached_token_saves_a_query_per_request(self):
+        first = self.count_queries(reverse('user-detail'))
+        self.assertEqual(self.count_queries(reverse('user-detail')), first - 1)
+
+    @override_settings(TOKEN_CACHE_SHARED=False)
+    def test_tokens_are_not_cached_without_a_shared_cache(self):
+        first = self.count_queries(reverse('user-detail'))
+        self.assertEqual(self.count_queries(reverse('user-detail')), first)
+
+    def test_logout_revokes_the_cached_token(self):
+        self.client.get(reverse('user-detail'))
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, 401)
+
+    def test_password_change_revokes_the_cached_token(self):
+        self.client.get(reverse('user-detail'))
+        response = self.client.post(reverse('change-password'), {
+            'old_password': 'password', 'new_password': 'Secret-pass-123', 'confirm_password': 'Secret-pass-123',
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, 200)
+
+    def test_deactivation_revokes_the_cached_token(self):
+        self.client.get(reverse('user-detail'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, 401)
+
+    def test_copies_cached_from_before_a_save_are_refused(self):
+        # A request read the user, then the user was deactivated before it cached them
+        stale = CustomUser.objects.get(pk=self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        token_cache.set(self.token.key, stale)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, 401)
+
+    def test_writes_through_a_stale_user_keep_the_saved_state(self):
+        organization = Organization.objects.create(name='Acme', slug='acme')
+        member = CustomUser.objects.create_user(
+            username='member', email='member@example.com', password='password', organization=organization,
+        )
+        stale = CustomUser.objects.get(pk=member.pk)
+        member.is_active = False
+        member.save()
+
+        self.client.force_authenticate(stale)
+        response = self.client.put(reverse('update-profile'), {'first_name': 'New'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        member.refresh_from_db()
+        organization.refresh_from_db()
+        self.assertEqual(member.first_name, 'New')
+        self.assertFalse(member.is_active)
+        self.assertEqual(organization.seat_count, 0)
+
+    def test_entries_expire(self):
+        expiring = TokenCache(ttl=0, enabled=True)
+        expiring.set('a', self.user)
+        self.assertIsNone(expiring.get('a'))
+
+    def test_every_process_reads_the_same_entries(self):
+        writer = TokenCache(ttl=60, enabled=True)
+        reader = TokenCache(ttl=60, enabled=True)
+        writer.set(self.token.key, self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(reader.get(self.token.key).pk, self.user.pk)
+        # Logged out through another process
+        writer.delete(self.token.key)
+        self.assertIsNone(reader.get(self.token.key))
+
+        writer.set(self.token.key, self.user)
+        writer.user_changed(self.user)
+        self.assertIsNone(reader.get(self.token.key))
+
+    def test_benchmark_refuses_databases_that_are_not_test_databases(self):
+        def benchmark(*args):
+            call_command('benchmark_token_auth', '--iterations', '2', *args, stdout=StringIO())
+
+        with mock.patch('users.management.commands.benchmark_token_auth.is_test_database', return_value=False):
+            with self.assertRaisesMessage(CommandError, '--i-know-this-is-a-scratch-db'):
+                benchmark()
+            benchmark('--i-know-this-is-a-scratch-db')
+        self.assertFalse(CustomUser.objects.filter(username='bench-token-auth').exists())
+
+
+class EmailOrUsernameBackendTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            username='Worker', email='Worker@Example.com', password='password',
+        )
+
+    def login(self, identifier, password='password'):
+        return self.client.post(reverse('login'), {'email': identifier, 'password': password})
+
+    def test_login_with_either_identifier_in_any_case(self):
+        for identifier in ('worker@example.com', 'WORKER@EXAMPLE.COM', 'worker', 'WORKER'):
+            with self.subTest(identifier=identifier):
+                self.assertEqual(self.login(identifier).status_code, 200)
+
+    def test_email_is_preferred_over_a_username_that_looks_the_same(self):
+        other = CustomUser.objects.create_user(
+            username='worker@example.com', email='other@example.com', password='other-password',
+        )
+        self.assertEqual(self.login('worker@example.com').data['user']['id'], self.user.pk)
+        self.assertEqual(self.login('other@example.com', 'other-password').data['user']['id'], other.pk)
+
+    def test_inactive_users_cannot_log_in(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login('worker').status_code, 400)
+
+    def test_failed_login_is_looked_up_and_hashed_once(self):
+        with mock.patch.object(CustomUser, 'check_password', autospec=True, return_value=False) as check:
+            with self.assertNumQueries(1):
+                self.assertEqual(self.login('worker', 'wrong').status_code, 400)
+        check.assert_called_once()
+
+        with mock.patch.object(CustomUser, 'set_password', autospec=True) as set_password:
+            with self.assertNumQueries(1):
+                self.assertEqual(self.login('nobody@example.com').status_code, 400)
+        set_password.assert_called_once()
+
+
+@override_settings(
+    PASSWORD_HASHERS=['users.hashers.PBKDF2PasswordHasher', 'users.hashers.ScryptPasswordHasher'],
+    PBKDF2_ITERATIONS=1000,
+    SCRYPT_WORK_FACTOR=2 ** 10,
+)
+class PasswordHasherTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            username='worker', email='worker@example.com', password='password',
+        )
+
+    def login(self):
+        response = self.client.post(reverse('login'), {'email': 'worker@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        return self.user.password
+
+    def test_cost_comes_from_settings(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_login_upgrades_a_cheaper_hash(self):
+        with self.settings(PBKDF2_ITERATIONS=2000):
+            self.assertTrue(self.login().startswith('pbkdf2_sha256$2000$'))
+
+    def test_profiles_only_list_usable_hashers(self):
+        # Argon2 is only listed with argon2-cffi installed
+        for profile, path in settings.PASSWORD_HASHER_PROFILES.items():
+            hasher = import_string(path)()
+            if hasher.library:
+                with self.subTest(profile=profile):
+                    hasher._load_library()
+
+    def test_login_moves_hashes_to_the_preferred_algorithm(self):
+        with self.settings(PASSWORD_HASHERS=['users.hashers.ScryptPasswordHasher', 'users.hashers.PBKDF2PasswordHasher']):
+            upgraded = self.login()
+            self.assertTrue(upgraded.startswith('scrypt$1024$'))
+            # Up to date hashes are left alone
+            self.assertEqual(self.login(), upgraded)
+
+    def test_scrypt_verifies_hashes_costlier_than_the_settings(self):
+        hasher = ScryptPasswordHasher()
+        # Over the 32 MiB hashlib allows by default
+        encoded = hasher.encode('password', hasher.salt(), n=2 ** 15, r=9, p=1)
+        self.assertTrue(hasher.verify('password', encoded))
+        self.assertTrue(hasher.must_update(encoded))
+
+
+class SeatCountTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme', max_users=3)
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='password',
+            organization=self.organization, role='admin',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def seats(self):
+        self.organization.refresh_from_db(fields=['seat_count'])
+        return self.organization.seat_count
+
+    def invite(self, email):
+        return self.client.post(reverse('invite-team-member'), {
+            'email': email, 'first_name': 'New', 'last_name': 'Member',
+        })
+
+    def test_members_and_invitations_take_a_seat(self):
+        self.assertEqual(self.seats(), 1)
+        self.assertEqual(self.invite('new@example.com').status_code, 201)
+        self.assertEqual(self.seats(), 2)
+
+        # Accepting keeps the seat
+        invited = CustomUser.objects.get(email='new@example.com')
+        response = self.client.post(reverse('accept-invitation'), {
+            'token': invited.invitation_token, 'username': 'new', 'password': 'password', 'password2': 'password',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.seats(), 2)
+
+    def test_deactivating_moving_and_deleting_release_the_seat(self):
+        member = CustomUser.objects.create_user(
+            username='member', email='member@example.com', organization=self.organization,
+        )
+        self.assertEqual(self.seats(), 2)
+        member.is_active = False
+        member.save()
+        self.assertEqual(self.seats(), 1)
+        member.is_active = True
+        member.save()
+        self.assertEqual(self.seats(), 2)
+
+        other = Organization.objects.create(name='Other', slug='other')
+        member = CustomUser.objects.get(pk=member.pk)
+        member.organization = other
+        member.save()
+        self.assertEqual(self.seats(), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.seat_count, 1)
+
+        member.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.seat_count, 0)
+
+    def test_a_full_organization_rejects_new_members(self):
+        self.invite('first@example.com')
+        self.invite('second@example.com')
+        response = self.invite('third@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CustomUser.objects.filter(email='third@example.com').exists())
+        self.assertEqual(self.seats(), 3)
+
+        with self.assertRaises(OrganizationFull):
+            CustomUser.objects.create_user(username='late', email='late@example.com', organization=self.organization)
+        self.assertEqual(self.seats(), 3)
+
+    def test_organization_full_is_a_validation_error(self):
+        self.invite('first@example.com')
+        self.invite('second@example.com')
+        superuser = CustomUser.objects.create_superuser(
+            username='root', email='root@example.com', password='password'
+        )
+        self.client.force_login(superuser)
+        form = {
+            'username': 'late', 'email': 'late@example.com', 'password1': 'Correct-horse-9',
+            'password2': 'Correct-horse-9', 'usable_password': 'true',
+            'organization': self.organization.pk, 'role': 'employee',
+        }
+        url = reverse('admin:users_customuser_add')
+
+        # Reported on the form when the organization is already full
+        response = self.client.post(url, form)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'maximum number of users')
+
+        # and as a message when the last seat went between validation and save
+        with mock.patch.object(Organization, 'can_add_users', return_value=True):
+            response = self.client.post(url, form, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'has reached its maximum number of users')
+        self.assertFalse(CustomUser.objects.filter(email='late@example.com').exists())
+        self.assertEqual(self.seats(), 3)
+
+    def test_bulk_invites_reserve_their_seats_together(self):
+        url = reverse('bulk-invite-team-members')
+        invitations = [
+            {'email': f'member{index}@example.com', 'first_name': 'New', 'last_name': 'Member'}
+            for index in range(3)
+        ]
+        response = self.client.post(url, {'invitations': invitations}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('room for 2 more', str(response.data))
+        self.assertEqual(self.seats(), 1)
+
+        response = self.client.post(url, {'invitations': invitations[:2]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.seats(), 3)
+
+    def test_login_does_not_touch_the_counter(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('login'), {'email': 'admin@example.com', 'password': 'password'})
+        self.assertFalse(any('users_organization' in query['sql'] and 'UPDATE' in query['sql'] for query in queries))
+        self.assertEqual(self.seats(), 1)
+
+    def test_reconcile_fixes_drifted_counters(self):
+        # Bulk updates bypass save()
+        CustomUser.objects.filter(pk=self.admin.pk).update(is_active=False)
+        Organization.objects.filter(pk=self.organization.pk).update(seat_count=3)
+
+        call_command('reconcile_seat_counts', '--dry-run', stdout=StringIO())
+        self.assertEqual(self.seats(), 3)
+        call_command('reconcile_seat_counts', stdout=StringIO())
+        self.assertEqual(self.seats(), 0)
+
+
+class OrganizationTeamViewTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Acme', slug='acme', max_users=20000)
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='password', first_name='Ada',
+            organization=self.organization, role='admin',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('organization-team')
+
+    def add_members(self, count, prefix='member', **fields):
+        CustomUser.objects.bulk_create_with_related([
+            CustomUser(
+                username=f'{prefix}{index}', email=f'{prefix}{index}@example.com',
+                first_name=f'{prefix.title()} {index:05}', organization=self.organization,
+                invited_by=self.admin, **fields,
+            )
+            for index in range(count)
+        ])
+
+    def roster(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_members_and_invitations_are_listed_separately(self):
+        self.add_members(2)
+        self.add_members(1, prefix='invitee', is_active=False, is_invited=True, invited_at=timezone.now())
+
+        roster = self.roster()
+        self.assertEqual(roster['organization']['name'], 'Acme')
+        self.assertEqual([member['email'] for member in roster['results']], [
+            'admin@example.com', 'member0@example.com', 'member1@example.com',
+        ])
+        self.assertNotIn('organization', roster['results'][0])
+
+        invitations = self.roster(status='pending')['results']
+        self.assertEqual([invitation['email'] for invitation in invitations], ['invitee0@example.com'])
+        self.assertEqual(invitations[0]['invited_by'], self.admin.get_full_name())
+
+        self.assertEqual(self.client.get(self.url, {'status': 'gone'}).status_code, 400)
+
+    def test_role_and_department_filters(self):
+        self.add_members(2, role='manager', department='Sales')
+        self.add_members(1, prefix='clerk', department='Sales')
+
+        self.assertEqual(len(self.roster(role='manager')['results']), 2)
+        self.assertEqual(len(self.roster(department='Sales')['results']), 3)
+        self.assertEqual(len(self.roster(role='employee', department='Sales')['results']), 1)
+
+    def test_pages_follow_the_cursor(self):
+        self.add_members(5)
+        seen = []
+        page = self.roster(page_size=2)
+        while True:
+            seen += [member['email'] for member in page['results']]
+            if not page['next']:
+                break
+            response = self.client.get(page['next'])
+            page = response.data
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_pages_split_members_sharing_a_first_name(self):
+        CustomUser.objects.bulk_create_with_related([
+            CustomUser(
+                username=f'sam{index}', email=f'sam{index}@example.com', first_name='Sam',
+                last_name=last_name, organization=self.organization,
+            )
+            for index, last_name in enumerate(['Young', 'Adams', 'Brown', 'Adams', 'Clark'])
+        ])
+
+        seen = []
+        page = self.roster(page_size=2)
+        while True:
+            seen += [member['email'] for member in page['results']]
+            if not page['next']:
+                break
+            page = self.client.get(page['next']).data
+        expected = [self.admin.email] + [
+            member.email for member in CustomUser.objects.filter(first_name='Sam').order_by('last_name', 'id')
+        ]
+        self.assertEqual(seen, expected)
+
+        back = []
+        while page['previous']:
+            page = self.client.get(page['previous']).data
+            back = [member['email'] for member in page['results']] + back
+        self.assertEqual(back, expected[:len(back)])
+        self.assertEqual(len(back), 4)
+
+    def test_malformed_cursors_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'cD1ub3Rqc29u'}).status_code, 404)
+
+    def test_query_count_does_not_grow_with_the_team(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.roster()
+                self.roster(status='pending')
+            return len(queries)
+
+        self.add_members(5)
+        self.add_members(5, prefix='invitee', is_active=False, is_invited=True)
+        small = count_queries()
+
+        self.add_members(5000, prefix='bulk')
+        self.add_members(5000, prefix='pending', is_active=False, is_invited=True)
+        self.assertEqual(count_queries(), small)
+
+    def test_users_without_an_organization_are_rejected(self):
+        self.client.force_authenticate(CustomUser.objects.create_user(username='loner', email='loner@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 400)
@@ -2,13 +2,14 @@ from django.urls import path
 from .views import (
     RegisterView, LoginView, LogoutView, UserDetailView, 
     ChangePasswordView, UpdateProfileView, OrganizationRegisterView,
-    TeamMemberInviteView, AcceptInvitationView, OrganizationTeamView
+    TeamMemberInviteView, BulkTeamMemberInviteView, AcceptInvitationView, OrganizationTeamView
 )
 
 urlpatterns = [
     # Organization-based registration (new primary flow)
     path('organization/register/', OrganizationRegisterView.as_view(), name='organization-register'),
     path('organization/invite/', TeamMemberInviteView.as_view(), name='invite-team-member'),
+    path('organization/invite/bulk/', BulkTeamMemberInviteView.as_view(), name='bulk-invite-team-members'),
     path('organization/team/', OrganizationTeamView.as_view(), name='organization-team'),
     path('invitation/accept/', AcceptInvitationView.as_view(), name='accept-invitation'),
     
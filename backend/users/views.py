@@ -2,22 +2,34 @@ from django.contrib.auth import logout
 from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.generics import RetrieveUpdateAPIView, ListCreateAPIView
+from rest_framework.generics import RetrieveUpdateAPIView, ListAPIView, ListCreateAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
-from django.conf import settings
 from django.template.loader import render_to_string
+from django.db import transaction
+from django.db.models import Max
+
+from core.etags import etag_matches, make_etag, not_modified
 
 from .models import CustomUser, Organization
+from .outbox import invitation_email
+from .pagination import TeamCursorPagination
 from .serializers import (
     UserSerializer, RegisterSerializer, LoginSerializer, 
     ChangePasswordSerializer, UpdateUserSerializer,
-    OrganizationRegisterSerializer, TeamMemberInviteSerializer,
-    AcceptInvitationSerializer, OrganizationSerializer
+    OrganizationRegisterSerializer, TeamMemberInviteSerializer, BulkTeamMemberInviteSerializer,
+    AcceptInvitationSerializer, OrganizationSerializer, TeamMemberSerializer
 )
 
+def user_token(user):
+    """The user's auth token, without a query when the relation is already loaded"""
+    try:
+        return user.auth_token
+    except Token.DoesNotExist:
+        return Token.objects.create(user=user)
+
 class OrganizationRegisterView(APIView):
     """
     Create an account for your organization and become the organization creator
@@ -28,7 +40,7 @@ class OrganizationRegisterView(APIView):
         serializer = OrganizationRegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, created = Token.objects.get_or_create(user=user)
+            token = user_token(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'organization': OrganizationSerializer(user.organization).data,
@@ -37,6 +49,21 @@ class OrganizationRegisterView(APIView):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def invite_permission_error(user):
+    """The error response for a user who may not invite team members, if any"""
+    # Only creators and admins can invite team members
+    if user.role not in ['creator', 'admin']:
+        return Response({
+            'error': 'Only organization creators and administrators can invite team members.'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    if not user.organization:
+        return Response({
+            'error': 'User must belong to an organization to invite team members.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return None
+
 class TeamMemberInviteView(APIView):
     """
     Invite team members to join your organization
@@ -44,16 +71,9 @@ class TeamMemberInviteView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        # Only creators and admins can invite team members
-        if request.user.role not in ['creator', 'admin']:
-            return Response({
-                'error': 'Only organization creators and administrators can invite team members.'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        if not request.user.organization:
-            return Response({
-                'error': 'User must belong to an organization to invite team members.'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        error = invite_permission_error(request.user)
+        if error:
+            return error
         
         serializer = TeamMemberInviteSerializer(
             data=request.data,
@@ -63,61 +83,59 @@ class TeamMemberInviteView(APIView):
             }
         )
         if serializer.is_valid():
-            invited_user = serializer.save()
+            # The invitation email is queued with the user and sent by the
+            # send_outbox_emails worker, so the mail server never holds up the request
+            with transaction.atomic():
+                invited_user = serializer.save()
+                invitation_email(invited_user, request.user).save()
             
-            # Send invitation email
-            try:
-                invitation_url = f"http://localhost:3000/accept-invitation?token={invited_user.invitation_token}"
-                
-                # Email content
-                subject = f"You're invited to join {request.user.organization.name}"
-                message = f"""
-Hi {invited_user.first_name},
-
-You've been invited by {request.user.get_full_name()} to join {request.user.organization.name} as a {invited_user.role}.
-
-To accept this invitation and create your account, please click the link below:
-{invitation_url}
-
-This invitation will expire in 7 days.
-
-Welcome to the team!
+            return Response({
+                'message': 'Team member invited successfully! An invitation email will be sent shortly.',
+                'invited_user': {
+                    'email': invited_user.email,
+                    'first_name': invited_user.first_name,
+                    'last_name': invited_user.last_name,
+                    'role': invited_user.role,
+                }
+            }, status=status.HTTP_201_CREATED)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-Best regards,
-The {request.user.organization.name} Team
-                """
-                
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[invited_user.email],
-                    fail_silently=False,
-                )
-                
-                return Response({
-                    'message': 'Team member invited successfully! An invitation email has been sent.',
-                    'invited_user': {
-                        'email': invited_user.email,
-                        'first_name': invited_user.first_name,
-                        'last_name': invited_user.last_name,
-                        'role': invited_user.role,
+class BulkTeamMemberInviteView(APIView):
+    """
+    Invite many team members to join your organization in one request
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        error = invite_permission_error(request.user)
+        if error:
+            return error
+        
+        serializer = BulkTeamMemberInviteSerializer(
+            data=request.data,
+            context={
+                'organization': request.user.organization,
+                'inviter': request.user
+            }
+        )
+        if serializer.is_valid():
+            # Users and their queued invitation emails are committed together
+            with transaction.atomic():
+                invited_users = serializer.save()
+            
+            return Response({
+                'message': f'{len(invited_users)} team member(s) invited successfully! Invitation emails will be sent shortly.',
+                'invited_users': [
+                    {
+                        'email': user.email,
+                        'first_name': user.first_name,
+                        'last_name': user.last_name,
+                        'role': user.role,
                     }
-                }, status=status.HTTP_201_CREATED)
-                
-            except Exception as e:
-                # If email fails, still return success but mention email issue
-                return Response({
-                    'message': 'Team member invited successfully, but email could not be sent. Please share the invitation link manually.',
-                    'invited_user': {
-                        'email': invited_user.email,
-                        'first_name': invited_user.first_name,
-                        'last_name': invited_user.last_name,
-                        'role': invited_user.role,
-                        'invitation_token': str(invited_user.invitation_token)
-                    },
-                    'invitation_url': f"http://localhost:3000/accept-invitation?token={invited_user.invitation_token}"
-                }, status=status.HTTP_201_CREATED)
+                    for user in invited_users
+                ]
+            }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -131,7 +149,7 @@ class AcceptInvitationView(APIView):
         serializer = AcceptInvitationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, created = Token.objects.get_or_create(user=user)
+            token = user_token(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'organization': OrganizationSerializer(user.organization).data,
@@ -140,44 +158,53 @@ class AcceptInvitationView(APIView):
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class OrganizationTeamView(APIView):
+class OrganizationTeamView(ListAPIView):
     """
-    View and manage organization team members
+    View organization team members, a cursor paginated page at a time.
+    
+    ?status=active (default) lists members, ?status=pending the pending
+    invitations; ?role= and ?department= narrow either list. The
+    organization is rendered once next to the page.
     """
     permission_classes = [IsAuthenticated]
-
-    def get(self, request):
+    serializer_class = TeamMemberSerializer
+    pagination_class = TeamCursorPagination
+    
+    STATUS_FILTERS = {
+        'active': {'is_active': True},
+        'pending': {'is_active': False, 'is_invited': True},
+    }
+    
+    def get_queryset(self):
+        status_filter = self.STATUS_FILTERS.get(self.request.query_params.get('status', 'active'))
+        if status_filter is None:
+            raise ValidationError({'status': f"Must be one of: {', '.join(self.STATUS_FILTERS)}."})
+        
+        queryset = CustomUser.objects.filter(
+            organization=self.request.user.organization_id, **status_filter
+        ).select_related('profile', 'invited_by')
+        for field in ('role', 'department'):
+            value = self.request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
         if not request.user.organization_id:
             return Response({
                 'error': 'User must belong to an organization.'
             }, status=status.HTTP_400_BAD_REQUEST)
-
+        
         try:
             organization = Organization.objects.get(pk=request.user.organization_id)
         except Organization.DoesNotExist:
             return Response({
                 'error': 'Organization not found.'
             }, status=status.HTTP_400_BAD_REQUEST)
-
-        team_members = CustomUser.objects.filter(
-            organization=request.user.organization_id
-        ).order_by('role', 'first_name', 'last_name')
-
-        active_members = team_members.filter(is_active=True)
-        pending_invitations = team_members.filter(is_active=False, is_invited=True)
-
-        return Response({
-            'organization': OrganizationSerializer(organization).data,
-            'active_members': UserSerializer(active_members, many=True).data,
-            'pending_invitations': [{
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'role': user.role,
-                'invited_at': user.invited_at,
-                'invited_by': user.invited_by.get_full_name() if user.invited_by else None
-            } for user in pending_invitations]
-        })
+        
+        response = super().list(request, *args, **kwargs)
+        response.data = {'organization': OrganizationSerializer(organization).data, **response.data}
+        return response
 
 # Keep existing individual registration for backwards compatibility
 class RegisterView(APIView):
@@ -187,7 +214,7 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, created = Token.objects.get_or_create(user=user)
+            token = user_token(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'token': token.key
@@ -201,7 +228,7 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        token = user_token(user)
         return Response({
             'user': UserSerializer(user).data,
             'token': token.key
@@ -231,6 +258,31 @@ class UserDetailView(RetrieveUpdateAPIView):
     
     def get_object(self):
         return self.request.user
+    
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        etag = self.get_etag(user)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+    
+    def get_etag(self, user):
+        """
+        Validator covering everything UserSerializer renders: the user, the
+        profile, the organization and its seat counter, in one query
+        """
+        related = CustomUser.objects.filter(pk=user.pk).aggregate(
+            profile_updated_at=Max('profile__updated_at'),
+            organization_updated_at=Max('organization__updated_at'),
+            organization_seats=Max('organization__seat_count'),
+        )
+        return make_etag(
+            user.pk, user.updated_at.isoformat(),
+            *(related[key] for key in sorted(related))
+        )
 
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
@@ -245,7 +297,7 @@ class ChangePasswordView(APIView):
             
             # Set new password
             user.set_password(serializer.data.get('new_password'))
-            user.save()
+            user.save(update_fields=['password'])
             
             # Update token
             user.auth_token.delete()
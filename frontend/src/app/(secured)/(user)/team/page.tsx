@@ -35,6 +35,9 @@ export default function TeamPage() {
     const [organization, setOrganization] = useState<Organization | null>(null);
     const [activeMembers, setActiveMembers] = useState<TeamMember[]>([]);
     const [pendingInvitations, setPendingInvitations] = useState<PendingInvitation[]>([]);
+    // Cursor links to the next page of each list, null once everything is loaded
+    const [nextMembersPage, setNextMembersPage] = useState<string | null>(null);
+    const [nextInvitationsPage, setNextInvitationsPage] = useState<string | null>(null);
     const [searchQuery, setSearchQuery] = useState('');
 
     // Invitation modal state
@@ -48,14 +51,17 @@ export default function TeamPage() {
         try {
             setIsLoading(true);
 
-            // Try to call the organization team API
-            const data = await apiRequest('/users/organization/team/', {
-                method: 'GET'
-            });
-
-            setOrganization(data.organization);
-            setActiveMembers(data.active_members || []);
-            setPendingInvitations(data.pending_invitations || []);
+            // Members and pending invitations are paginated separately
+            const [members, invitations] = await Promise.all([
+                apiRequest('/users/organization/team/?status=active', { method: 'GET' }),
+                apiRequest('/users/organization/team/?status=pending', { method: 'GET' }),
+            ]);
+
+            setOrganization(members.organization);
+            setActiveMembers(members.results || []);
+            setNextMembersPage(members.next);
+            setPendingInvitations(invitations.results || []);
+            setNextInvitationsPage(invitations.next);
             setIsLoading(false);
         } catch (err) {
             console.error('Error fetching team members:', err);
@@ -69,6 +75,25 @@ export default function TeamPage() {
         }
     }, []);
 
+    // Append the next page of members or invitations
+    const loadMore = async (status: 'active' | 'pending') => {
+        const next = status === 'active' ? nextMembersPage : nextInvitationsPage;
+        if (!next) return;
+        try {
+            const data = await apiRequest(next, { method: 'GET' });
+            if (status === 'active') {
+                setActiveMembers(members => [...members, ...(data.results || [])]);
+                setNextMembersPage(data.next);
+            } else {
+                setPendingInvitations(invitations => [...invitations, ...(data.results || [])]);
+                setNextInvitationsPage(data.next);
+            }
+        } catch (err) {
+            const errorMessage = err instanceof Error ? err.message : 'Unable to load more team members';
+            toast.error(errorMessage);
+        }
+    };
+
     // Handle team member invitation
     const handleInviteTeamMember = async (e: React.FormEvent) => {
         e.preventDefault(); if (!inviteEmail.trim() || !inviteFirstName.trim() || !inviteLastName.trim()) {
@@ -324,6 +349,16 @@ export default function TeamPage() {
                                     </div>
                                 )}
                             </div>
+                            {nextMembersPage && (
+                                <div className="mt-6 text-center">
+                                    <button
+                                        onClick={() => loadMore('active')}
+                                        className="text-sm font-medium text-blue-600 dark:text-blue-400 hover:text-blue-800 dark:hover:text-blue-300 transition-colors duration-200"
+                                    >
+                                        Load more members
+                                    </button>
+                                </div>
+                            )}
                         </div>
 
                         {/* Pending Invitations Section */}
@@ -385,6 +420,16 @@ export default function TeamPage() {
                                         </div>
                                     ))}
                                 </div>
+                                {nextInvitationsPage && (
+                                    <div className="mt-6 text-center">
+                                        <button
+                                            onClick={() => loadMore('pending')}
+                                            className="text-sm font-medium text-blue-600 dark:text-blue-400 hover:text-blue-800 dark:hover:text-blue-300 transition-colors duration-200"
+                                        >
+                                            Load more invitations
+                                        </button>
+                                    </div>
+                                )}
                             </div>
                         )}
                     </div>
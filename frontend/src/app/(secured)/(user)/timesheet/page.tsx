@@ -3,7 +3,7 @@
 import { useState, useEffect, useCallback, useMemo } from 'react';
 import { LuPlus, LuPencil, LuTrash, LuChevronLeft, LuChevronRight } from 'react-icons/lu';
 import { toast } from 'react-hot-toast';
-import { apiRequest, TimeEntry } from '@/app/lib/api';
+import { getAllTimeEntries, TimeEntry } from '@/app/lib/api';
 
 export default function TimesheetPage() {
     const [currentWeek, setCurrentWeek] = useState<Date>(new Date());
@@ -63,9 +63,15 @@ export default function TimesheetPage() {
             const startDate = formatDate(daysOfWeek[0]);
             const endDate = formatDate(daysOfWeek[6]);
 
-            // Fetch time entries from API
-            const data = await apiRequest(`/timekeeping/time-entries/?start_date=${startDate}&end_date=${endDate}`);
-            setTimeEntries(data || []);
+            // Fetch every page of the week's entries; days are UTC dates,
+            // as formatDate() and getEntriesForDay() use
+            const entries = await getAllTimeEntries({
+                start_date: startDate,
+                end_date: endDate,
+                timezone: 'UTC',
+                page_size: 500,
+            });
+            setTimeEntries(entries);
             setIsLoading(false);
         } catch (err) {
             console.error('Error fetching time entries:', err);
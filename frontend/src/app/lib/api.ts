@@ -150,20 +150,47 @@ export async function updateUser(userData: Partial<User>): Promise<User> {
 }
 
 // Time entry functions
+export interface Page<T> {
+  results: T[];
+  next: string | null;
+  previous: string | null;
+}
+
+// One cursor page of time entries; pass `cursor` (a page's `next` link)
+// to continue, or use getAllTimeEntries() to read every matching page
 export async function getTimeEntries(filters?: {
-  date?: string;
+  start_date?: string;
+  end_date?: string;
+  timezone?: string;
   project?: number;
   user?: number;
-}): Promise<TimeEntry[]> {
+  page_size?: number;
+}, cursor?: string | null): Promise<Page<TimeEntry>> {
+  if (cursor) return apiRequest(cursor);
+
   const queryParams = new URLSearchParams();
-  if (filters?.date) queryParams.append('date', filters.date);
+  if (filters?.start_date) queryParams.append('start_date', filters.start_date);
+  if (filters?.end_date) queryParams.append('end_date', filters.end_date);
+  if (filters?.timezone) queryParams.append('timezone', filters.timezone);
   if (filters?.project) queryParams.append('project', filters.project.toString());
   if (filters?.user) queryParams.append('user', filters.user.toString());
-  
+  if (filters?.page_size) queryParams.append('page_size', filters.page_size.toString());
+
   const endpoint = `/timekeeping/time-entries/${queryParams.toString() ? `?${queryParams.toString()}` : ''}`;
   return apiRequest(endpoint);
 }
 
+export async function getAllTimeEntries(filters?: Parameters<typeof getTimeEntries>[0]): Promise<TimeEntry[]> {
+  const entries: TimeEntry[] = [];
+  let page = await getTimeEntries(filters);
+  entries.push(...page.results);
+  while (page.next) {
+    page = await getTimeEntries(filters, page.next);
+    entries.push(...page.results);
+  }
+  return entries;
+}
+
 export async function createTimeEntry(entryData: Omit<TimeEntry, 'id' | 'created_at' | 'updated_at'>): Promise<TimeEntry> {
   return apiRequest('/timekeeping/time-entries/', {
     method: 'POST',